@@ -0,0 +1,139 @@
+"""End-to-end benchmarks of stacking-block yards.
+
+    python -m benchmarks.run [-s SCENARIO ...] [-r REPEAT] [-o results.json]
+                             [--compare baseline.json] [--threshold 0.1]
+
+Each repetition of a scenario runs in its own process with a fixed seed, so
+the simulated workload is identical between runs and machines; only the
+timings differ. With --compare, the medians are checked against a stored
+result file and the command exits with status 1 if any metric regressed by
+more than the threshold.
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import time as _time
+from statistics import median
+
+from tcysim.utils import ReplicationRunner
+from .scenario import SCENARIOS, DAY, build
+
+# metric -> True if larger is better
+METRICS = {
+    "events_per_sec":       True,
+    "wall_per_sim_day":     False,
+    "cpu_us_per_request":   False,
+    "peak_rss_mb":          False,
+    }
+
+
+def summarize(metrics):
+    return {
+        "events":             metrics["events"],
+        "requests":           metrics["requests"],
+        "wall_time":          metrics["wall_time"],
+        "events_per_sec":     metrics["events"] / metrics["wall_time"],
+        "wall_per_sim_day":   metrics["wall_time"] / metrics["sim_days"],
+        "cpu_us_per_request": metrics["cpu_time"] / max(metrics["requests"], 1) * 1e6,
+        "peak_rss_mb":        metrics["peak_rss_kb"] / 1024,
+        }
+
+
+def run_scenario(name, params, repeat, seed):
+    runner = ReplicationRunner(build, params["days"] * DAY, workers=1, base_seed=seed)
+    runs = []
+    for _ in range(repeat):
+        # one replication at a time, always replication 0, so each repetition
+        # does the same work in a fresh process on an otherwise idle pool
+        result, = runner.run(params=[params])
+        if not result.succeed:
+            raise RuntimeError("scenario {} failed:\n{}".format(name, result.error))
+        runs.append(summarize(result.metrics))
+    if len({(run["events"], run["requests"]) for run in runs}) > 1:
+        print("warning: {}: repetitions did not simulate the same workload".format(name), file=sys.stderr)
+    summary = {key: median(run[key] for run in runs) for key in runs[0]}
+    return {"params": params, "summary": summary, "runs": runs}
+
+
+def environment():
+    try:
+        commit = subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        commit = None
+    return {
+        "python":    platform.python_version(),
+        "platform":  platform.platform(),
+        "processor": platform.processor(),
+        "cpus":      os.cpu_count(),
+        "commit":    commit,
+        "date":      _time.strftime("%Y-%m-%dT%H:%M:%S"),
+        }
+
+
+def compare(results, baseline, threshold):
+    regressions = []
+    for name, result in results["scenarios"].items():
+        base = baseline["scenarios"].get(name)
+        if base is None:
+            continue
+        if base["params"] != result["params"] or \
+                (base["summary"]["events"], base["summary"]["requests"]) != \
+                (result["summary"]["events"], result["summary"]["requests"]):
+            print("{:16s} workload differs from the baseline, timings are not comparable".format(name))
+        for metric, higher_is_better in METRICS.items():
+            old, new = base["summary"][metric], result["summary"][metric]
+            change = (new - old) / old if old else 0
+            worse = -change if higher_is_better else change
+            flag = "REGRESSION" if worse > threshold else ""
+            print("{:16s} {:20s} {:12.3f} -> {:12.3f} {:+7.1%} {}".format(name, metric, old, new, change, flag))
+            if flag:
+                regressions.append((name, metric, change))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run the stacking-block benchmark suite.")
+    parser.add_argument("-s", "--scenario", action="append", choices=sorted(SCENARIOS),
+                        help="scenario to run, may be repeated (default: all)")
+    parser.add_argument("-r", "--repeat", type=int, default=3, help="repetitions per scenario")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--days", type=float, help="override the simulated days of every scenario")
+    parser.add_argument("--load", type=float, help="override the load of every scenario")
+    parser.add_argument("-o", "--output", help="write the results to this JSON file")
+    parser.add_argument("--compare", metavar="BASELINE", help="JSON result file to compare against")
+    parser.add_argument("--threshold", type=float, default=0.1,
+                        help="relative change counted as a regression (default: 0.1)")
+    args = parser.parse_args(argv)
+
+    results = {"environment": environment(), "seed": args.seed, "scenarios": {}}
+    for name in args.scenario or sorted(SCENARIOS):
+        params = dict(SCENARIOS[name])
+        if args.days is not None:
+            params["days"] = args.days
+        if args.load is not None:
+            params["load"] = args.load
+        result = run_scenario(name, params, args.repeat, args.seed)
+        results["scenarios"][name] = result
+        summary = result["summary"]
+        print("{:16s} {:10.0f} events/s {:8.2f} s/sim-day {:10.1f} us/request {:8.1f} MB".format(
+            name, summary["events_per_sec"], summary["wall_per_sim_day"],
+            summary["cpu_us_per_request"], summary["peak_rss_mb"]))
+
+    if args.output:
+        with open(args.output, "w") as fp:
+            json.dump(results, fp, indent=2)
+
+    if args.compare:
+        with open(args.compare) as fp:
+            baseline = json.load(fp)
+        if compare(results, baseline, args.threshold):
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
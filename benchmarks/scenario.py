@@ -0,0 +1,148 @@
+import random
+import resource
+import time as _time
+
+from tcysim.framework import Yard, Component, Spec, Lane, Box
+from tcysim.framework.request import Request
+from tcysim.utils import V3, TEU
+from tcysim.utils.dispatcher import Dispatcher
+from tcysim.implementation.base.policy.req_handler import ReqHandler
+from tcysim.implementation.base.policy.op_builder import OpBuilder
+from tcysim.implementation.base.roles.box_generator import BoxBomb, BoxGenerator, BoxEventHandler, BoxEventType
+from tcysim.implementation.scenario.stackingblock.block import StackingBlock
+from tcysim.implementation.scenario.stackingblock.crane import CraneForStackingBlock
+from tcysim.implementation.scenario.stackingblock.allocator import RandomSpaceAllocator
+from tcysim.implementation.scenario.stackingblock.op_builder import OptimisedOpBuilder
+from tcysim.implementation.scenario.stackingblock.scheduler import CooperativeTwinCraneJobScheduler
+from tcysim.framework.scheduler import JobScheduler
+
+DAY = 3600 * 24
+BLOCK_GAP = 15
+LANES_PER_BLOCK = 2
+# Mean seconds between two boxes arriving at one block at load 1.0.
+BASE_INTERVAL = 240
+
+SCENARIOS = {
+    "single-crane":   dict(blocks=1, bays=30, rows=10, tiers=6, cranes=1, load=0.5, days=3),
+    "twin-crane":     dict(blocks=1, bays=30, rows=10, tiers=6, cranes=2, load=1.0, days=3),
+    "twin-crane-opt": dict(blocks=1, bays=30, rows=10, tiers=6, cranes=2, load=1.0, days=3, optimised=True),
+    "multi-block":    dict(blocks=4, bays=40, rows=10, tiers=6, cranes=2, load=1.0, days=2),
+    "tall-block":     dict(blocks=1, bays=30, rows=10, tiers=9, cranes=2, load=1.2, days=2),
+    }
+
+
+class Crane(CraneForStackingBlock):
+    gantry = Component("x", Spec(2.17, 0.1), may_interfere=True)
+    trolley = Component("y", Spec(1.17, 0.4))
+    hoist = Component("z", specs={"no load": Spec(1.5, 0.4), "rated load": Spec(0.75, 0.4)}, max_height=18.1)
+    ReqHandler = ReqHandler
+    OpBuilder = OpBuilder
+    JobScheduler = JobScheduler
+
+
+class TwinCrane(Crane):
+    JobScheduler = CooperativeTwinCraneJobScheduler
+
+
+class OptimisedCrane(Crane):
+    OpBuilder = OptimisedOpBuilder
+
+
+class OptimisedTwinCrane(TwinCrane):
+    OpBuilder = OptimisedOpBuilder
+
+
+class BenchmarkRequest(Request):
+    def finish_or_fail(self, time):
+        super(BenchmarkRequest, self).finish_or_fail(time)
+        if self.state == self.STATE.FINISHED:
+            self.equipment.yard.num_requests += 1
+
+
+class BenchmarkYard(Yard):
+    SpaceAllocator = RandomSpaceAllocator
+    ReqCls = BenchmarkRequest
+
+    def __init__(self, blocks, bays, rows, tiers, cranes, optimised=False):
+        super(BenchmarkYard, self).__init__()
+        # box events handled by the generator and requests finished, counted
+        # outside of the probes so that measuring does not slow down fire_probe
+        self.num_events = 0
+        self.num_requests = 0
+        if cranes == 1:
+            crane_cls = OptimisedCrane if optimised else Crane
+        elif cranes == 2:
+            crane_cls = OptimisedTwinCrane if optimised else TwinCrane
+        else:
+            raise ValueError("a stacking block takes one or two cranes")
+        lane_length = bays * TEU.LENGTH + 2 * BLOCK_GAP
+        y = 0
+        for bid in range(blocks):
+            lanes = [Lane(bid * LANES_PER_BLOCK + i, V3(0, y - 5 - 4 * i, 0), lane_length, 3.5)
+                     for i in range(LANES_PER_BLOCK)]
+            block = StackingBlock(self, bid, V3(0, y, 0), V3(bays, rows, tiers), lanes=lanes)
+            self.deploy(block, [crane_cls(self, block, offset) for offset in (0, -1)[:cranes]])
+            y += block.size.y + BLOCK_GAP + 4 * LANES_PER_BLOCK
+
+class Handler(BoxEventHandler):
+    @Dispatcher.on(BoxEventType.ALLOC)
+    def on_alloc(self, yard, time, box):
+        block, loc = yard.choose_location(box)
+        if block is None:
+            return False
+        yard.alloc(time, box, block, loc)
+        return True
+
+
+class Generator(BoxGenerator):
+    EventHandler = Handler
+
+    def _process(self):
+        self.yard.num_events += 1
+        super(Generator, self)._process()
+
+
+class Bomb(BoxBomb):
+    interval = BASE_INTERVAL
+    num = 0
+
+    def next_time(self, time):
+        return time + random.expovariate(1 / self.interval)
+
+    def store_time(self, alloc_time):
+        return alloc_time + random.uniform(3600, 7200)
+
+    def retrieve_time(self, store_time):
+        return store_time + random.uniform(3600 * 12, 3600 * 48)
+
+    def new_box(self):
+        Bomb.num += 1
+        return Box(str(Bomb.num).encode(), size=random.choice((20, 40)))
+
+
+def build(seed, blocks=1, bays=30, rows=10, tiers=6, cranes=2, load=1.0, days=1, optimised=False):
+    """Replication factory for ReplicationRunner: a stacking-block yard under a BoxBomb load.
+
+    The returned collect() reports the counters measured from the moment the
+    yard is built, i.e. over yard.start() and yard.run_until().
+    """
+    yard = BenchmarkYard(blocks, bays, rows, tiers, cranes, optimised)
+    Bomb.interval = BASE_INTERVAL / (load * blocks)
+    generator = Generator(yard)
+    generator.install_or_add(Bomb(0))
+    wall0 = _time.perf_counter()
+    cpu0 = _time.process_time()
+
+    def collect():
+        wall = _time.perf_counter() - wall0
+        cpu = _time.process_time() - cpu0
+        return {
+            "sim_days":    days,
+            "wall_time":   wall,
+            "cpu_time":    cpu,
+            "events":      yard.num_events,
+            "requests":    yard.num_requests,
+            "peak_rss_kb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+            }
+
+    return yard, collect
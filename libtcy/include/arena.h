@@ -0,0 +1,29 @@
+//
+// Slab storage of the Box_TCY records, addressed by 32-bit handles.
+//
+
+#ifndef LIBTCY_ARENA_H
+#define LIBTCY_ARENA_H
+
+#include "define.h"
+
+#define BOX_ARENA_CHUNK_BITS 12
+#define BOX_ARENA_CHUNK_SIZE (1 << BOX_ARENA_CHUNK_BITS)
+
+static inline Box_TCY *box_arena_get(const BoxArena_TCY *arena, BoxHandle_TCY handle) {
+    if (handle == BOX_HANDLE_NONE)
+        return NULL;
+    return &arena->chunks[handle >> BOX_ARENA_CHUNK_BITS][handle & (BOX_ARENA_CHUNK_SIZE - 1)];
+}
+
+DLLEXPORT void box_arena_init(BoxArena_TCY *arena);
+
+DLLEXPORT void box_arena_destroy(BoxArena_TCY *arena);
+
+DLLEXPORT Box_TCY *box_arena_new(BoxArena_TCY *arena);
+
+DLLEXPORT void box_arena_free(BoxArena_TCY *arena, Box_TCY *box);
+
+DLLEXPORT size_t box_arena_capacity(const BoxArena_TCY *arena);
+
+#endif //LIBTCY_ARENA_H
@@ -19,12 +19,19 @@ void _blk_link_cell(Block_TCY *blk, Box_TCY *box);
 
 void _blk_unlink_cell(Block_TCY *blk, Box_TCY *box);
 
+void _blk_refresh_cell_state(Block_TCY *blk, Box_TCY *box);
+
 Box_TCY *_blk_neighbor_box(Block_TCY *blk, Box_TCY *box, int along, bool inc);
 
 void _blk_top_of_stack(Block_TCY *blk, CellIdx_TCY *idx);
 
+void _blk_refresh_stack_height(Block_TCY *blk, const CellIdx_TCY *loc);
+
+void _blk_refresh_free_stacks(Block_TCY *blk, Box_TCY *box);
+
 DLLEXPORT void
-block_init(Block_TCY *blk, const CellIdx_TCY *spec, int box_orientation, int stacking_axis, const bool *axis_need_sync);
+block_init(Block_TCY *blk, const CellIdx_TCY *spec, int box_orientation, int stacking_axis, const bool *axis_need_sync,
+           BoxArena_TCY *arena);
 
 DLLEXPORT void block_destroy(Block_TCY *blk);
 
@@ -34,6 +41,8 @@ DLLEXPORT Box_TCY *block_box_at(Block_TCY *blk, const CellIdx_TCY *idx);
 
 DLLEXPORT Box_TCY *block_top_box(Block_TCY *blk, const CellIdx_TCY *idx, int along);
 
+DLLEXPORT int block_max_stack_height(Block_TCY *blk, const CellIdx_TCY *start, const CellIdx_TCY *finish);
+
 DLLEXPORT CellIdx_TCY blk_stack_hash(Block_TCY *blk, const CellIdx_TCY *idx);
 
 DLLEXPORT void block_lock(Block_TCY *blk, const CellIdx_TCY *idx);
@@ -52,6 +61,24 @@ DLLEXPORT int block_all_slot_usages(Block_TCY *blk, int norm_axis, bool include_
 
 DLLEXPORT int block_all_slot_states(Block_TCY *blk, int norm_axis, int *results);
 
+DLLEXPORT int blocks_fill_stack_tensor(Block_TCY **blks, int num, CellIdx_TCY size0, CellIdx_TCY size1,
+                                       bool include_occupied, uint64_t *versions, int *heights, int *slot_states);
+
 DLLEXPORT int block_validate_all_slots_for_size(Block_TCY *blk, int norm_axis, BoxSize_TCY box_size, bool *results);
 
+DLLEXPORT int block_available_cells(Block_TCY *blk, int norm_axis, BoxSize_TCY box_size, CellIdx_TCY start,
+                                    CellIdx_TCY finish, bool allow_new_slot, CellIdx_TCY own_slot,
+                                    int max_slot_usage, int *results);
+
+DLLEXPORT int block_ranked_cells(Block_TCY *blk, int norm_axis, BoxSize_TCY box_size, CellIdx_TCY own_slot,
+                                 CellIdx_TCY start, CellIdx_TCY finish, int max_slot_usage,
+                                 const CellIdx_TCY *excluded, int num_excluded, const double *weights,
+                                 int k, int *results, double *scores);
+
+DLLEXPORT CellIdx_TCY block_free_stack_num(Block_TCY *blk, BoxSize_TCY box_size);
+
+DLLEXPORT int block_free_stack(Block_TCY *blk, BoxSize_TCY box_size, CellIdx_TCY k, CellIdx_TCY *idx);
+
+DLLEXPORT int block_all_free_stacks(Block_TCY *blk, BoxSize_TCY box_size, int *results);
+
 #endif //LIBTCY_BLOCK_H
@@ -12,6 +12,10 @@ DLLEXPORT void box_init(Box_TCY *box, char *box_id, BoxSize_TCY size);
 
 DLLEXPORT void box_destroy(Box_TCY *box);
 
+DLLEXPORT bool box_in_block(Box_TCY *box);
+
+DLLEXPORT void box_set_state(Box_TCY *box, BoxState_TCY state);
+
 DLLEXPORT int box_alloc(Box_TCY *box, Time_TCY time);
 
 DLLEXPORT int box_store(Box_TCY *box, Time_TCY time);
@@ -33,6 +33,7 @@
 
 #define BOX_ID_LEN_LIMIT 32
 #define TIME_INF 315360000
+#define CELL_STATE_EMPTY (-1)
 
 typedef enum {
     BOX_SIZE_TWENTY = 0,
@@ -50,6 +51,8 @@ typedef enum {
     BOX_STATE_PLACEHOLDER = 7,
 } BoxState_TCY;
 
+#define BOX_STATE_NUM 8
+
 typedef enum {
     SLOT_USAGE_FREE = 0,
     SLOT_USAGE_TWENTY_ONLY = 1,
@@ -59,7 +62,11 @@ typedef enum {
 
 typedef double Time_TCY;
 typedef int32_t CellIdx_TCY;
+typedef uint32_t BoxHandle_TCY;
 typedef struct Block_TCY Block_TCY;
+typedef struct BoxRegistry_TCY BoxRegistry_TCY;
+
+#define BOX_HANDLE_NONE 0
 
 typedef struct Box_TCY {
     char id[BOX_ID_LEN_LIMIT];
@@ -67,12 +74,57 @@ typedef struct Box_TCY {
     BoxState_TCY state;
     Time_TCY alloc_time, store_time, retrieval_time;
     CellIdx_TCY loc[3];
+    BoxHandle_TCY handle;
+    uint16_t kind;
+    BoxHandle_TCY _state_prev, _state_next;
+    BoxRegistry_TCY *registry;
     Block_TCY *block;
     void *_self;
     struct Box_TCY *_holder_or_origin;
 } Box_TCY;
 
-typedef Box_TCY *Cell_TCY;
+typedef BoxHandle_TCY Cell_TCY;
+
+typedef struct BoxArena_TCY {
+    Box_TCY **chunks;
+    uint32_t num_chunks, cap_chunks;
+    BoxHandle_TCY top;
+    BoxHandle_TCY *free_handles;
+    uint32_t num_free, cap_free;
+    uint32_t num_live;
+} BoxArena_TCY;
+
+typedef struct BoxRegistry_TCY {
+    BoxArena_TCY *arena;
+    BoxHandle_TCY *table;
+    uint32_t capacity, num;
+    BoxHandle_TCY heads[BOX_STATE_NUM];
+    uint32_t counts[BOX_STATE_NUM];
+} BoxRegistry_TCY;
+
+#define LOCK_OWNER_NONE (-1)
+
+typedef struct LockWaitNode_TCY {
+    int32_t token, next;
+} LockWaitNode_TCY;
+
+typedef struct StackLockTable_TCY {
+    CellIdx_TCY num_stacks;
+    bool *locked;
+    int32_t *owners;
+    int32_t *heads, *tails;
+    int32_t *queue_lens, *max_queue_lens;
+    uint64_t *acquisitions, *contentions;
+    LockWaitNode_TCY *nodes;
+    int32_t num_nodes, cap_nodes, free_node;
+    int32_t *pending, *refs;
+    int32_t cap_tokens;
+} StackLockTable_TCY;
+
+typedef struct HeightIndex_TCY {
+    CellIdx_TCY size0, size1;
+    CellIdx_TCY *tree;
+} HeightIndex_TCY;
 
 typedef struct Block_TCY {
     CellIdx_TCY spec[3];
@@ -82,9 +134,18 @@ typedef struct Block_TCY {
     CellIdx_TCY *column_usage_occupied[3];
     CellIdx_TCY cell_num;
     Cell_TCY *cells;
+    int8_t *cell_states;
     int stacking_axis;
     int box_orientation;
     bool *lock_map;
+    StackLockTable_TCY locks;
+    HeightIndex_TCY heights;
+    CellIdx_TCY *free_stacks[2];
+    CellIdx_TCY *free_stack_pos[2];
+    CellIdx_TCY free_stack_num[2];
+    uint64_t version;
+    BoxArena_TCY *arena;
+    BoxRegistry_TCY *registry;
     void *_self;
 } Block_TCY;
 
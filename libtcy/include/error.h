@@ -10,5 +10,7 @@
 #define ERROR_UNKNOWN_BOX_SIZE 2
 #define ERROR_CANNOT_FIND_STACKING_AXIS 3
 #define ERROR_INVALID_LOCATION 4
+#define ERROR_OUT_OF_MEMORY 5
+#define ERROR_DUPLICATE_BOX_ID 6
 
 #endif //LIBTCY_ERROR_H
@@ -0,0 +1,19 @@
+//
+// Maximum stack height over a rectangle of stacks.
+//
+
+#ifndef LIBTCY_HEIGHT_H
+#define LIBTCY_HEIGHT_H
+
+#include "define.h"
+
+DLLEXPORT int height_index_init(HeightIndex_TCY *index, CellIdx_TCY size0, CellIdx_TCY size1);
+
+DLLEXPORT void height_index_destroy(HeightIndex_TCY *index);
+
+DLLEXPORT void height_index_set(HeightIndex_TCY *index, CellIdx_TCY i, CellIdx_TCY j, CellIdx_TCY height);
+
+DLLEXPORT CellIdx_TCY height_index_max(const HeightIndex_TCY *index, CellIdx_TCY i0, CellIdx_TCY i1, CellIdx_TCY j0,
+                                       CellIdx_TCY j1);
+
+#endif //LIBTCY_HEIGHT_H
@@ -0,0 +1,23 @@
+//
+// Stack locks of a block with owners, FIFO wait queues and contention counters.
+//
+
+#ifndef LIBTCY_LOCK_H
+#define LIBTCY_LOCK_H
+
+#include "define.h"
+
+DLLEXPORT int stack_locks_init(StackLockTable_TCY *locks, CellIdx_TCY num_stacks, bool *locked);
+
+DLLEXPORT void stack_locks_destroy(StackLockTable_TCY *locks);
+
+DLLEXPORT int stack_locks_acquire(StackLockTable_TCY *locks, int32_t token, const CellIdx_TCY *stacks, int num,
+                                  CellIdx_TCY *failed);
+
+DLLEXPORT int stack_locks_release(StackLockTable_TCY *locks, CellIdx_TCY stack, int32_t *woken);
+
+DLLEXPORT int stack_locks_waiters(const StackLockTable_TCY *locks, CellIdx_TCY stack, int32_t *tokens);
+
+DLLEXPORT void stack_locks_reset_stats(StackLockTable_TCY *locks);
+
+#endif //LIBTCY_LOCK_H
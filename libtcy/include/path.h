@@ -13,16 +13,10 @@ typedef struct {
     void* other;
 } PathKeyFrame;
 
-typedef struct PathFrameChunk{
+typedef struct{
+    int capacity;
     int num;
     PathKeyFrame* frames;
-    struct PathFrameChunk* next;
-} PathFrameChunk;
-
-typedef struct{
-    int chunk_size;
-    PathFrameChunk* chunks;
-    PathFrameChunk* last_chunk;
     double max, min;
 } PathTrace;
 
@@ -31,5 +25,6 @@ DLLEXPORT void pathtrace_destroy(PathTrace *pt);
 DLLEXPORT void pathtrace_append_frame(PathTrace *pt, Time_TCY time, double coord, void *other);
 DLLEXPORT bool pathtrace_intersect_test_with_clearance(PathTrace *pt0, PathTrace *pt1, double clearance, double shift);
 DLLEXPORT void pathtrace_boundary(PathTrace* pt, double* pmax, double* pmin);
+DLLEXPORT void pathtrace_shift_time(PathTrace *pt, Time_TCY delta);
 
 #endif //TCY_PATH_H
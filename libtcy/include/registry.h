@@ -0,0 +1,22 @@
+//
+// Boxes of a yard by id and by state.
+//
+
+#ifndef LIBTCY_REGISTRY_H
+#define LIBTCY_REGISTRY_H
+
+#include "define.h"
+
+DLLEXPORT int box_registry_init(BoxRegistry_TCY *reg, BoxArena_TCY *arena);
+
+DLLEXPORT void box_registry_destroy(BoxRegistry_TCY *reg);
+
+DLLEXPORT int box_registry_add(BoxRegistry_TCY *reg, Box_TCY *box);
+
+DLLEXPORT void box_registry_remove(BoxRegistry_TCY *reg, Box_TCY *box);
+
+DLLEXPORT void box_registry_move(BoxRegistry_TCY *reg, Box_TCY *box, BoxState_TCY state);
+
+DLLEXPORT Box_TCY *box_registry_find(BoxRegistry_TCY *reg, const char *box_id);
+
+#endif //LIBTCY_REGISTRY_H
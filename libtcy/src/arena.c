@@ -0,0 +1,79 @@
+//
+// Slab storage of the Box_TCY records, addressed by 32-bit handles.
+//
+// Records live in fixed-size chunks that are never moved, so a Box_TCY
+// pointer stays valid as long as its handle is not freed. Freed handles are
+// reused before the arena grows. Handle 0 is never given out, so it marks an
+// empty cell.
+//
+
+#include <stdlib.h>
+#include <string.h>
+#include "../include/arena.h"
+
+void box_arena_init(BoxArena_TCY *arena) {
+    arena->chunks = NULL;
+    arena->num_chunks = arena->cap_chunks = 0;
+    arena->top = 1;
+    arena->free_handles = NULL;
+    arena->num_free = arena->cap_free = 0;
+    arena->num_live = 0;
+}
+
+void box_arena_destroy(BoxArena_TCY *arena) {
+    for (uint32_t i = 0; i < arena->num_chunks; ++i)
+        free(arena->chunks[i]);
+    free(arena->chunks);
+    free(arena->free_handles);
+    box_arena_init(arena);
+}
+
+static int _box_arena_grow(BoxArena_TCY *arena) {
+    if (arena->num_chunks == arena->cap_chunks) {
+        uint32_t cap = arena->cap_chunks ? arena->cap_chunks * 2 : 16;
+        Box_TCY **chunks = (Box_TCY **) realloc(arena->chunks, sizeof(Box_TCY *) * cap);
+        if (!chunks) return -1;
+        arena->chunks = chunks;
+        arena->cap_chunks = cap;
+    }
+    Box_TCY *chunk = (Box_TCY *) malloc(sizeof(Box_TCY) * BOX_ARENA_CHUNK_SIZE);
+    if (!chunk) return -1;
+    arena->chunks[arena->num_chunks++] = chunk;
+    return 0;
+}
+
+Box_TCY *box_arena_new(BoxArena_TCY *arena) {
+    BoxHandle_TCY handle;
+    if (arena->num_free) {
+        handle = arena->free_handles[--arena->num_free];
+    } else {
+        handle = arena->top;
+        if ((handle >> BOX_ARENA_CHUNK_BITS) >= arena->num_chunks && _box_arena_grow(arena))
+            return NULL;
+        arena->top++;
+    }
+    Box_TCY *box = box_arena_get(arena, handle);
+    memset(box, 0, sizeof(Box_TCY));
+    box->handle = handle;
+    arena->num_live++;
+    return box;
+}
+
+void box_arena_free(BoxArena_TCY *arena, Box_TCY *box) {
+    if (box->handle == BOX_HANDLE_NONE)
+        return;
+    if (arena->num_free == arena->cap_free) {
+        uint32_t cap = arena->cap_free ? arena->cap_free * 2 : 1024;
+        BoxHandle_TCY *handles = (BoxHandle_TCY *) realloc(arena->free_handles, sizeof(BoxHandle_TCY) * cap);
+        if (!handles) return;
+        arena->free_handles = handles;
+        arena->cap_free = cap;
+    }
+    arena->free_handles[arena->num_free++] = box->handle;
+    box->handle = BOX_HANDLE_NONE;
+    arena->num_live--;
+}
+
+size_t box_arena_capacity(const BoxArena_TCY *arena) {
+    return (size_t) arena->num_chunks * BOX_ARENA_CHUNK_SIZE;
+}
@@ -3,6 +3,9 @@
 //
 
 #include "../include/define.h"
+#include "../include/arena.h"
+#include "../include/lock.h"
+#include "../include/height.h"
 #include "../include/block.h"
 #include "../include/error.h"
 #include "../include/box.h"
@@ -10,14 +13,21 @@
 #include <string.h>
 #include <assert.h>
 
+static void _blk_init_free_stacks(Block_TCY *blk, CellIdx_TCY stack_num);
+
 void block_init(Block_TCY *blk, const CellIdx_TCY *spec, int box_orientation, int stacking_axis,
-                const bool *axis_need_sync) {
+                const bool *axis_need_sync, BoxArena_TCY *arena) {
     blk->cell_num = spec[0] * spec[1] * spec[2];
     blk->cells = (Cell_TCY *) malloc(sizeof(Cell_TCY) * blk->cell_num);
     blk->box_orientation = box_orientation;
     blk->stacking_axis = stacking_axis;
+    blk->version = 0;
+    blk->arena = arena;
+    blk->registry = NULL;
 
     memset(blk->cells, 0, sizeof(Cell_TCY) * blk->cell_num);
+    blk->cell_states = (int8_t *) malloc(sizeof(int8_t) * blk->cell_num);
+    memset(blk->cell_states, CELL_STATE_EMPTY, sizeof(int8_t) * blk->cell_num);
     memcpy(blk->spec, spec, sizeof(CellIdx_TCY) * 3);
     memcpy(blk->column_sync, axis_need_sync, sizeof(bool) * 3);
 
@@ -42,15 +52,47 @@ void block_init(Block_TCY *blk, const CellIdx_TCY *spec, int box_orientation, in
             stack_num *= spec[i];
     blk->lock_map = malloc(sizeof(bool) * stack_num);
     memset(blk->lock_map, 0, sizeof(bool) * stack_num);
+    stack_locks_init(&blk->locks, stack_num, blk->lock_map);
+    if (stacking_axis >= 0)
+        height_index_init(&blk->heights, spec[stacking_axis == 0 ? 1 : 0], spec[stacking_axis == 2 ? 1 : 2]);
+    else
+        memset(&blk->heights, 0, sizeof(HeightIndex_TCY));
+
+    _blk_init_free_stacks(blk, stack_num);
 }
 
 void block_destroy(Block_TCY *blk) {
+    Box_TCY *box;
+    // boxes left without a Python object are owned by the block, the others are detached from it
+    for (CellIdx_TCY i = 0; i < blk->cell_num; ++i) {
+        box = box_arena_get(blk->arena, blk->cells[i]);
+        if (!box || box->handle != blk->cells[i])
+            continue;
+        if (box->state == BOX_STATE_PLACEHOLDER && box->_holder_or_origin) {
+            box->_holder_or_origin->_holder_or_origin = NULL;
+            box->_holder_or_origin->block = NULL;
+        }
+        if (box->_self == NULL) {
+            box_destroy(box);
+            box_arena_free(blk->arena, box);
+        }
+        else
+            box->block = NULL;
+    }
     free(blk->cells);
+    free(blk->cell_states);
     for (int i = 0; i < 3; ++i) {
         if (blk->column_use_type[i]) free(blk->column_use_type[i]);
         free(blk->column_usage_occupied[i]);
         free(blk->column_usage[i]);
     }
+    stack_locks_destroy(&blk->locks);
+    height_index_destroy(&blk->heights);
+    free(blk->lock_map);
+    for (int s = 0; s < 2; ++s) {
+        if (blk->free_stacks[s]) free(blk->free_stacks[s]);
+        if (blk->free_stack_pos[s]) free(blk->free_stack_pos[s]);
+    }
 }
 
 CellIdx_TCY _blk_clmn_idx(Block_TCY *blk, const CellIdx_TCY *loc, int along) {
@@ -69,20 +111,38 @@ inline CellIdx_TCY _blk_cell_idx(Block_TCY *blk, const CellIdx_TCY *loc) {
     return (loc[0] * blk->spec[1] + loc[1]) * blk->spec[2] + loc[2];
 }
 
+static inline void _blk_set_cell(Block_TCY *blk, CellIdx_TCY idx, Box_TCY *box) {
+    blk->cells[idx] = box ? box->handle : BOX_HANDLE_NONE;
+    blk->cell_states[idx] = box ? (int8_t) box->state : CELL_STATE_EMPTY;
+}
+
 void _blk_link_cell(Block_TCY *blk, Box_TCY *box) {
-    blk->cells[_blk_cell_idx(blk, box->loc)] = box;
+    _blk_set_cell(blk, _blk_cell_idx(blk, box->loc), box);
     if (box->size == BOX_SIZE_FORTY) {
         box->loc[blk->box_orientation]++;
-        blk->cells[_blk_cell_idx(blk, box->loc)] = box;
+        _blk_set_cell(blk, _blk_cell_idx(blk, box->loc), box);
         box->loc[blk->box_orientation]--;
     }
 }
 
 void _blk_unlink_cell(Block_TCY *blk, Box_TCY *box) {
-    blk->cells[_blk_cell_idx(blk, box->loc)] = NULL;
+    _blk_set_cell(blk, _blk_cell_idx(blk, box->loc), NULL);
+    if (box->size == BOX_SIZE_FORTY) {
+        box->loc[blk->box_orientation]++;
+        _blk_set_cell(blk, _blk_cell_idx(blk, box->loc), NULL);
+        box->loc[blk->box_orientation]--;
+    }
+}
+
+void _blk_refresh_cell_state(Block_TCY *blk, Box_TCY *box) {
+    CellIdx_TCY idx = _blk_cell_idx(blk, box->loc);
+    if (blk->cells[idx] == box->handle)
+        blk->cell_states[idx] = (int8_t) box->state;
     if (box->size == BOX_SIZE_FORTY) {
         box->loc[blk->box_orientation]++;
-        blk->cells[_blk_cell_idx(blk, box->loc)] = NULL;
+        idx = _blk_cell_idx(blk, box->loc);
+        if (blk->cells[idx] == box->handle)
+            blk->cell_states[idx] = (int8_t) box->state;
         box->loc[blk->box_orientation]--;
     }
 }
@@ -100,7 +160,7 @@ Box_TCY *_blk_neighbor_box(Block_TCY *blk, Box_TCY *box, int along, bool inc) {
     if (loc2[along] >= blk->spec[along] || loc2[along] < 0)
         return NULL;
     else {
-        return blk->cells[_blk_cell_idx(blk, loc2)];
+        return box_arena_get(blk->arena, blk->cells[_blk_cell_idx(blk, loc2)]);
     }
 }
 
@@ -147,7 +207,7 @@ int block_usage(Block_TCY *blk, const CellIdx_TCY *loc, bool include_occupied) {
 }
 
 inline Box_TCY *block_box_at(Block_TCY *blk, const CellIdx_TCY *idx) {
-    Box_TCY *res = blk->cells[_blk_cell_idx(blk, idx)];
+    Box_TCY *res = box_arena_get(blk->arena, blk->cells[_blk_cell_idx(blk, idx)]);
     return res;
 }
 
@@ -166,6 +226,22 @@ void _blk_top_of_stack(Block_TCY *blk, CellIdx_TCY *idx) {
         idx[along] = blk->column_usage[along][_blk_clmn_idx(blk, idx, along)];
 }
 
+void _blk_refresh_stack_height(Block_TCY *blk, const CellIdx_TCY *loc) {
+    int along = blk->stacking_axis;
+    height_index_set(&blk->heights, loc[along == 0 ? 1 : 0], loc[along == 2 ? 1 : 2],
+                     blk->column_usage[along][_blk_clmn_idx(blk, loc, along)]);
+}
+
+// Highest stack, not counting the occupied slots, with its position in
+// [start, finish) along the two axes other than the stacking one; -1 if the
+// block has no stacking axis.
+int block_max_stack_height(Block_TCY *blk, const CellIdx_TCY *start, const CellIdx_TCY *finish) {
+    int along = blk->stacking_axis, a0 = along == 0 ? 1 : 0, a1 = along == 2 ? 1 : 2;
+    if (along < 0)
+        return -1;
+    return height_index_max(&blk->heights, start[a0], finish[a0], start[a1], finish[a1]);
+}
+
 CellIdx_TCY blk_stack_hash(Block_TCY *blk, const CellIdx_TCY *idx) {
     CellIdx_TCY map_idx = 0;
     CellIdx_TCY k = 1;
@@ -319,6 +395,51 @@ int block_all_slot_states(Block_TCY *blk, int norm_axis, int *results) {
     return 0;
 }
 
+int blocks_fill_stack_tensor(Block_TCY **blks, int num, CellIdx_TCY size0, CellIdx_TCY size1, bool include_occupied,
+                             uint64_t *versions, int *heights, int *slot_states) {
+    CellIdx_TCY tmp_loc[3];
+    CellIdx_TCY a0, a1, axis;
+    CellIdx_TCY **usages;
+    Block_TCY *blk;
+    int *blk_heights, *blk_states;
+    int refreshed = 0;
+
+    for (int b = 0; b < num; ++b) {
+        blk = blks[b];
+        if (versions && versions[b] == blk->version)
+            continue;
+
+        axis = blk->stacking_axis;
+        if (_other_axes(axis, &a0, &a1)) return -1;
+        if (blk->spec[a0] > size0 || blk->spec[a1] > size1) return -3;
+
+        usages = include_occupied ? blk->column_usage_occupied : blk->column_usage;
+        blk_heights = heights + (size_t) b * size0 * size1;
+        blk_states = slot_states + (size_t) b * size0;
+
+        for (int i = 0; i < size0; ++i) {
+            tmp_loc[a0] = i;
+            for (int j = 0; j < size1; ++j) {
+                tmp_loc[a1] = j;
+                if (i < blk->spec[a0] && j < blk->spec[a1])
+                    blk_heights[i * size1 + j] = usages[axis][_blk_clmn_idx(blk, tmp_loc, axis)];
+                else
+                    blk_heights[i * size1 + j] = -1;
+            }
+        }
+
+        if (block_all_slot_states(blk, a0, blk_states) < 0) return -2;
+        for (int i = blk->spec[a0]; i < size0; ++i)
+            blk_states[i] = -1;
+
+        if (versions)
+            versions[b] = blk->version;
+        refreshed++;
+    }
+
+    return refreshed;
+}
+
 int block_validate_all_slots_for_size(Block_TCY *blk, int norm_axis, BoxSize_TCY box_size, bool *results) {
     SlotUsage_TCY clmn_ut, clmn_ut2 = SLOT_USAGE_FREE;
     CellIdx_TCY tmp_idx[3];
@@ -368,3 +489,241 @@ int block_validate_all_slots_for_size(Block_TCY *blk, int norm_axis, BoxSize_TCY
     }
     return 0;
 }
+
+static inline SlotUsage_TCY _blk_slot_state(Block_TCY *blk, int norm_axis, int a0, int a1, CellIdx_TCY i) {
+    CellIdx_TCY tmp_idx[3];
+    tmp_idx[norm_axis] = i;
+    tmp_idx[a0] = tmp_idx[a1] = 0;
+    if (blk->column_use_type[a0])
+        return blk->column_use_type[a0][_blk_clmn_idx(blk, tmp_idx, a0)];
+    else if (blk->column_use_type[a1])
+        return blk->column_use_type[a1][_blk_clmn_idx(blk, tmp_idx, a1)];
+    else
+        return SLOT_USAGE_FREE;
+}
+
+int block_available_cells(Block_TCY *blk, int norm_axis, BoxSize_TCY box_size, CellIdx_TCY start,
+                          CellIdx_TCY finish, bool allow_new_slot, CellIdx_TCY own_slot,
+                          int max_slot_usage, int *results) {
+    CellIdx_TCY tmp_idx[3];
+    CellIdx_TCY a0, a1, row_axis;
+    int along = blk->stacking_axis;
+    int num = 0;
+    bool slot_avail;
+
+    if (along < 0 || along == norm_axis) return -1;
+    if (_other_axes(norm_axis, &a0, &a1)) return -1;
+    row_axis = a0 == along ? a1 : a0;
+
+    if (start < 0) start = 0;
+    if (finish < 0 || finish > blk->spec[norm_axis]) finish = blk->spec[norm_axis];
+
+    for (CellIdx_TCY i = start; i < finish; ++i) {
+        tmp_idx[norm_axis] = i;
+        tmp_idx[a0] = tmp_idx[a1] = 0;
+        if (i == own_slot)
+            slot_avail = TRUE;
+        else if (!allow_new_slot && _blk_slot_state(blk, norm_axis, a0, a1, i) == SLOT_USAGE_FREE)
+            slot_avail = FALSE;
+        else if (block_position_is_valid_for_size(blk, tmp_idx, box_size)) {
+            if (max_slot_usage >= 0) {
+                tmp_idx[a0] = tmp_idx[a1] = -1;
+                slot_avail = block_usage(blk, tmp_idx, TRUE) < max_slot_usage;
+            } else
+                slot_avail = TRUE;
+        } else
+            slot_avail = FALSE;
+
+        if (!slot_avail) continue;
+
+        tmp_idx[norm_axis] = i;
+        for (CellIdx_TCY j = 0; j < blk->spec[row_axis]; ++j) {
+            tmp_idx[row_axis] = j;
+            tmp_idx[along] = BLK_USAGE_OCCUPIED(blk, tmp_idx, along);
+            if (block_position_is_valid_for_size(blk, tmp_idx, box_size)) {
+                for (int k = 0; k < 3; k++) results[num * 3 + k] = tmp_idx[k];
+                num++;
+            }
+        }
+    }
+    return num;
+}
+
+/*
+ * Best k cells to put a box of box_size on top of a stack, scanning the slots from start towards finish (excluded,
+ * backwards if finish < start) and the rows in order. A slot qualifies like in block_available_cells with
+ * allow_new_slot, own_slot always qualifying; the stacks in excluded (stack hashes) are skipped. A cell scores
+ * weights[0] * |slot - own_slot| + weights[1] * tier + weights[2] * locked, the lowest first and the earliest
+ * scanned among equals, so with null weights the first cell is the first valid one of the scan.
+ */
+int block_ranked_cells(Block_TCY *blk, int norm_axis, BoxSize_TCY box_size, CellIdx_TCY own_slot,
+                       CellIdx_TCY start, CellIdx_TCY finish, int max_slot_usage,
+                       const CellIdx_TCY *excluded, int num_excluded, const double *weights,
+                       int k, int *results, double *scores) {
+    CellIdx_TCY tmp_idx[3];
+    CellIdx_TCY a0, a1, row_axis, hash;
+    int along = blk->stacking_axis;
+    int num = 0, step, n, e;
+    bool skip;
+    double score, dist;
+
+    if (along < 0 || along == norm_axis || k <= 0) return -1;
+    if (_other_axes(norm_axis, &a0, &a1)) return -1;
+    row_axis = a0 == along ? a1 : a0;
+    step = finish < start ? -1 : 1;
+
+    for (CellIdx_TCY i = start; i != finish; i += step) {
+        if (i < 0 || i >= blk->spec[norm_axis])
+            continue;
+        tmp_idx[norm_axis] = i;
+        tmp_idx[a0] = tmp_idx[a1] = 0;
+        if (i != own_slot) {
+            if (!block_position_is_valid_for_size(blk, tmp_idx, box_size))
+                continue;
+            if (max_slot_usage >= 0) {
+                tmp_idx[a0] = tmp_idx[a1] = -1;
+                if (block_usage(blk, tmp_idx, TRUE) >= max_slot_usage)
+                    continue;
+            }
+        }
+        dist = i > own_slot ? i - own_slot : own_slot - i;
+
+        tmp_idx[norm_axis] = i;
+        for (CellIdx_TCY j = 0; j < blk->spec[row_axis]; ++j) {
+            tmp_idx[row_axis] = j;
+            tmp_idx[along] = 0;
+            hash = blk_stack_hash(blk, tmp_idx);
+            skip = FALSE;
+            for (e = 0; e < num_excluded && !skip; ++e)
+                skip = excluded[e] == hash;
+            if (skip)
+                continue;
+            tmp_idx[along] = BLK_USAGE_OCCUPIED(blk, tmp_idx, along);
+            if (!block_position_is_valid_for_size(blk, tmp_idx, box_size))
+                continue;
+            score = weights[0] * dist + weights[1] * tmp_idx[along] + weights[2] * (blk->lock_map[hash] ? 1 : 0);
+            if (num == k && score >= scores[k - 1])
+                continue;
+            // insertion into the sorted top k, after the equal scores
+            n = num < k ? num++ : k - 1;
+            while (n > 0 && scores[n - 1] > score) {
+                scores[n] = scores[n - 1];
+                memcpy(results + n * 3, results + (n - 1) * 3, sizeof(int) * 3);
+                n--;
+            }
+            scores[n] = score;
+            for (int d = 0; d < 3; d++) results[n * 3 + d] = tmp_idx[d];
+        }
+    }
+    return num;
+}
+
+/*
+ * Free stack index: for each box size, the stacks whose top-of-stack cell is a valid position for that size,
+ * kept as a sparse set of stack hashes (free_stacks holds the members densely, free_stack_pos maps a stack hash
+ * to its position in free_stacks or -1).
+ */
+
+static inline void _blk_stack_from_hash(Block_TCY *blk, CellIdx_TCY hash, CellIdx_TCY *idx) {
+    for (int i = 2; i >= 0; --i)
+        if (i != blk->stacking_axis) {
+            idx[i] = hash % blk->spec[i];
+            hash /= blk->spec[i];
+        }
+}
+
+static inline void _blk_refresh_free_stack(Block_TCY *blk, CellIdx_TCY *idx) {
+    CellIdx_TCY hash = blk_stack_hash(blk, idx);
+    CellIdx_TCY *pos, last;
+    bool valid;
+
+    idx[blk->stacking_axis] = BLK_USAGE_OCCUPIED(blk, idx, blk->stacking_axis);
+    for (int s = 0; s < 2; ++s) {
+        valid = block_position_is_valid_for_size(blk, idx, (BoxSize_TCY) s);
+        pos = blk->free_stack_pos[s];
+        if (valid && pos[hash] < 0) {
+            pos[hash] = blk->free_stack_num[s];
+            blk->free_stacks[s][blk->free_stack_num[s]++] = hash;
+        } else if (!valid && pos[hash] >= 0) {
+            last = blk->free_stacks[s][--blk->free_stack_num[s]];
+            blk->free_stacks[s][pos[hash]] = last;
+            pos[last] = pos[hash];
+            pos[hash] = -1;
+        }
+    }
+}
+
+static void _blk_init_free_stacks(Block_TCY *blk, CellIdx_TCY stack_num) {
+    CellIdx_TCY idx[3];
+
+    for (int s = 0; s < 2; ++s) {
+        blk->free_stack_num[s] = 0;
+        blk->free_stacks[s] = NULL;
+        blk->free_stack_pos[s] = NULL;
+    }
+    if (blk->stacking_axis < 0 || blk->stacking_axis == blk->box_orientation)
+        return;
+
+    for (int s = 0; s < 2; ++s) {
+        blk->free_stacks[s] = (CellIdx_TCY *) malloc(sizeof(CellIdx_TCY) * stack_num);
+        blk->free_stack_pos[s] = (CellIdx_TCY *) malloc(sizeof(CellIdx_TCY) * stack_num);
+        for (CellIdx_TCY h = 0; h < stack_num; ++h)
+            blk->free_stack_pos[s][h] = -1;
+    }
+    for (CellIdx_TCY h = 0; h < stack_num; ++h) {
+        _blk_stack_from_hash(blk, h, idx);
+        _blk_refresh_free_stack(blk, idx);
+    }
+}
+
+void _blk_refresh_free_stacks(Block_TCY *blk, Box_TCY *box) {
+    CellIdx_TCY idx[3];
+    CellIdx_TCY first, last;
+    int along = blk->stacking_axis;
+    int ori = blk->box_orientation;
+    int row_axis = 3 - along - ori;
+
+    if (!blk->free_stacks[0]) return;
+
+    /* a stack's validity depends on the column states of its own cell and, for 40ft boxes,
+     * of the neighbouring cell along the box orientation */
+    if (blk->column_sync[ori] && blk->column_use_type[ori]) {
+        first = 0;
+        last = blk->spec[ori] - 1;
+    } else {
+        first = box->loc[ori] > 0 ? box->loc[ori] - 1 : 0;
+        last = box->loc[ori] + (box->size == BOX_SIZE_FORTY ? 1 : 0);
+        if (last >= blk->spec[ori]) last = blk->spec[ori] - 1;
+    }
+
+    for (CellIdx_TCY i = first; i <= last; ++i)
+        for (CellIdx_TCY j = 0; j < blk->spec[row_axis]; ++j) {
+            idx[ori] = i;
+            idx[row_axis] = j;
+            _blk_refresh_free_stack(blk, idx);
+        }
+}
+
+CellIdx_TCY block_free_stack_num(Block_TCY *blk, BoxSize_TCY box_size) {
+    return blk->free_stack_num[box_size];
+}
+
+int block_free_stack(Block_TCY *blk, BoxSize_TCY box_size, CellIdx_TCY k, CellIdx_TCY *idx) {
+    if (!blk->free_stacks[box_size] || k < 0 || k >= blk->free_stack_num[box_size]) return -1;
+    _blk_stack_from_hash(blk, blk->free_stacks[box_size][k], idx);
+    idx[blk->stacking_axis] = BLK_USAGE_OCCUPIED(blk, idx, blk->stacking_axis);
+    return 0;
+}
+
+int block_all_free_stacks(Block_TCY *blk, BoxSize_TCY box_size, int *results) {
+    CellIdx_TCY idx[3];
+    CellIdx_TCY num = blk->free_stack_num[box_size];
+
+    if (!blk->free_stacks[box_size]) return -1;
+    for (CellIdx_TCY k = 0; k < num; ++k) {
+        _blk_stack_from_hash(blk, blk->free_stacks[box_size][k], idx);
+        idx[blk->stacking_axis] = BLK_USAGE_OCCUPIED(blk, idx, blk->stacking_axis);
+        for (int i = 0; i < 3; i++) results[k * 3 + i] = idx[i];
+    }
+    return num;
+}
@@ -5,7 +5,9 @@
 #include <string.h>
 #include <stdlib.h>
 #include <assert.h>
+#include "../include/arena.h"
 #include "../include/box.h"
+#include "../include/registry.h"
 #include "../include/block.h"
 #include "../include/define.h"
 #include "../include/error.h"
@@ -53,18 +55,23 @@ static inline void _box_adjust_usage(Block_TCY *blk, Box_TCY *box, int delta, bo
                        box->loc[1], box->loc[2], BLK_USAGE(blk, box->loc, i));
             assert(BLK_USAGE(blk, box->loc, i) >= 0 && BLK_USAGE(blk, box->loc, i) <= blk->spec[i]);
         }
+        if (blk->stacking_axis >= 0)
+            _blk_refresh_stack_height(blk, box->loc);
     }
 }
 
 static inline void _box_adjust_and_mark_usage(Block_TCY *blk, Box_TCY *box, int delta, bool occupied) {
+    blk->version++;
     _box_adjust_usage(blk, box, delta, occupied);
     if (box->size == BOX_SIZE_FORTY) {
         box->loc[blk->box_orientation]++;
         _box_adjust_usage(blk, box, delta, occupied);
         box->loc[blk->box_orientation]--;
     }
-    if (occupied)
+    if (occupied) {
         _box_mark_usage(blk, box, delta);
+        _blk_refresh_free_stacks(blk, box);
+    }
 }
 
 int _box_swap(Box_TCY *box, int along) {
@@ -147,7 +154,33 @@ void box_init(Box_TCY *box, char *box_id, BoxSize_TCY size) {
     box->_holder_or_origin = NULL;
 }
 
-void box_destroy(Box_TCY *box) {}
+void box_destroy(Box_TCY *box) {
+    if (box->registry)
+        box_registry_remove(box->registry, box);
+}
+
+bool box_in_block(Box_TCY *box) {
+    Block_TCY *blk = box->block;
+    if (!blk)
+        return FALSE;
+    if (box->_holder_or_origin)
+        return TRUE;
+    for (int i = 0; i < 3; ++i)
+        if (box->loc[i] < 0 || box->loc[i] >= blk->spec[i])
+            return FALSE;
+    return blk->cells[_blk_cell_idx(blk, box->loc)] == box->handle;
+}
+
+void box_set_state(Box_TCY *box, BoxState_TCY state) {
+    // a retrieved box has left the yard, and so the registry
+    if (box->registry && state == BOX_STATE_RETRIEVED)
+        box_registry_remove(box->registry, box);
+    else if (box->registry && box->state != state)
+        box_registry_move(box->registry, box, state);
+    box->state = state;
+    if (box->block)
+        _blk_refresh_cell_state(box->block, box);
+}
 
 int box_alloc(Box_TCY *box, Time_TCY time) {
     struct Block_TCY *blk = box->block;
@@ -169,8 +202,11 @@ int box_alloc(Box_TCY *box, Time_TCY time) {
     _blk_link_cell(blk, box);
     _box_adjust_and_mark_usage(blk, box, 1, TRUE);
 
+    if (blk->registry && box->state != BOX_STATE_PLACEHOLDER)
+        box_registry_add(blk->registry, box);
+
     if (time >= 0 && box->state != BOX_STATE_PLACEHOLDER)
-        box->state = BOX_STATE_ALLOCATED;
+        box_set_state(box, BOX_STATE_ALLOCATED);
 
     return SUCCEED;
 }
@@ -192,7 +228,7 @@ int box_store(Box_TCY *box, Time_TCY time) {
         _box_sink(box);
 
     _box_adjust_and_mark_usage(blk, box, 1, FALSE);
-    box->state = BOX_STATE_STORED;
+    box_set_state(box, BOX_STATE_STORED);
 
     return SUCCEED;
 }
@@ -212,13 +248,20 @@ int box_retrieve(Box_TCY *box, Time_TCY time) {
         _box_adjust_and_mark_usage(blk, box, -1, FALSE);
 
     if (time >= 0)
-        box->state = BOX_STATE_RETRIEVING;
+        box_set_state(box, BOX_STATE_RETRIEVING);
     return SUCCEED;
 }
 
 int box_place_holder(Box_TCY *box, CellIdx_TCY *new_loc) {
-    Box_TCY *holder = (Box_TCY *) malloc(sizeof(Box_TCY));
+    Box_TCY *holder = box_arena_new(box->block->arena);
+    if (!holder)
+        return ERROR_OUT_OF_MEMORY;
+    BoxHandle_TCY handle = holder->handle;
     memcpy(holder, box, sizeof(Box_TCY));
+    holder->handle = handle;
+    holder->_self = NULL;
+    holder->registry = NULL;
+    holder->_state_prev = holder->_state_next = BOX_HANDLE_NONE;
     holder->state = BOX_STATE_PLACEHOLDER;
     holder->_holder_or_origin = box;
 
@@ -243,18 +286,20 @@ int box_remove_holder(Box_TCY *box) {
     if ((res = box_retrieve(holder, -1)) != SUCCEED)
         return res;
 
-    box_destroy(box->_holder_or_origin);
-    free(box->_holder_or_origin);
+    box_destroy(holder);
+    box_arena_free(box->block->arena, holder);
 
     box->_holder_or_origin = NULL;
     return SUCCEED;
 }
 
 int box_realloc(Box_TCY *box, Time_TCY time, CellIdx_TCY *new_loc) {
-    box_place_holder(box, NULL);
+    int res;
+    if ((res = box_place_holder(box, NULL)) != SUCCEED)
+        return res;
 
     memcpy(box->loc, new_loc, sizeof(CellIdx_TCY) * 3);
-    int res = box_alloc(box, -1);
+    res = box_alloc(box, -1);
     return res;
 }
 
@@ -273,7 +318,7 @@ int box_relocate_retrieve(Box_TCY *box, Time_TCY time) {
         return res;
     }
 //    printf("%s relocating\n", box->id);
-    box->state = BOX_STATE_RELOCATING;
+    box_set_state(box, BOX_STATE_RELOCATING);
     return SUCCEED;
 }
 
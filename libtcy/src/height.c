@@ -0,0 +1,76 @@
+//
+// Maximum stack height over a rectangle of stacks.
+//
+// The heights of a size0 x size1 grid of stacks are kept in a bottom-up 2D
+// segment tree: a segment tree along the first axis whose nodes are segment
+// trees along the second one, both stored as the usual implicit arrays of
+// 2 * size nodes with the leaves at [size, 2 * size). Setting a height and
+// querying a rectangle both visit O(log size0 * log size1) nodes.
+//
+
+#include <stdlib.h>
+#include <string.h>
+#include "../include/height.h"
+
+#define NODE(index, p, q) ((index)->tree[(p) * 2 * (index)->size1 + (q)])
+#define MAX(a, b) ((a) > (b) ? (a) : (b))
+
+int height_index_init(HeightIndex_TCY *index, CellIdx_TCY size0, CellIdx_TCY size1) {
+    index->size0 = size0;
+    index->size1 = size1;
+    index->tree = (CellIdx_TCY *) calloc((size_t) 4 * size0 * size1, sizeof(CellIdx_TCY));
+    return index->tree ? 0 : -1;
+}
+
+void height_index_destroy(HeightIndex_TCY *index) {
+    free(index->tree);
+    memset(index, 0, sizeof(HeightIndex_TCY));
+}
+
+void height_index_set(HeightIndex_TCY *index, CellIdx_TCY i, CellIdx_TCY j, CellIdx_TCY height) {
+    CellIdx_TCY p = i + index->size0, q;
+    NODE(index, p, j + index->size1) = height;
+    for (q = (j + index->size1) >> 1; q >= 1; q >>= 1)
+        NODE(index, p, q) = MAX(NODE(index, p, 2 * q), NODE(index, p, 2 * q + 1));
+    for (p >>= 1; p >= 1; p >>= 1)
+        for (q = j + index->size1; q >= 1; q >>= 1)
+            NODE(index, p, q) = MAX(NODE(index, 2 * p, q), NODE(index, 2 * p + 1, q));
+}
+
+static inline CellIdx_TCY _row_max(const HeightIndex_TCY *index, CellIdx_TCY p, CellIdx_TCY j0, CellIdx_TCY j1) {
+    CellIdx_TCY h = 0;
+    for (j0 += index->size1, j1 += index->size1; j0 < j1; j0 >>= 1, j1 >>= 1) {
+        if (j0 & 1) {
+            h = MAX(h, NODE(index, p, j0));
+            j0++;
+        }
+        if (j1 & 1) {
+            j1--;
+            h = MAX(h, NODE(index, p, j1));
+        }
+    }
+    return h;
+}
+
+// Highest stack in [i0, i1) x [j0, j1), 0 if the rectangle is empty.
+CellIdx_TCY height_index_max(const HeightIndex_TCY *index, CellIdx_TCY i0, CellIdx_TCY i1, CellIdx_TCY j0,
+                             CellIdx_TCY j1) {
+    CellIdx_TCY h = 0;
+    if (i0 < 0) i0 = 0;
+    if (j0 < 0) j0 = 0;
+    if (i1 > index->size0) i1 = index->size0;
+    if (j1 > index->size1) j1 = index->size1;
+    if (i0 >= i1 || j0 >= j1)
+        return 0;
+    for (i0 += index->size0, i1 += index->size0; i0 < i1; i0 >>= 1, i1 >>= 1) {
+        if (i0 & 1) {
+            h = MAX(h, _row_max(index, i0, j0, j1));
+            i0++;
+        }
+        if (i1 & 1) {
+            i1--;
+            h = MAX(h, _row_max(index, i1, j0, j1));
+        }
+    }
+    return h;
+}
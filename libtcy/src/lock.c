@@ -0,0 +1,189 @@
+//
+// Stack locks of a block with owners, FIFO wait queues and contention counters.
+//
+// Holders and waiters are small integer tokens handed out by the caller. A
+// token is queued at most once per stack and counts the stacks it waits on
+// (pending) as well as the stacks it holds or waits on (refs), so the caller
+// knows when a token can be recycled. Releasing a stack empties its queue and
+// reports, in arrival order, only the waiters that no longer wait on any
+// other stack. The lock flags themselves are the lock_map of the block, so
+// block_lock()/block_unlock() still work, bypassing owners and queues.
+//
+
+#include <stdlib.h>
+#include <string.h>
+#include "../include/lock.h"
+
+#define LOCK_NODE_NONE (-1)
+#define LOCK_INIT_NODES 16
+#define LOCK_INIT_TOKENS 16
+
+int stack_locks_init(StackLockTable_TCY *locks, CellIdx_TCY num_stacks, bool *locked) {
+    locks->num_stacks = num_stacks;
+    locks->locked = locked;
+    locks->owners = (int32_t *) malloc(sizeof(int32_t) * num_stacks);
+    locks->heads = (int32_t *) malloc(sizeof(int32_t) * num_stacks);
+    locks->tails = (int32_t *) malloc(sizeof(int32_t) * num_stacks);
+    locks->queue_lens = (int32_t *) calloc(num_stacks, sizeof(int32_t));
+    locks->max_queue_lens = (int32_t *) calloc(num_stacks, sizeof(int32_t));
+    locks->acquisitions = (uint64_t *) calloc(num_stacks, sizeof(uint64_t));
+    locks->contentions = (uint64_t *) calloc(num_stacks, sizeof(uint64_t));
+    locks->nodes = NULL;
+    locks->num_nodes = locks->cap_nodes = 0;
+    locks->free_node = LOCK_NODE_NONE;
+    locks->pending = locks->refs = NULL;
+    locks->cap_tokens = 0;
+    if (!locks->owners || !locks->heads || !locks->tails || !locks->queue_lens || !locks->max_queue_lens ||
+        !locks->acquisitions || !locks->contentions)
+        return -1;
+    for (CellIdx_TCY i = 0; i < num_stacks; ++i) {
+        locks->owners[i] = LOCK_OWNER_NONE;
+        locks->heads[i] = locks->tails[i] = LOCK_NODE_NONE;
+    }
+    return 0;
+}
+
+void stack_locks_destroy(StackLockTable_TCY *locks) {
+    free(locks->owners);
+    free(locks->heads);
+    free(locks->tails);
+    free(locks->queue_lens);
+    free(locks->max_queue_lens);
+    free(locks->acquisitions);
+    free(locks->contentions);
+    free(locks->nodes);
+    free(locks->pending);
+    free(locks->refs);
+    memset(locks, 0, sizeof(StackLockTable_TCY));
+}
+
+static int _reserve_tokens(StackLockTable_TCY *locks, int32_t num) {
+    int32_t cap = locks->cap_tokens ? locks->cap_tokens : LOCK_INIT_TOKENS;
+    int32_t *pending, *refs;
+    if (num <= locks->cap_tokens)
+        return 0;
+    while (cap < num)
+        cap *= 2;
+    pending = (int32_t *) realloc(locks->pending, sizeof(int32_t) * cap);
+    if (!pending)
+        return -1;
+    locks->pending = pending;
+    refs = (int32_t *) realloc(locks->refs, sizeof(int32_t) * cap);
+    if (!refs)
+        return -1;
+    locks->refs = refs;
+    memset(pending + locks->cap_tokens, 0, sizeof(int32_t) * (cap - locks->cap_tokens));
+    memset(refs + locks->cap_tokens, 0, sizeof(int32_t) * (cap - locks->cap_tokens));
+    locks->cap_tokens = cap;
+    return 0;
+}
+
+static bool _is_queued(const StackLockTable_TCY *locks, CellIdx_TCY stack, int32_t token) {
+    for (int32_t n = locks->heads[stack]; n != LOCK_NODE_NONE; n = locks->nodes[n].next)
+        if (locks->nodes[n].token == token)
+            return TRUE;
+    return FALSE;
+}
+
+static int _enqueue(StackLockTable_TCY *locks, CellIdx_TCY stack, int32_t token) {
+    int32_t n = locks->free_node;
+    LockWaitNode_TCY *nodes;
+    if (n != LOCK_NODE_NONE) {
+        locks->free_node = locks->nodes[n].next;
+    } else {
+        if (locks->num_nodes == locks->cap_nodes) {
+            int32_t cap = locks->cap_nodes ? locks->cap_nodes * 2 : LOCK_INIT_NODES;
+            nodes = (LockWaitNode_TCY *) realloc(locks->nodes, sizeof(LockWaitNode_TCY) * cap);
+            if (!nodes)
+                return -1;
+            locks->nodes = nodes;
+            locks->cap_nodes = cap;
+        }
+        n = locks->num_nodes++;
+    }
+    locks->nodes[n].token = token;
+    locks->nodes[n].next = LOCK_NODE_NONE;
+    if (locks->tails[stack] == LOCK_NODE_NONE)
+        locks->heads[stack] = n;
+    else
+        locks->nodes[locks->tails[stack]].next = n;
+    locks->tails[stack] = n;
+    if (++locks->queue_lens[stack] > locks->max_queue_lens[stack])
+        locks->max_queue_lens[stack] = locks->queue_lens[stack];
+    locks->pending[token]++;
+    locks->refs[token]++;
+    return 0;
+}
+
+// Lock all the stacks for token, or none of them: on failure, token is queued
+// on every locked stack it did not wait on yet and the locked stacks are
+// written to failed. Return the number of failed stacks, 0 if all the stacks
+// were locked, or -1 if out of memory.
+int stack_locks_acquire(StackLockTable_TCY *locks, int32_t token, const CellIdx_TCY *stacks, int num,
+                        CellIdx_TCY *failed) {
+    int num_failed = 0;
+    CellIdx_TCY s;
+    if (_reserve_tokens(locks, token + 1) < 0)
+        return -1;
+    for (int i = 0; i < num; ++i) {
+        s = stacks[i];
+        if (locks->locked[s]) {
+            locks->contentions[s]++;
+            if (!_is_queued(locks, s, token) && _enqueue(locks, s, token) < 0)
+                return -1;
+            failed[num_failed++] = s;
+        }
+    }
+    if (num_failed)
+        return num_failed;
+    for (int i = 0; i < num; ++i) {
+        s = stacks[i];
+        if (!locks->locked[s]) {
+            locks->locked[s] = TRUE;
+            locks->owners[s] = token;
+            locks->refs[token]++;
+            locks->acquisitions[s]++;
+        }
+    }
+    return 0;
+}
+
+// Unlock stack and empty its wait queue. The waiters left without any other
+// stack to wait on are written to woken, which must hold queue_lens[stack]
+// tokens, in the order they arrived; return their number.
+int stack_locks_release(StackLockTable_TCY *locks, CellIdx_TCY stack, int32_t *woken) {
+    int num_woken = 0;
+    int32_t n, next, token;
+    int32_t owner = locks->owners[stack];
+    locks->locked[stack] = FALSE;
+    if (owner != LOCK_OWNER_NONE) {
+        locks->owners[stack] = LOCK_OWNER_NONE;
+        locks->refs[owner]--;
+    }
+    for (n = locks->heads[stack]; n != LOCK_NODE_NONE; n = next) {
+        next = locks->nodes[n].next;
+        token = locks->nodes[n].token;
+        locks->nodes[n].next = locks->free_node;
+        locks->free_node = n;
+        locks->refs[token]--;
+        if (--locks->pending[token] == 0)
+            woken[num_woken++] = token;
+    }
+    locks->heads[stack] = locks->tails[stack] = LOCK_NODE_NONE;
+    locks->queue_lens[stack] = 0;
+    return num_woken;
+}
+
+int stack_locks_waiters(const StackLockTable_TCY *locks, CellIdx_TCY stack, int32_t *tokens) {
+    int num = 0;
+    for (int32_t n = locks->heads[stack]; n != LOCK_NODE_NONE; n = locks->nodes[n].next)
+        tokens[num++] = locks->nodes[n].token;
+    return num;
+}
+
+void stack_locks_reset_stats(StackLockTable_TCY *locks) {
+    memset(locks->acquisitions, 0, sizeof(uint64_t) * locks->num_stacks);
+    memset(locks->contentions, 0, sizeof(uint64_t) * locks->num_stacks);
+    for (CellIdx_TCY i = 0; i < locks->num_stacks; ++i)
+        locks->max_queue_lens[i] = locks->queue_lens[i];
+}
@@ -0,0 +1,173 @@
+//
+// Boxes of a yard by id and by state.
+//
+// The ids are kept in an open-addressing hash table of box handles with
+// linear probing, and the boxes of every state in an intrusive doubly linked
+// list threaded through Box_TCY._state_prev/_state_next, so lookups, state
+// changes and counts are O(1) and listing the boxes of a state is O(result).
+//
+
+#include <stdlib.h>
+#include <string.h>
+#include "../include/arena.h"
+#include "../include/error.h"
+#include "../include/registry.h"
+
+#define REGISTRY_INIT_CAPACITY 1024
+
+static inline uint32_t _id_hash(const char *box_id) {
+    uint32_t h = 2166136261u;
+    for (int i = 0; i < BOX_ID_LEN_LIMIT && box_id[i]; ++i) {
+        h ^= (unsigned char) box_id[i];
+        h *= 16777619u;
+    }
+    return h;
+}
+
+static inline bool _id_eq(const Box_TCY *box, const char *box_id) {
+    return strncmp(box->id, box_id, BOX_ID_LEN_LIMIT) == 0;
+}
+
+int box_registry_init(BoxRegistry_TCY *reg, BoxArena_TCY *arena) {
+    reg->arena = arena;
+    reg->capacity = REGISTRY_INIT_CAPACITY;
+    reg->num = 0;
+    reg->table = (BoxHandle_TCY *) calloc(reg->capacity, sizeof(BoxHandle_TCY));
+    for (int s = 0; s < BOX_STATE_NUM; ++s) {
+        reg->heads[s] = BOX_HANDLE_NONE;
+        reg->counts[s] = 0;
+    }
+    return reg->table ? 0 : -1;
+}
+
+void box_registry_destroy(BoxRegistry_TCY *reg) {
+    Box_TCY *box;
+    for (int s = 0; s < BOX_STATE_NUM; ++s) {
+        for (box = box_arena_get(reg->arena, reg->heads[s]); box; box = box_arena_get(reg->arena, box->_state_next))
+            box->registry = NULL;
+        reg->heads[s] = BOX_HANDLE_NONE;
+        reg->counts[s] = 0;
+    }
+    free(reg->table);
+    reg->table = NULL;
+    reg->capacity = reg->num = 0;
+}
+
+static void _table_put(BoxRegistry_TCY *reg, Box_TCY *box) {
+    uint32_t mask = reg->capacity - 1;
+    uint32_t i = _id_hash(box->id) & mask;
+    while (reg->table[i] != BOX_HANDLE_NONE)
+        i = (i + 1) & mask;
+    reg->table[i] = box->handle;
+    reg->num++;
+}
+
+static int _table_grow(BoxRegistry_TCY *reg) {
+    BoxHandle_TCY *old = reg->table;
+    uint32_t old_capacity = reg->capacity;
+    BoxHandle_TCY *table = (BoxHandle_TCY *) calloc((size_t) old_capacity * 2, sizeof(BoxHandle_TCY));
+    if (!table) return -1;
+    reg->table = table;
+    reg->capacity = old_capacity * 2;
+    reg->num = 0;
+    for (uint32_t i = 0; i < old_capacity; ++i)
+        if (old[i] != BOX_HANDLE_NONE)
+            _table_put(reg, box_arena_get(reg->arena, old[i]));
+    free(old);
+    return 0;
+}
+
+static void _table_remove(BoxRegistry_TCY *reg, Box_TCY *box) {
+    uint32_t mask = reg->capacity - 1;
+    uint32_t i = _id_hash(box->id) & mask, j, k;
+
+    while (reg->table[i] != box->handle) {
+        if (reg->table[i] == BOX_HANDLE_NONE)
+            return;
+        i = (i + 1) & mask;
+    }
+    // backward-shift deletion keeps the probe sequences intact without tombstones
+    j = i;
+    while (1) {
+        reg->table[i] = BOX_HANDLE_NONE;
+        while (1) {
+            j = (j + 1) & mask;
+            if (reg->table[j] == BOX_HANDLE_NONE) {
+                reg->num--;
+                return;
+            }
+            k = _id_hash(box_arena_get(reg->arena, reg->table[j])->id) & mask;
+            if ((i <= j) ? (i < k && k <= j) : (i < k || k <= j))
+                continue;
+            break;
+        }
+        reg->table[i] = reg->table[j];
+        i = j;
+    }
+}
+
+static inline void _list_link(BoxRegistry_TCY *reg, Box_TCY *box) {
+    Box_TCY *head = box_arena_get(reg->arena, reg->heads[box->state]);
+    box->_state_prev = BOX_HANDLE_NONE;
+    box->_state_next = reg->heads[box->state];
+    if (head)
+        head->_state_prev = box->handle;
+    reg->heads[box->state] = box->handle;
+    reg->counts[box->state]++;
+}
+
+static inline void _list_unlink(BoxRegistry_TCY *reg, Box_TCY *box) {
+    Box_TCY *prev = box_arena_get(reg->arena, box->_state_prev);
+    Box_TCY *next = box_arena_get(reg->arena, box->_state_next);
+    if (prev)
+        prev->_state_next = box->_state_next;
+    else
+        reg->heads[box->state] = box->_state_next;
+    if (next)
+        next->_state_prev = box->_state_prev;
+    box->_state_prev = box->_state_next = BOX_HANDLE_NONE;
+    reg->counts[box->state]--;
+}
+
+// A box whose id is already taken by another box of the registry is refused.
+int box_registry_add(BoxRegistry_TCY *reg, Box_TCY *box) {
+    if (box->registry == reg)
+        return SUCCEED;
+    if (box_registry_find(reg, box->id))
+        return ERROR_DUPLICATE_BOX_ID;
+    if ((reg->num + 1) * 2 > reg->capacity && _table_grow(reg))
+        return ERROR_OUT_OF_MEMORY;
+    if (box->registry)
+        box_registry_remove(box->registry, box);
+    _table_put(reg, box);
+    _list_link(reg, box);
+    box->registry = reg;
+    return SUCCEED;
+}
+
+void box_registry_remove(BoxRegistry_TCY *reg, Box_TCY *box) {
+    if (box->registry != reg)
+        return;
+    _table_remove(reg, box);
+    _list_unlink(reg, box);
+    box->registry = NULL;
+}
+
+void box_registry_move(BoxRegistry_TCY *reg, Box_TCY *box, BoxState_TCY state) {
+    _list_unlink(reg, box);
+    box->state = state;
+    _list_link(reg, box);
+}
+
+Box_TCY *box_registry_find(BoxRegistry_TCY *reg, const char *box_id) {
+    uint32_t mask = reg->capacity - 1;
+    uint32_t i = _id_hash(box_id) & mask;
+    Box_TCY *box;
+    while (reg->table[i] != BOX_HANDLE_NONE) {
+        box = box_arena_get(reg->arena, reg->table[i]);
+        if (_id_eq(box, box_id))
+            return box;
+        i = (i + 1) & mask;
+    }
+    return NULL;
+}
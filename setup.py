@@ -62,6 +62,12 @@ extensions = [
         extra_compile_args=extra_compile_args,
         extra_link_args=extra_link_args,
         ),
+    Extension(
+        name="tcysim.analysis.*",
+        sources=["tcysim/analysis/*.pyx"],
+        extra_compile_args=extra_compile_args,
+        extra_link_args=extra_link_args,
+        ),
     Extension(
         name="tcysim.utils.*",
         sources=["tcysim/utils/*.pyx"],
@@ -94,6 +100,6 @@ setup(name="tcysim",
           },
       install_requires=["pesim>=0.9"],
       extras_require={
-          "analysis": ["msgpack>=1", "plotly>=4.5"],
+          "analysis": ["msgpack>=1", "numpy", "plotly>=4.5"],
           }
       )
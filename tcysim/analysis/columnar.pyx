@@ -0,0 +1,309 @@
+import mmap
+import os
+import struct
+
+import msgpack
+import numpy as np
+
+from cpython.array cimport array, clone
+from cpython.number cimport PyNumber_Index
+from cpython.mem cimport PyMem_Malloc, PyMem_Free
+from libc.math cimport NAN
+
+MAGIC = b"TCYCOL1\0"
+_LEN = struct.Struct("<I")
+_ALIGN = 8
+
+STR = "str"
+BYTES = "bytes"
+_CATEGORIES = (STR, BYTES)
+
+
+cdef enum:
+    K_F8, K_F4, K_I8, K_I4, K_I2, K_I1, K_U8, K_U4, K_U2, K_U1, K_BOOL, K_CAT
+
+
+# numpy dtype -> (array typecode, kind)
+_TYPECODES = {
+    "<f8": ("d", K_F8), "<f4": ("f", K_F4),
+    "<i8": ("q", K_I8), "<i4": ("i", K_I4), "<i2": ("h", K_I2), "|i1": ("b", K_I1),
+    "<u8": ("Q", K_U8), "<u4": ("I", K_U4), "<u2": ("H", K_U2), "|u1": ("B", K_U1),
+    "|b1": ("B", K_BOOL),
+    }
+
+
+def _normalize_dtype(dtype):
+    if dtype is None or dtype in _CATEGORIES:
+        return dtype
+    elif dtype is str:
+        return STR
+    elif dtype is bytes:
+        return BYTES
+    dtype = np.dtype(dtype).str
+    if dtype not in _TYPECODES:
+        raise TypeError("unsupported column type {} in a columnar log".format(dtype))
+    return dtype
+
+
+def _infer_dtype(value):
+    if isinstance(value, bool):
+        return "|b1"
+    elif value is None or isinstance(value, (int, float)):
+        return "<f8"
+    elif isinstance(value, str):
+        return STR
+    elif isinstance(value, bytes):
+        return BYTES
+    raise TypeError("cannot store {!r} in a columnar log, declare the column type".format(value))
+
+
+def _padding(size):
+    return -size % _ALIGN
+
+
+cdef class ColumnarWriter:
+    """Buffer log records into typed arrays and write them as fixed-size chunks of columns.
+
+    ``columns`` is the same list of names the msgpack loggers take; an item may
+    also be a ``(name, dtype)`` pair. Columns without a declared dtype get it
+    from the first record: bools are stored as a bool array, other numbers as
+    float64 (None is a NaN), strs and bytes as int32 codes into a per-column
+    table that grows chunk by chunk. Integer columns must be declared, they
+    only take integers; a value its column cannot hold raises a TypeError.
+
+    Layout: the magic, a length-prefixed msgpack header with the schema, then
+    per chunk a length-prefixed msgpack header (row count and new table
+    entries) followed by the raw column arrays, each padded to 8 bytes.
+    """
+    cdef object fp
+    cdef readonly list names
+    cdef readonly list dtypes
+    cdef readonly Py_ssize_t chunk_size
+    cdef Py_ssize_t num
+    cdef list buffers
+    cdef list tables
+    cdef list new_entries
+    cdef int[16] _kinds
+    cdef int *kinds
+    cdef bint started
+
+    def __init__(self, fp, columns, Py_ssize_t chunk_size=65536):
+        self.fp = fp
+        self.names = []
+        self.dtypes = []
+        for column in columns:
+            if isinstance(column, (tuple, list)):
+                name, dtype = column
+            else:
+                name, dtype = column, None
+            self.names.append(name)
+            self.dtypes.append(_normalize_dtype(dtype))
+        self.chunk_size = chunk_size
+        self.num = 0
+        self.buffers = []
+        self.tables = []
+        self.new_entries = []
+        self.kinds = NULL
+        self.started = False
+
+    def __dealloc__(self):
+        if self.kinds != NULL and self.kinds != self._kinds:
+            PyMem_Free(self.kinds)
+
+    def _open(self):
+        if isinstance(self.fp, str):
+            dir_path = os.path.split(os.path.abspath(self.fp))[0]
+            if not os.path.exists(dir_path):
+                os.makedirs(dir_path)
+            self.fp = open(self.fp, "wb")
+
+    def _write_block(self, data):
+        self.fp.write(_LEN.pack(len(data)))
+        self.fp.write(data)
+        pad = _padding(_LEN.size + len(data))
+        if pad:
+            self.fp.write(b"\0" * pad)
+
+    def _start(self, tuple data):
+        cdef Py_ssize_t i, n = len(self.names)
+        if n > 16:
+            self.kinds = <int *> PyMem_Malloc(n * sizeof(int))
+            if self.kinds == NULL:
+                raise MemoryError()
+        else:
+            self.kinds = self._kinds
+        for i in range(n):
+            if self.dtypes[i] is None:
+                self.dtypes[i] = _infer_dtype(data[i] if i < len(data) else None)
+            if self.dtypes[i] in _CATEGORIES:
+                typecode, self.kinds[i] = "i", K_CAT
+                self.tables.append({})
+            else:
+                typecode, self.kinds[i] = _TYPECODES[self.dtypes[i]]
+                self.tables.append(None)
+            self.new_entries.append([])
+            self.buffers.append(clone(array(typecode), self.chunk_size, False))
+        self._open()
+        self.fp.write(MAGIC)
+        self._write_block(msgpack.packb({"columns": [list(item) for item in zip(self.names, self.dtypes)]}))
+        self.started = True
+
+    def write(self, *data):
+        cdef Py_ssize_t i, n = self.num
+        cdef array buf
+        cdef int kind
+        cdef dict table
+        if not self.started:
+            self._start(data)
+        if len(data) != len(self.buffers):
+            raise ValueError("expect {} columns, got {}".format(len(self.buffers), len(data)))
+        for i in range(len(data)):
+            value = data[i]
+            buf = <array> self.buffers[i]
+            kind = self.kinds[i]
+            try:
+                if kind == K_F8:
+                    buf.data.as_doubles[n] = NAN if value is None else value
+                elif kind == K_CAT:
+                    table = <dict> self.tables[i]
+                    code = table.get(value)
+                    if code is None:
+                        if not isinstance(value, str if self.dtypes[i] == STR else bytes):
+                            raise TypeError()
+                        code = len(table)
+                        table[value] = code
+                        (<list> self.new_entries[i]).append(value)
+                    buf.data.as_ints[n] = code
+                elif kind == K_BOOL:
+                    if value is None:
+                        raise TypeError()
+                    buf.data.as_uchars[n] = 1 if value else 0
+                elif kind == K_F4:
+                    buf.data.as_floats[n] = NAN if value is None else value
+                else:
+                    # PyNumber_Index rejects floats and None instead of truncating them
+                    value = PyNumber_Index(value)
+                    if kind == K_I8:
+                        buf.data.as_longlongs[n] = value
+                    elif kind == K_I4:
+                        buf.data.as_ints[n] = value
+                    elif kind == K_I2:
+                        buf.data.as_shorts[n] = value
+                    elif kind == K_I1:
+                        buf.data.as_schars[n] = value
+                    elif kind == K_U8:
+                        buf.data.as_ulonglongs[n] = value
+                    elif kind == K_U4:
+                        buf.data.as_uints[n] = value
+                    elif kind == K_U2:
+                        buf.data.as_ushorts[n] = value
+                    else:
+                        buf.data.as_uchars[n] = value
+            except (TypeError, OverflowError) as e:
+                raise TypeError("column {!r} of type {} cannot hold {!r}".format(
+                    self.names[i], self.dtypes[i], value)) from e
+        self.num = n + 1
+        if self.num >= self.chunk_size:
+            self.flush()
+
+    def flush(self):
+        cdef Py_ssize_t i
+        if not self.num:
+            return
+        entries = {}
+        for i, new in enumerate(self.new_entries):
+            if new:
+                entries[i] = new
+                self.new_entries[i] = []
+        self._write_block(msgpack.packb({"rows": self.num, "entries": entries}))
+        for buf in self.buffers:
+            data = memoryview(buf)[:self.num]
+            self.fp.write(data)
+            pad = _padding(data.nbytes)
+            if pad:
+                self.fp.write(b"\0" * pad)
+        self.num = 0
+
+    def close(self):
+        if not self.started:
+            self._start(())
+        self.flush()
+        if hasattr(self.fp, "close"):
+            self.fp.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+
+class ColumnarReader:
+    """Memory-map a log written by ColumnarWriter and expose its columns as numpy arrays.
+
+    Only the chunk headers are parsed; numeric columns are views on the mapped
+    file (concatenated when the log has several chunks) and str/bytes columns
+    are decoded through their tables in one vectorised lookup.
+    """
+
+    def __init__(self, path):
+        with open(path, "rb") as fp:
+            size = os.fstat(fp.fileno()).st_size
+            self.buffer = mmap.mmap(fp.fileno(), 0, access=mmap.ACCESS_READ) if size else b""
+        if self.buffer[:len(MAGIC)] != MAGIC:
+            raise ValueError("{} is not a columnar log".format(path))
+        offset = len(MAGIC)
+        header, offset = self._read_block(offset)
+        self.names = [name for name, _ in header["columns"]]
+        self.dtypes = [dtype for _, dtype in header["columns"]]
+        self.tables = [[] if dtype in _CATEGORIES else None for dtype in self.dtypes]
+        self.chunks = []
+        while offset < len(self.buffer):
+            chunk, offset = self._read_block(offset)
+            rows = chunk["rows"]
+            for i, entries in chunk["entries"].items():
+                self.tables[i].extend(entries)
+            views = []
+            for dtype in self.dtypes:
+                dtype = np.dtype("<i4" if dtype in _CATEGORIES else dtype)
+                views.append(np.frombuffer(self.buffer, dtype=dtype, count=rows, offset=offset))
+                size = rows * dtype.itemsize
+                offset += size + _padding(size)
+            self.chunks.append(views)
+        self._cache = {}
+
+    def _read_block(self, offset):
+        size, = _LEN.unpack_from(self.buffer, offset)
+        start = offset + _LEN.size
+        data = msgpack.unpackb(self.buffer[start:start + size], strict_map_key=False)
+        end = start + size
+        return data, end + _padding(end - offset)
+
+    def __len__(self):
+        return sum(len(chunk[0]) for chunk in self.chunks) if self.names else 0
+
+    @property
+    def columns(self):
+        return list(self.names)
+
+    def codes(self, name):
+        i = self.names.index(name)
+        if not self.chunks:
+            return np.empty(0, dtype="<i4" if self.dtypes[i] in _CATEGORIES else self.dtypes[i])
+        if len(self.chunks) == 1:
+            return self.chunks[0][i]
+        return np.concatenate([chunk[i] for chunk in self.chunks])
+
+    def __getitem__(self, name):
+        if name not in self._cache:
+            i = self.names.index(name)
+            array = self.codes(name)
+            if self.dtypes[i] in _CATEGORIES:
+                table = np.empty(len(self.tables[i]), dtype=object)
+                table[:] = self.tables[i]
+                array = table[array]
+            self._cache[name] = array
+        return self._cache[name]
+
+    def to_dict(self):
+        return {name: self[name] for name in self.names}
@@ -24,13 +24,29 @@ class _LoggerForLMPManager:
         pack(data, self.fp)
 
 
+class _ColumnarLoggerForLMPManager:
+    def __init__(self, fp, columns, chunk_size):
+        from .columnar import ColumnarWriter
+        self.writer = ColumnarWriter(fp, columns, chunk_size)
+        self.write = self.writer.write
+
+    def init(self):
+        pass
+
+    def finish(self):
+        self.writer.close()
+
+
 class LoggingManagerBase(SingleLMP):
     def __init__(self):
         super(LoggingManagerBase, self).__init__()
         self.loggers = []
 
-    def create_logger(self, fp_or_path, columns):
-        logger = _LoggerForLMPManager(fp_or_path, columns)
+    def create_logger(self, fp_or_path, columns, columnar=False, chunk_size=65536):
+        if columnar:
+            logger = _ColumnarLoggerForLMPManager(fp_or_path, columns, chunk_size)
+        else:
+            logger = _LoggerForLMPManager(fp_or_path, columns)
         self.loggers.append(logger)
         return logger
 
@@ -42,15 +58,26 @@ class LoggingManagerBase(SingleLMP):
             logger.finish()
 
 class SingleProcessLogger(SingleLMP):
-    def __init__(self, fp, columns=None, start=False):
+    def __init__(self, fp, columns=None, start=False, columnar=False, chunk_size=65536):
         super(SingleProcessLogger, self).__init__()
+        if columnar and not columns:
+            raise ValueError("a columnar log needs its columns")
         self.packer = None
+        self.writer = None
         self.fp = fp
         self.columns = columns
+        self.columnar = columnar
+        self.chunk_size = chunk_size
         if start:
             self.start()
 
     def run(self) -> None:
+        if self.columnar:
+            from .columnar import ColumnarWriter
+            self.writer = ColumnarWriter(self.fp, self.columns, self.chunk_size)
+            super(SingleProcessLogger, self).run()
+            self.writer.close()
+            return
         if isinstance(self.fp, str):
             dir_path = os.path.split(os.path.abspath(self.fp))[0]
             if not os.path.exists(dir_path):
@@ -65,5 +92,31 @@ class SingleProcessLogger(SingleLMP):
             self.fp.close()
 
     def write(self, *data):
+        if self.writer is not None:
+            self.writer.write(*data)
+            return
         self.fp.write(self.packer.pack(data))
         # pack(data, self.fp)
+
+
+def read_log(path):
+    """Load a log written by any of the loggers above as a dict of columns.
+
+    Columnar logs come back as numpy arrays straight from the mapped file,
+    msgpack logs are unpacked row by row into lists. Without the compiled
+    columnar extension only msgpack logs can be read.
+    """
+    try:
+        from .columnar import ColumnarReader, MAGIC
+    except ImportError:
+        ColumnarReader = MAGIC = None
+    with open(path, "rb") as fp:
+        columnar = MAGIC is not None and fp.read(len(MAGIC)) == MAGIC
+        if not columnar:
+            fp.seek(0)
+            unpacker = msgpack.Unpacker(fp)
+            columns = next(unpacker)
+            rows = list(unpacker)
+            values = list(zip(*rows)) if rows else [()] * len(columns)
+            return {name: list(col) for name, col in zip(columns, values)}
+    return ColumnarReader(path).to_dict()
@@ -1,6 +1,5 @@
 from tcysim.framework.layout.layout import LayoutItem
 
-from bisect import bisect_left
 import plotly.graph_objects as go
 import numpy as np
 
@@ -31,36 +30,50 @@ class PlotItem:
         self.frame = frame
 
     def find_range(self, plot_set):
-        self.idx_x0 = bisect_left(plot_set.xs, self.x0)
-        self.idx_x1 = bisect_left(plot_set.xs, self.x1)
-        self.idx_y0 = bisect_left(plot_set.ys, self.y0)
-        self.idx_y1 = bisect_left(plot_set.ys, self.y1)
+        self.idx_x0, self.idx_x1 = np.searchsorted(plot_set.xs, (self.x0, self.x1)).tolist()
+        self.idx_y0, self.idx_y1 = np.searchsorted(plot_set.ys, (self.y0, self.y1)).tolist()
 
     def assign_value(self, zs, value):
-        for i in range(self.idx_x0, self.idx_x1):
-            for j in range(self.idx_y0, self.idx_y1):
-                zs[i, j] = value
+        zs[..., self.idx_x0:self.idx_x1, self.idx_y0:self.idx_y1] = value
 
 
 class PlotSet:
+    """Heatmaps of values attached to the layout items of a yard.
+
+    ``build()`` cuts the yard into the grid of cells delimited by the item
+    edges and records, for every cell, the position of the item covering it
+    (the last added one where items overlap). Turning values into a heatmap is
+    then a single gather, for one vector of values as well as for a (time x
+    item) matrix, whose rows become the frames of an animation. Values missing
+    for some items fall back to one slice assignment per item.
+    """
+
     def __init__(self, yard_size_x, yard_size_y):
         self.max_x = yard_size_x
         self.max_y = yard_size_y
         self.items = {}
+        self.index = []
+        self.positions = {}
         self.xs = None
         self.ys = None
+        self.owners = None
         self.built = False
 
     def add_item(self, idx, layout_item: LayoutItem, frame=False, precision_digital=2):
         self.items[idx] = PlotItem(layout_item, frame, precision_digital)
+        self.built = False
 
     @staticmethod
     def _compress_coords(ls):
+        xs = np.unique(np.asarray(ls, dtype=float))
+        keep = np.ones(len(xs), dtype=bool)
         last = -1
-        for x in sorted(ls):
+        for i, x in enumerate(xs):
             if x > last + 1e-6:
-                yield x
                 last = x
+            else:
+                keep[i] = False
+        return xs[keep]
 
     def clear(self):
         self.items = {}
@@ -68,55 +81,94 @@ class PlotSet:
 
     def build(self):
         if not self.built:
-            self.xs = [0, self.max_x]
-            self.ys = [0, self.max_y]
-            for item in self.items.values():
-                self.xs.extend((item.x0, item.x1))
-                self.ys.extend((item.y0, item.y1))
-            self.xs = list(self._compress_coords(self.xs))
-            self.ys = list(self._compress_coords(self.ys))
-            for item in self.items.values():
-                item.find_range(self)
+            self.index = list(self.items)
+            self.positions = {idx: i for i, idx in enumerate(self.index)}
+            items = list(self.items.values())
+            bounds = np.array([(item.x0, item.x1, item.y0, item.y1) for item in items], dtype=float).reshape(-1, 4)
+            self.xs = self._compress_coords(np.concatenate(((0, self.max_x), bounds[:, 0], bounds[:, 1])))
+            self.ys = self._compress_coords(np.concatenate(((0, self.max_y), bounds[:, 2], bounds[:, 3])))
+            idx_x = np.searchsorted(self.xs, bounds[:, :2])
+            idx_y = np.searchsorted(self.ys, bounds[:, 2:])
+            self.owners = np.full((len(self.xs) - 1, len(self.ys) - 1), -1, dtype=np.intp)
+            for i, item in enumerate(items):
+                item.idx_x0, item.idx_x1 = idx_x[i].tolist()
+                item.idx_y0, item.idx_y1 = idx_y[i].tolist()
+                item.assign_value(self.owners, i)
             self.built = True
 
-    def plot(self, data=None, **kwargs):
-        fig = go.Figure()
-        fig.update_xaxes(range=(0, self.max_x), showgrid=False)
-        fig.update_yaxes(range=(0, self.max_y), showgrid=False)
+    def values(self, data, items=None):
+        """Values of the items in build order, NaN for the items without one.
 
-        all_frame = False
-        if data is not None:
-            self.build()
-            if not isinstance(data, dict) and hasattr(data, "to_dict"):
+        ``data`` is a mapping (or anything with ``to_dict``, e.g. a pandas
+        Series) from item index to value, or an array whose last axis follows
+        ``items`` (default: the items in build order); an array of shape
+        (time, item) gives a matrix of shape (time, number of items).
+        """
+        self.build()
+        if isinstance(data, dict) or (hasattr(data, "to_dict") and not hasattr(data, "columns")):
+            if not isinstance(data, dict):
                 data = data.to_dict()
-            zs = np.zeros((len(self.xs) - 1, len(self.ys) - 1), np.float)
-            zmin = np.inf
-            zmax = -np.inf
+            values = np.full(len(self.index), np.nan)
             for idx, value in data.items():
-                if idx in self.items:
-                    zmin = min(zmin, value)
-                    zmax = max(zmax, value)
-                    self.items[idx].assign_value(zs, value)
-            color_scale = kwargs.get("colorscale", "Reds")
-            if "zmin" in kwargs:
-                zmin = kwargs["zmin"]
-                del kwargs["zmin"]
-            if "zmax" in kwargs:
-                zmax = kwargs["zmax"]
-                del kwargs["zmax"]
-            fig.add_trace(go.Heatmap(z=zs.T, x=self.xs, y=self.ys,
-                                     colorscale=color_scale,
-                                     zmin=zmin, zmax=zmax, zauto=False,
-                                     **kwargs))
-        else:
-            all_frame = True
+                i = self.positions.get(idx)
+                if i is not None:
+                    values[i] = value
+            return values
+        if hasattr(data, "columns"):
+            items = list(data.columns) if items is None else items
+            data = data.to_numpy()
+        data = np.asarray(data, dtype=float)
+        if items is None:
+            if data.shape[-1] != len(self.index):
+                raise ValueError("expect {} values per row, got {}".format(len(self.index), data.shape[-1]))
+            return data
+        values = np.full(data.shape[:-1] + (len(self.index),), np.nan)
+        columns = [(j, self.positions[idx]) for j, idx in enumerate(items) if idx in self.positions]
+        if columns:
+            src, dst = map(list, zip(*columns))
+            values[..., dst] = data[..., src]
+        return values
+
+    def heatmap(self, data, items=None):
+        """Cell values of the heatmap, of shape (x cells, y cells) or (time, x cells, y cells).
+
+        Cells outside of any item are 0; where items overlap, a cell takes the
+        value of the last added item that has one.
+        """
+        values = self.values(data, items)
+        missing = np.isnan(values)
+        if not missing.any():
+            values = np.concatenate((values, np.zeros(values.shape[:-1] + (1,))), axis=-1)
+            # the cells without an owner pick the trailing 0
+            return values[..., self.owners]
+        zs = np.zeros(values.shape[:-1] + self.owners.shape)
+        for i, item in enumerate(self.items.values()):
+            if missing[..., i].all():
+                continue
+            value = values[..., i, np.newaxis, np.newaxis]
+            cells = zs[..., item.idx_x0:item.idx_x1, item.idx_y0:item.idx_y1]
+            np.copyto(cells, value, where=~np.isnan(value))
+        return zs
+
+    def _value_range(self, values, kwargs):
+        zmin = kwargs.pop("zmin", None)
+        zmax = kwargs.pop("zmax", None)
+        if zmin is None:
+            zmin = np.nanmin(values) if np.any(~np.isnan(values)) else 0
+        if zmax is None:
+            zmax = np.nanmax(values) if np.any(~np.isnan(values)) else 0
+        return zmin, zmax
 
+    def _figure(self, framed):
+        fig = go.Figure()
+        fig.update_xaxes(range=(0, self.max_x), showgrid=False)
+        fig.update_yaxes(range=(0, self.max_y), showgrid=False)
         fig.add_shape(go.layout.Shape(type="rect",
                                       x0=0, y0=0, x1=self.max_x, y1=self.max_y,
                                       line=dict(width=1)))
 
         for item in self.items.values():
-            if all_frame or item.frame:
+            if framed or item.frame:
                 fig.add_shape(go.layout.Shape(type="rect",
                                               x0=item.x0,
                                               y0=item.y0,
@@ -126,6 +178,55 @@ class PlotSet:
         fig.update_shapes(dict(xref='x', yref='y'))
         return fig
 
+    def plot(self, data=None, **kwargs):
+        fig = self._figure(data is None)
+        if data is not None:
+            values = self.values(data)
+            zmin, zmax = self._value_range(values, kwargs)
+            zs = self.heatmap(values)
+            color_scale = kwargs.pop("colorscale", "Reds")
+            fig.add_trace(go.Heatmap(z=zs.T, x=self.xs, y=self.ys,
+                                     colorscale=color_scale,
+                                     zmin=zmin, zmax=zmax, zauto=False,
+                                     **kwargs))
+        return fig
+
+    def plot_frames(self, data, times=None, items=None, frame_duration=100, **kwargs):
+        """Animated heatmap of a (time x item) value matrix, one frame per row.
+
+        ``data`` is a 2D array whose columns follow ``items`` (default: the
+        items in build order) or a pandas DataFrame indexed by time with item
+        columns. The color range is shared by all the frames unless given.
+        """
+        if times is None:
+            times = list(data.index) if hasattr(data, "index") and hasattr(data, "columns") else None
+        values = self.values(data, items)
+        if values.ndim != 2:
+            raise ValueError("expect a (time x item) matrix, got shape {}".format(values.shape))
+        if times is None:
+            times = list(range(len(values)))
+        zmin, zmax = self._value_range(values, kwargs)
+        zs = self.heatmap(values)
+        color_scale = kwargs.pop("colorscale", "Reds")
+
+        fig = self._figure(False)
+        names = [str(time) for time in times]
+        fig.add_trace(go.Heatmap(z=zs[0].T if len(zs) else None, x=self.xs, y=self.ys,
+                                 colorscale=color_scale,
+                                 zmin=zmin, zmax=zmax, zauto=False,
+                                 **kwargs))
+        fig.frames = [go.Frame(data=[go.Heatmap(z=z.T)], name=name) for z, name in zip(zs, names)]
+        play = dict(frame=dict(duration=frame_duration, redraw=True), fromcurrent=True)
+        fig.update_layout(
+            updatemenus=[dict(type="buttons", showactive=False,
+                              buttons=[dict(label="Play", method="animate", args=[None, play]),
+                                       dict(label="Pause", method="animate",
+                                            args=[[None], dict(frame=dict(duration=0), mode="immediate")])])],
+            sliders=[dict(steps=[dict(label=name, method="animate",
+                                      args=[[name], dict(frame=dict(duration=0, redraw=True), mode="immediate")])
+                                 for name in names])])
+        return fig
+
 
 def plot_layout(yard, blocks=True, lanes=False):
     fig = go.Figure()
@@ -19,7 +19,6 @@ class Block(BlockLayout, CBlock):
         BlockLayout.__init__(self, offset, shape, rotate, lanes=lanes)
         CBlock.__init__(self, shape, stacking_axis=stacking_axis, sync_axes=sync_axes)
         self.req_dispatcher = self.ReqDispatcher(self)
-        self.lock_waiting_requests = {}
         self.num_equipments= 0
         # self.boxes = set()
 
@@ -35,32 +34,41 @@ class Block(BlockLayout, CBlock):
     def access_coord(self, lane, box, transform_to=None):
         return self.projected_coord_on_lane_from_cell_idx(lane, box.location, box.teu, transform_to)
 
+    def rebuild_indexes(self):
+        """Recompute the indexes derived from the live state of the block and of its equipments."""
+        pass
+
     def acquire_stack(self, time, acquirer, *positions):
-        succeed = True
-        for pos in positions:
-            pos = pos.set1(self.stacking_axis, 0)
-            if self.is_locked(pos):
-                idx = self.stack_hash(pos)
-                if idx not in self.lock_waiting_requests:
-                    self.lock_waiting_requests[idx] = set()
+        failed = self.try_lock_stacks(acquirer, positions)
+        if failed:
+            for idx in failed:
                 acquirer.on_acquire_fail(time, idx)
-                self.lock_waiting_requests[idx].add(acquirer)
-                succeed = False
-        if succeed:
-            for pos in positions:
-                self.lock(pos)
-                acquirer.on_acquire_success(time, pos)
-        return succeed
+            return False
+        for pos in positions:
+            acquirer.on_acquire_success(time, pos)
+        return True
 
     def release_stack(self, time, *positions):
         for pos in positions:
-            pos = pos.set1(self.stacking_axis, 0)
-            self.unlock(pos)
-            idx = self.stack_hash(pos)
-            if idx in self.lock_waiting_requests:
-                for request in self.lock_waiting_requests[idx]:
+            waiters = self.unlock_stack(pos)
+            if waiters:
+                idx = self.stack_hash(pos)
+                for request in waiters:
                     request.on_resource_release(time, idx)
-                del self.lock_waiting_requests[idx]
+
+    def lock_hot_spots(self, num=10):
+        """The num stacks whose locking failed the most, as (contentions, stack position) pairs."""
+        contentions = self.lock_contentions_view()
+        shape = contentions.shape
+        counts = memoryview(contentions).cast("B").cast("Q")
+        top = sorted(((c, i) for i, c in enumerate(counts) if c), reverse=True)[:num]
+        axes = [i for i in range(3) if i != self.stacking_axis]
+        res = []
+        for c, i in top:
+            pos = [0, 0, 0]
+            pos[axes[0]], pos[axes[1]] = divmod(i, shape[1])
+            res.append((c, V3i(*pos)))
+        return res
 
     def available_cells(self, box):
         for i, j, k in product(*self.shape):
@@ -3,4 +3,5 @@ from tcysim.libc import CBox, CBoxState
 BoxState = CBoxState
 
 class Box(CBox):
+    __slots__ = ()
     STATE = BoxState
@@ -7,11 +7,19 @@ from ..exception.handling import ReqOpRejectionError, ROREquipmentConflictError
 from ..operation import Operation
 from ..event_reason import EventReason
 from ..layout import EquipmentRangeLayout
-from tcysim.utils import V3
+from tcysim.utils import V3, FrozenV3
 from .req_handler import ReqHandler
 from .op_builder import OpBuilder
 from ..request import Request
 from ..scheduler.scheduler import JobScheduler
+from ..probe.manager import probe_id
+
+PROBE_OPERATION_START = probe_id("operation.start")
+PROBE_OPERATION_FINISH = probe_id("operation.finish")
+PROBE_OPERATION_CONFLICT = probe_id("operation.conflict")
+PROBE_REQUEST_START = probe_id("request.start")
+PROBE_REQUEST_SUCCEED = probe_id("request.succeed")
+PROBE_REQUEST_REJECTED = probe_id("request.rejected")
 
 
 class EquipmentState(Enum):
@@ -40,6 +48,9 @@ class Equipment(EquipmentRangeLayout, Process):
         self.state = self.STATE.IDLE
         self.next_task = None
         self.components = [copy(item) for item in components]
+        self._coord_time = None
+        self._coord_epoch = -1
+        self._coords = {}
         self.set_coord(init_offset, glob=False)
         self.attrs = copy(attrs)
         self.req_handler = self.ReqHandler(self)
@@ -56,17 +67,42 @@ class Equipment(EquipmentRangeLayout, Process):
             component.restore_state()
 
     def current_coord(self, transform_to=None):
-        self.run_until(self.env.time)
-        v = V3(0, 0, 0)
+        """Coordinate of the equipment at the current time, as a shared read-only FrozenV3.
+
+        The coordinate and its transformations are cached until the time moves
+        on or the motions of a component are committed or interrupted.
+        """
+        time = self.env.time
+        epoch = 0
         for component in self.components:
-            v[component.axis] = component.loc
-        return self.transform_to(v, transform_to)
+            epoch += component.epoch
+        coords = self._coords
+        if time != self._coord_time or epoch != self._coord_epoch:
+            self.run_until(time)
+            coords.clear()
+            self._coord_time = time
+            self._coord_epoch = epoch
+        else:
+            v = coords.get(transform_to)
+            if v is not None:
+                return v
+        v = coords.get(None)
+        if v is None:
+            v = V3(0, 0, 0)
+            for component in self.components:
+                v[component.axis] = component.loc
+            v = coords[None] = FrozenV3(v.x, v.y, v.z)
+        if transform_to is not None:
+            v = self.transform_to(v, transform_to)
+            v = coords[transform_to] = FrozenV3(v.x, v.y, v.z)
+        return v
 
     def set_coord(self, v, glob=True):
         if glob:
             v = self.coord_g2l(v)
         for component in self.components:
             component.loc = v[component.axis]
+        self._coord_time = None
 
     def attached_box_coord(self, transform_to="g"):
         return self.current_coord(transform_to=transform_to)
@@ -153,30 +189,30 @@ class Equipment(EquipmentRangeLayout, Process):
         op.commit(self.yard)
         with self.lock_state(self.STATE.WORKING):
             self.current_op = op
-            self.yard.fire_probe('operation.start', op)
+            self.yard.fire_probe(PROBE_OPERATION_START, op)
             op.state = op.STATE.RUNNING
             yield op.finish_time, EventReason.OP_FINISHED
             op.state = op.STATE.FINISHED
             op.finish_time = self.time
             self.current_op = None
-            self.yard.fire_probe('operation.finish', op)
+            self.yard.fire_probe(PROBE_OPERATION_FINISH, op)
             # op.clean()
 
     def handle_request(self, request):
         request.start_or_resume(self.time)
         try:
-            self.yard.fire_probe('request.start', request)
+            self.yard.fire_probe(PROBE_REQUEST_START, request)
             for op in request.gen_op(self.time):
                 if self.op_builder.build_and_check(self.time, op):
                     yield from self.perform_op(self.time, op)
                 else:
                     op.state = op.STATE.CANCELLED
-                    self.yard.fire_probe('operation.conflict', op)
+                    self.yard.fire_probe(PROBE_OPERATION_CONFLICT, op)
                     raise ROREquipmentConflictError(op)
-            self.yard.fire_probe('request.succeed', request)
+            self.yard.fire_probe(PROBE_REQUEST_SUCCEED, request)
         except ReqOpRejectionError as e:
             self.req_handler.on_reject(self.time, e)
-            self.yard.fire_probe('request.rejected', request)
+            self.yard.fire_probe(PROBE_REQUEST_REJECTED, request)
         request.finish_or_fail(self.time)
 
     def handle_operation(self, op):
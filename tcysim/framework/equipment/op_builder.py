@@ -1,12 +1,19 @@
+from collections import OrderedDict
+
 from ..operation import Operation
+from tcysim.utils import V3
 from tcysim.utils.dispatcher import Dispatcher
 
 
 class OpBuilder(Dispatcher):
     OpCls = Operation
+    # Dry-run plans of rejected operations kept for their retries; 0 disables.
+    PLAN_CACHE_SIZE = 256
+    PLAN_KEY_ATTRS = ("new_loc", "dst_loc", "load", "interruptable")
 
     def __init__(self, equipment):
         self.equipment = equipment
+        self.plans = OrderedDict()
         super(OpBuilder, self).__init__()
 
     @Dispatcher.on("STORE")
@@ -29,13 +36,55 @@ class OpBuilder(Dispatcher):
     def build_move(self, op: Operation):
         raise NotImplementedError
 
+    def plan_key(self, op: Operation):
+        """Key under which the plan of op can be reused, or None if it cannot.
+
+        A plan only depends on the operation, on where the equipment starts from
+        and on the boxes in its blocks, so it is reusable while the equipment is
+        at rest at the same place and the usage version of its blocks is the
+        same. ADJUST operations also depend on the position of the blocking
+        equipment and are never reused.
+        """
+        if op.op_type == Operation.TYPE.ADJUST:
+            return None
+        equipment = self.equipment
+        state = [equipment.current_coord().to_tuple()]
+        for component in equipment.components:
+            if component.pending_motions or component.curr_v != 0:
+                return None
+        for block in equipment.blocks:
+            state.append(block.version)
+        attrs = []
+        for name in self.PLAN_KEY_ATTRS:
+            value = getattr(op, name, None)
+            attrs.append(value.to_tuple() if isinstance(value, V3) else value)
+        return op.op_type, op.request, op.box, tuple(attrs), tuple(state)
+
     def build_and_check(self, time, op: Operation):
-        op.extend(self.dispatch(op.op_type.name, "_", op))
-        op.dry_run(time)
+        """Build and dry-run op, or adopt a cached plan of it, and check it for interference.
+
+        Only plans rejected here, by the interference check, are cached. A
+        request whose stack locking fails is rejected by its ReqHandler before
+        the operation is built, so no dry run is lost and none is cached; its
+        retry builds and dry-runs the operation once as usual.
+        """
+        key = self.plan_key(op) if self.PLAN_CACHE_SIZE else None
+        plan = self.plans.pop(key, None) if key is not None else None
+        if plan is not None:
+            op.adopt_plan(plan, time)
+        else:
+            names = set(op.__dict__)
+            op.extend(self.dispatch(op.op_type.name, "_", op))
+            op.plan_attrs = tuple(name for name in op.__dict__ if name not in names)
+            op.dry_run(time)
         itf, other, new_loc = self.equipment.check_interference(op)
         if itf:
             op.itf_other = other
             op.itf_loc = new_loc
+            if key is not None:
+                self.plans[key] = op
+                if len(self.plans) > self.PLAN_CACHE_SIZE:
+                    self.plans.popitem(last=False)
         return not itf
 
     @classmethod
@@ -1,3 +1,3 @@
 from .component import Component
-from .mover import Spec
+from .mover import Spec, MotionCache
 from .motion import Motion
\ No newline at end of file
@@ -10,4 +10,5 @@ cdef class Motion:
     cdef readonly double finish_time
 
     cdef Motion split(self, double time)
+    cdef void shift(self, double delta)
     cdef void update(self)
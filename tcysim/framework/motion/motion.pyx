@@ -20,6 +20,10 @@ cdef class Motion:
         self.update()
         return m
 
+    cdef void shift(self, double delta):
+        self.start_time += delta
+        self.finish_time += delta
+
     cdef void update(self):
         self.displacement = self.start_v * self.timespan + 0.5 * self.a * self.timespan * self.timespan
         self.finish_velocity = self.start_v + self.a * self.timespan
@@ -10,6 +10,17 @@ cdef class Spec:
     cdef double _cache_w0
     cdef double _cache_w1
 
+cdef class MotionCache:
+    cdef public bint enabled
+    cdef readonly int capacity
+    cdef readonly double resolution
+    cdef readonly long hits
+    cdef readonly long misses
+    cdef object profiles
+
+    cdef list get(self, object key)
+    cdef void put(self, object key, list profile)
+
 cdef class Mover:
     cdef public double curr_v
     cdef public double curr_a
@@ -19,9 +30,12 @@ cdef class Mover:
     cdef public double loc
     cdef double time
     cdef dict specs
+    cdef readonly MotionCache motion_cache
+    cdef readonly long epoch
 
     cdef void perform_motion(self, Motion m)
     cdef bint idle(self)
     cpdef bint allow_interruption(self)
     cpdef void commit_motions(self, motions)
+    cdef list plan_motions(self, Spec spec, double v0, double st, double displacement, bint allow_interruption)
     cdef tuple create_motions(self, double start_time, double displacement, bint allow_interruption, mode=?)
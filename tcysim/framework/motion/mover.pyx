@@ -1,5 +1,5 @@
-from collections import deque
-from libc.math cimport sqrt, fabs
+from collections import deque, OrderedDict
+from libc.math cimport sqrt, fabs, llround
 from libc.stdint cimport int64_t
 
 from tcysim.utils.math cimport feq
@@ -16,7 +16,54 @@ cdef class Spec:
         self._cache_w0 = v * v * (a + d) / (2 * a * d)
         self._cache_w1 = 2 * a * d / (a + d)
 
+cdef class MotionCache:
+    """LRU cache of motion profiles for moves starting from rest.
+
+    Profiles are keyed by (spec mode, displacement rounded to ``resolution``)
+    and stored relative to time 0 as (offset, timespan, v, a) tuples.
+    """
+    def __init__(self, int capacity=1024, double resolution=1e-3):
+        self.capacity = capacity
+        self.resolution = resolution
+        self.enabled = capacity > 0
+        self.hits = 0
+        self.misses = 0
+        self.profiles = OrderedDict()
+
+    cdef list get(self, object key):
+        cdef list profile = self.profiles.get(key)
+        if profile is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+            self.profiles.move_to_end(key)
+        return profile
+
+    cdef void put(self, object key, list profile):
+        self.profiles[key] = profile
+        if len(self.profiles) > self.capacity:
+            self.profiles.popitem(last=False)
+
+    def clear(self):
+        self.profiles.clear()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self.profiles)
+
+    @property
+    def hit_rate(self):
+        total = self.hits + self.misses
+        return self.hits / total if total else 0
+
+    def __repr__(self):
+        return "<MotionCache {}/{} hits={} misses={}>".format(len(self.profiles), self.capacity, self.hits,
+                                                            self.misses)
+
 cdef class Mover:
+    MOTION_CACHE_SIZE = 1024
+
     def __init__(self, specs):
         self.curr_v = 0
         self.curr_a = 0
@@ -25,13 +72,14 @@ cdef class Mover:
         self.pending_motions = deque()
         self.loc = 0
         self.time = -1
+        self.epoch = 0
 
         if isinstance(specs, dict):
             self.specs = specs
         else:
             self.specs = {"default": specs}
 
-        self._cache = {k: dict() for k in self.specs}
+        self.motion_cache = MotionCache(self.MOTION_CACHE_SIZE)
 
     def save_state(self):
         self._state_curr_v = self.curr_v
@@ -48,6 +96,7 @@ cdef class Mover:
         self.curr_a = m.a
 
     def sync_with(self, Mover other):
+        self.epoch += 1
         self.loc = other.loc
         self.time = other.time
         self.curr_v = other.curr_v
@@ -69,6 +118,7 @@ cdef class Mover:
     def interrupt(self):
         if not self.idle() and self.allow_interruption():
             self.pending_motions.clear()
+            self.epoch += 1
 
     cdef bint idle(self):
         return not self.pending_motions
@@ -90,32 +140,16 @@ cdef class Mover:
             time += m.timespan
         return time
 
-    cdef tuple create_motions(self, double start_time, double displacement, bint allow_interruption, mode="default"):
-        cdef Spec spec = self.specs[mode]
-        cdef double v0 = self.curr_v
+    cdef list plan_motions(self, Spec spec, double v0, double st, double displacement, bint allow_interruption):
         cdef double a = spec.a
         cdef double d = spec.d
         cdef double vm = spec.v
         cdef double w0 = spec._cache_w0
         cdef double w1 = spec._cache_w1
-        cdef double st = start_time
         cdef double t0, t1, t2, dflg, vx
         cdef Motion m
 
-        # cdef bint _do_cache = feq(v0,0)
-        # cdef dict _cache = self._cache[mode]
-        # cdef double cd, ct, cv, ca
-        # cdef int _cache_key = <int>(displacement * 100)
-
-        # if _do_cache:
-        #     print(_cache)
-
         motions = []
-        # if _do_cache and _cache_key in _cache:
-        #     _do_cache = False
-        #     for cd, ct, cv, ca in _cache[_cache_key]:
-        #         motions.append(Motion.__new__(Motion, start_time + cd, ct, cv, ca, allow_interruption))
-        # else:
         if v0 > 0 and displacement < v0 * v0 / (2 * d):
             t0 = v0 / d
             s0 = v0 * t0 - 0.5 * d * t0 * t0
@@ -169,16 +203,45 @@ cdef class Mover:
                 motions.append(m)
                 st += t1
 
+        return motions
+
+    cdef tuple create_motions(self, double start_time, double displacement, bint allow_interruption, mode="default"):
+        cdef Spec spec = self.specs[mode]
+        cdef MotionCache cache = self.motion_cache
+        cdef double st = start_time
+        cdef double offset, timespan, v, a
+        cdef list profile
+        cdef object key
+        cdef Motion m
+
+        if cache.enabled and feq(self.curr_v, 0):
+            # Displacements are rounded to the cache resolution whether or not the profile is cached,
+            # so the result never depends on what happens to be in the cache.
+            key = (mode, llround(displacement / cache.resolution))
+            profile = cache.get(key)
+            if profile is None:
+                profile = [(m.start_time, m.timespan, m.start_v, m.a)
+                           for m in self.plan_motions(spec, 0, 0, key[1] * cache.resolution, False)]
+                cache.put(key, profile)
+            motions = []
+            for offset, timespan, v, a in profile:
+                motions.append(Motion.__new__(Motion, start_time + offset, timespan, v, a, allow_interruption))
+            if profile:
+                offset, timespan, v, a = profile[len(profile) - 1]
+                self.curr_v = v + a * timespan
+                self.curr_a = a
+                st = start_time + offset + timespan
+            return st - start_time, motions
+
+        motions = self.plan_motions(spec, self.curr_v, st, displacement, allow_interruption)
         if motions:
             m = motions[len(motions) - 1]
             self.curr_v = m.finish_velocity
             self.curr_a = m.a
             st = m.finish_time
 
-            # if _do_cache:
-            #     _cache[_cache_key] = [(m.start_time - start_time, m.timespan, m.start_v, m.a) for m in motions]
-
         return st - start_time, motions
 
     cpdef void commit_motions(self, motions):
         self.pending_motions.extend(motions)
+        self.epoch += 1
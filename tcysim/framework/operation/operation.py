@@ -3,6 +3,7 @@ from enum import Enum, auto, IntEnum
 
 from .step import CallBackStep, EmptyStep, MoverStep, ProbeStep, StepWorkflow, SyncStep
 from ..event_reason import EventReason
+from ..probe.manager import probe_id
 from ..request import Request
 from ..callback import CallBack
 from tcysim.utils import Paths, V3
@@ -46,6 +47,8 @@ class Operation:
         self.interruption_flag = False
         self.locking_positions = list(locking_pos)
         self.box = box
+        # attributes set on the operation while its steps were built, see adopt_plan
+        self.plan_attrs = ()
         self.__dict__.update(attrs)
 
     def clean(self):
@@ -88,15 +91,35 @@ class Operation:
             self.finish_time = self.workflow.dry_run(self, self.start_time)
             self.record_path_points()
 
+    def adopt_plan(self, other, start_time):
+        """Take over the dry-run plan of other, an identical operation, moved to start_time.
+
+        Only the plan is taken: the workflow, the path traces, the timing and
+        the plan_attrs the builder set on other, not the outcome of the checks
+        other went through afterwards such as its interference.
+        """
+        delta = start_time - other.start_time
+        other.workflow.shift(delta, other, self)
+        for paths in other.paths.values():
+            paths.shift_time(delta)
+        for name in other.plan_attrs:
+            setattr(self, name, getattr(other, name))
+        self.plan_attrs = other.plan_attrs
+        self.workflow = other.workflow
+        self.paths = other.paths
+        self._pps = other._pps
+        self.start_time = start_time
+        self.finish_time = other.finish_time + delta
+
     def extend(self, steps):
         for step in steps:
             self.workflow.add(step)
 
     def emit_signal(self, name):
-        return CallBackStep(self.request.signals[name])
+        return CallBackStep(self.request.signals[name], name)
 
     def fire_probe(self, probe_name, *args, probe_reason=EventReason.PROBE_ACTION, **kwargs):
-        return ProbeStep(probe_name, args, kwargs, probe_reason)
+        return ProbeStep(probe_id(probe_name), args, kwargs, probe_reason)
 
     def wait(self, time):
         return EmptyStep(self.equipment.components[0], time)
@@ -52,6 +52,14 @@ cdef class StepBase:
     cdef void commit(self, yard):
         self.committed = True
 
+    cdef void shift(StepBase self, double delta):
+        self.start_time += delta
+        self.finish_time += delta
+        self.next_time += delta
+
+    cdef void rebind(StepBase self, old_op, new_op):
+        pass
+
     cdef StepBase and_c(StepBase self, StepBase other):
         if isinstance(other, AndStep):
             (<AndStep> other)._and(self)
@@ -112,6 +120,11 @@ cdef class EmptyStep(StepBase):
             (<EmptyStep> self).mover.commit_motions(((<EmptyStep> self).motion,))
         self.committed = True
 
+    cdef void shift(EmptyStep self, double delta):
+        StepBase.shift(self, delta)
+        if self.motion is not None:
+            self.motion.shift(delta)
+
 cdef class SyncStep(StepBase):
     cdef object req
 
@@ -133,9 +146,11 @@ cdef class SyncStep(StepBase):
 
 cdef class CallBackStep(StepBase):
     cdef object callback
+    cdef str signal
 
-    def __init__(CallBackStep self, object callback):
+    def __init__(CallBackStep self, object callback, str signal=None):
         self.callback = callback
+        self.signal = signal
 
     cdef void execute(CallBackStep self, op, double est):
         if not self.executed:
@@ -151,15 +166,25 @@ cdef class CallBackStep(StepBase):
             yard.cmgr.add(self.callback)
         self.committed = True
 
+    cdef void shift(CallBackStep self, double delta):
+        StepBase.shift(self, delta)
+        self.callback.time = self.start_time
+
+    cdef void rebind(CallBackStep self, old_op, new_op):
+        # the request links fresh callbacks to its signals on every attempt
+        if self.signal is not None:
+            self.callback = new_op.request.signals[self.signal]
+            self.callback.time = self.start_time
+
 
 cdef class ProbeStep(StepBase):
-    cdef str probe_name
+    cdef int probe_id
     cdef int probe_reason
     cdef tuple args
     cdef dict kwargs
 
-    def __init__(ProbeStep self, str probe_name, tuple args, dict kwargs, int probe_reason):
-        self.probe_name = probe_name
+    def __init__(ProbeStep self, int probe_id, tuple args, dict kwargs, int probe_reason):
+        self.probe_id = probe_id
         self.probe_reason = probe_reason
         self.args = args
         self.kwargs = kwargs
@@ -174,9 +199,14 @@ cdef class ProbeStep(StepBase):
 
     cdef void commit(ProbeStep self, yard):
         if not self.committed:
-            yard.probe_mgr.fire(self.start_time, self.probe_name, self.args, self.kwargs, self.probe_reason)
+            probe_mgr = yard.probe_mgr
+            if probe_mgr.mask:
+                probe_mgr.fire(self.start_time, self.probe_id, self.args, self.kwargs, self.probe_reason)
         self.committed = True
 
+    cdef void rebind(ProbeStep self, old_op, new_op):
+        self.args = tuple(new_op if arg is old_op else arg for arg in self.args)
+
 cdef class MoverStep(StepBase):
     cdef Mover mover
     cdef double src_loc
@@ -228,6 +258,12 @@ cdef class MoverStep(StepBase):
             self.mover.commit_motions(self.motions)
         self.committed = True
 
+    cdef void shift(MoverStep self, double delta):
+        cdef Motion m
+        StepBase.shift(self, delta)
+        for m in self.motions:
+            m.shift(delta)
+
     cdef list reduce(self):
         cdef Motion m
         cdef list seq = [self.mover.axis, self.mode, self.start_time, self.start_v]
@@ -349,12 +385,44 @@ cdef class StepWorkflow:
                 self.finish_time = step.finish_time
         return self.finish_time
 
+    def shift(self, double delta, old_op=None, new_op=None):
+        """Move an executed workflow by delta in time, optionally handing it over to new_op."""
+        cdef StepBase step
+        for step in self.steps:
+            step.shift(delta)
+            if new_op is not None:
+                step.rebind(old_op, new_op)
+        self.finish_time += delta
+
     def commit(self, yard):
         cdef StepBase step
         while self.sorted_steps:
             step = heapq.heappop(self.sorted_steps)
             step.commit(yard)
 
+    def trajectory(self):
+        """The moves of an executed workflow in start order.
+
+        Each item is ``(axis, start_time, src_loc, motions)``, the axis being
+        an index and the motions ``(start_time, timespan, start_v, a)``, enough
+        to locate every component at any time of the operation without the
+        movers.
+        """
+        cdef StepBase step
+        cdef MoverStep ms
+        cdef Motion m
+        cdef list res = []
+        cdef list motions
+        for step in self.steps:
+            if isinstance(step, MoverStep) and step.executed:
+                ms = <MoverStep> step
+                motions = []
+                for m in ms.motions:
+                    motions.append((m.start_time, m.timespan, m.start_v, m.a))
+                res.append((ms.mover.axis, ms.start_time, ms.src_loc, motions))
+        res.sort(key=lambda item: item[1])
+        return res
+
     def dump(self, packer):
         cdef StepBase step
         cdef list res = []
@@ -1,9 +1,16 @@
 from .action import ProbeActionTemplate
-from .manager import ProbeManager
+from .manager import ProbeManager, probe_id, probe_name
 from .processor import ProbeProcessor
 
 
-def on_probe(probe_name):
+def on_probe(probe_name, sync=False):
+    """Register the decorated method of a ProbeProcessor as an action of probe_name.
+
+    Actions are queued and run by the processor at the probe time. A sync
+    action is instead called inline as the probe fires, skipping the queue; it
+    then runs at the current simulation time, which for probes fired by
+    operation steps may be earlier than the probe time.
+    """
     def wrapper(func):
-        return ProbeActionTemplate(probe_name, func)
+        return ProbeActionTemplate(probe_name, func, sync)
     return wrapper
\ No newline at end of file
@@ -2,20 +2,24 @@ from pesim.pairing_heap cimport MinPairingHeapNode
 
 cdef class ProbeActionTemplate:
     cdef readonly str probe_name
+    cdef readonly bint sync
     cdef object func
-    cdef object processor
+    cdef readonly object processor
 
-    def __init__(self, str probe_name, func):
+    def __init__(self, str probe_name, func, bint sync=False):
         self.probe_name = probe_name
         self.func = func
+        self.sync = sync
         self.processor = None
 
     def set_processor(self, processor):
         self.processor = processor
 
     def activate(self, double time, tuple args, dict kwargs, int reason):
-        action = ProbeAction(self, time, args, kwargs, reason)
-        self.processor.add_action(action)
+        if self.sync:
+            self.func(self.processor, *args, **kwargs)
+        else:
+            self.processor.add_action(ProbeAction(self, time, args, kwargs, reason))
 
     cdef call(self, tuple args, dict kwargs):
         self.func(self.processor, *args, **kwargs)
@@ -26,7 +30,7 @@ cdef class ProbeAction(MinPairingHeapNode):
     cdef ProbeActionTemplate template
     cdef tuple args
     cdef dict kwargs
-    cdef int reason
+    cdef readonly int reason
 
     def __init__(self, ProbeActionTemplate template, double time, tuple args, dict kwargs,
                  int reason):
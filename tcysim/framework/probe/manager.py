@@ -1,19 +1,55 @@
+_probe_ids = {}
+_probe_names = []
+
+
+def probe_id(probe_name):
+    """Return the integer id of a probe name, registering it on first use.
+
+    Ids are process-wide, so call sites can resolve their probe names once at
+    import time and fire by id afterwards.
+    """
+    pid = _probe_ids.get(probe_name)
+    if pid is None:
+        pid = _probe_ids[probe_name] = len(_probe_names)
+        _probe_names.append(probe_name)
+    return pid
+
+
+def probe_name(pid):
+    return _probe_names[pid]
 
 
 class ProbeManager:
     def __init__(self, yard):
-        self._set = {}
+        self._actions = []
+        self.mask = 0
         self.yard = yard
 
     def register(self, probe_action_template):
-        probe_name = probe_action_template.probe_name
-        if probe_name not in self._set:
-            self._set[probe_name] = []
-        self._set[probe_name].append(probe_action_template)
-
-    def fire(self, time, prob_name, args, kwargs, reason):
-        if prob_name in self._set:
-            for action in self._set[prob_name]:
+        pid = probe_id(probe_action_template.probe_name)
+        if pid >= len(self._actions):
+            self._actions.extend([] for _ in range(pid + 1 - len(self._actions)))
+        self._actions[pid].append(probe_action_template)
+        self.mask |= 1 << pid
+
+    def clear(self):
+        """Unregister every probe action, dropping the ones already queued on their processors."""
+        for templates in self._actions:
+            for template in templates:
+                if template.processor is not None:
+                    template.processor.clear()
+        self._actions = []
+        self.mask = 0
+
+    def enabled(self, probe):
+        pid = probe if isinstance(probe, int) else _probe_ids.get(probe)
+        return pid is not None and (self.mask >> pid) & 1 == 1
+
+    def fire(self, time, probe, args, kwargs, reason):
+        if not self.mask:
+            return
+        pid = probe if isinstance(probe, int) else _probe_ids.get(probe)
+        if pid is not None and (self.mask >> pid) & 1:
+            for action in self._actions[pid]:
                 action.activate(time, args, kwargs, reason)
             return True
-
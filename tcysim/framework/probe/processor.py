@@ -23,8 +23,23 @@ class ProbeProcessor(Process):
             return TIME_FOREVER, EventReason.LAST
 
     def _process(self):
-        self.actions.pop()()
+        actions = self.actions
+        action = actions.pop()
+        if action is None:
+            return
+        time, reason = action.time, action.reason
+        action()
+        # run the rest of the actions due at the same time in the same batch
+        action = actions.first()
+        while action is not None and action.time == time and action.reason == reason:
+            actions.pop()()
+            action = actions.first()
+
+    def clear(self):
+        self.actions = MinPairingHeap()
 
     def add_action(self, action):
+        first = self.actions.first()
         self.actions.push(action)
-        self.activate(action.time, EventReason.PROBE_ACTION)
\ No newline at end of file
+        if first is None or action.key_lt(first):
+            self.activate(action.time, EventReason.PROBE_ACTION)
\ No newline at end of file
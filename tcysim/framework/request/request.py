@@ -57,6 +57,7 @@ class Request(IndexObject):
         else:
             self.block = None
         self.access_point = None
+        self.queue = None
         self.one_time_attempt = one_time_attempt
         self.reject_times = 0
         self.acquire_fails = set()
@@ -84,6 +85,8 @@ class Request(IndexObject):
         else:
             self.state = self.STATE.READY
             self.ready_time = time
+        if self.queue is not None:
+            self.block.req_dispatcher.update_request(self)
 
     def is_ready(self):
         if self.state == self.STATE.READY or self.state == self.STATE.RESUME_READY:
@@ -153,9 +156,9 @@ class Request(IndexObject):
         self.acquired_positions.append(pos)
 
     def on_resource_release(self, time, pos_hash):
-        self.acquire_fails.remove(pos_hash)
-        if not self.acquire_fails:
-            self.ready(time)
+        # the block only calls back once the last stack waited for is released
+        self.acquire_fails.clear()
+        self.ready(time)
         self.equipment.job_scheduler.schedule(time)
 
     def __repr__(self):
@@ -69,3 +69,51 @@ class EventGenerator(Process):
             ev = self.handler.on_fail(ev)
             if ev:
                 self.install_or_add(ev)
+
+
+class StreamingEventGenerator(EventGenerator):
+    """EventGenerator pulling its events lazily from ``schedule()``, an iterator of events in time order.
+
+    Only the scheduled events due within ``lookahead`` seconds of the current
+    time, or before the first queued event, are in the queue; the next ones
+    are pulled as the time moves on, so the queue stays as small as the
+    window however long the schedule is. Scheduled events from ``stop_time``
+    on are never pulled. Streaming is only available on this heapq based
+    generator, not on the one of generator2.
+    """
+
+    def __init__(self, yard, lookahead=3600, stop_time=TIME_FOREVER):
+        super(StreamingEventGenerator, self).__init__(yard)
+        self.lookahead = lookahead
+        self.stop_time = stop_time
+        self._schedule = None
+        self._next = None
+
+    def schedule(self):
+        yield from []
+
+    def _pull(self):
+        self._next = next(self._schedule, None)
+        if self._next is not None and self._next.time >= self.stop_time:
+            self._next = None
+
+    def _refill(self):
+        horizon = self.time + self.lookahead
+        while self._next is not None:
+            if self.queue and self._next.time > max(horizon, self.queue[0].time):
+                break
+            self.install_or_add(self._next)
+            self._pull()
+
+    def _wait(self):
+        self._refill()
+        return super(StreamingEventGenerator, self)._wait()
+
+    def stop(self):
+        self.queue.clear()
+        self._next = None
+
+    def start(self):
+        self._schedule = iter(self.schedule())
+        self._pull()
+        super(StreamingEventGenerator, self).start()
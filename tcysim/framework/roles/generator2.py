@@ -78,3 +78,4 @@ class EventGenerator(Process):
     def start(self):
         self.queue = MinPairingHeap(self.initial_events())
         super(EventGenerator, self).start()
+
@@ -13,11 +13,17 @@ class ReqDispatcher:
     def available_requests(self, equipment):
         return self.pool.available_requests(equipment)
 
+    def best_request(self, equipment):
+        return self.pool.best_request(equipment)
+
     def pop_request(self, request):
         return self.pool.pop(request)
 
+    def update_request(self, request):
+        self.pool.update(request)
+
     def refresh_pool(self, time):
-        for request in self.pool.available_requests():
+        for request in self.pool.unassigned_requests():
             if request.state >= request.STATE.READY and request.equipment is None:
                 if not request.equipment:
                     request.equipment = self.choose_equipment(time, request)
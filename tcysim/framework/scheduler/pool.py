@@ -1,11 +1,71 @@
+import heapq
 from collections import deque
+from itertools import count
+
+
+class RankIndex:
+    """Heap of the ready requests one equipment may take, ordered by its rank_task.
+
+    Entries are ``[rank, origin, seq, request]``; ``origin`` keeps local requests
+    ahead of free ones on equal rank and ``seq`` keeps the submission order.
+    Removed entries are only blanked and get dropped when they reach the top.
+    """
+    LOCAL = 0
+    FREE = 1
+
+    def __init__(self, rank_func):
+        self.rank_func = rank_func
+        self.heap = []
+        self.entries = {}
+        self.seq = count()
+
+    def __len__(self):
+        return len(self.entries)
+
+    def add(self, request, origin):
+        self.discard(request)
+        entry = [self.rank_func(request), origin, next(self.seq), request]
+        self.entries[request] = entry
+        heapq.heappush(self.heap, entry)
+
+    def discard(self, request):
+        entry = self.entries.pop(request, None)
+        if entry is not None:
+            entry[-1] = None
+            if len(self.heap) > 2 * len(self.entries) + 64:
+                self.heap = [entry for entry in self.heap if entry[-1] is not None]
+                heapq.heapify(self.heap)
+
+    def first(self):
+        heap = self.heap
+        skipped = []
+        found = None
+        while heap:
+            entry = heap[0]
+            request = entry[-1]
+            if request is None:
+                heapq.heappop(heap)
+            elif request.is_ready():
+                found = entry
+                break
+            else:
+                skipped.append(heapq.heappop(heap))
+        for entry in skipped:
+            heapq.heappush(heap, entry)
+        return found
 
 
 class ReqPool:
     def __init__(self):
         self.free_pool = set()
+        self.free_ready = set()
         self.local_pool = {}
         self.access_queues = {}
+        self.indexes = {}
+
+    @staticmethod
+    def indexable(request):
+        return request.state == request.STATE.READY or request.state == request.STATE.RESUME_READY
 
     def all_requests(self):
         yield from self.free_pool
@@ -14,6 +74,18 @@ class ReqPool:
         for queue in self.access_queues.values():
             yield from queue
 
+    def index(self, equipment):
+        index = self.indexes.get(equipment)
+        if index is None:
+            index = RankIndex(equipment.job_scheduler.rank_task)
+            for request in self.local_pool.get(equipment, ()):
+                if self.indexable(request):
+                    index.add(request, index.LOCAL)
+            for request in self.free_ready:
+                index.add(request, index.FREE)
+            self.indexes[equipment] = index
+        return index
+
     def push(self, request, equipment=None, access_name=None):
         if equipment is not None:
             if equipment not in self.local_pool:
@@ -33,26 +105,76 @@ class ReqPool:
         else:
             self.free_pool.add(request)
             request.queue = "free"
+        self.update(request)
+
+    def update(self, request):
+        queue = request.queue
+        ready = self.indexable(request)
+        if queue == "free":
+            if ready:
+                self.free_ready.add(request)
+                for index in self.indexes.values():
+                    index.add(request, index.FREE)
+            else:
+                self.free_ready.discard(request)
+                for index in self.indexes.values():
+                    index.discard(request)
+        elif queue is not None and not isinstance(queue, (str, int)):
+            index = self.indexes.get(queue)
+            if index is not None:
+                if ready:
+                    index.add(request, index.LOCAL)
+                else:
+                    index.discard(request)
 
     def pop(self, request):
         if request.queue == "free":
             self.free_pool.remove(request)
+            self.free_ready.discard(request)
+            for index in self.indexes.values():
+                index.discard(request)
         elif isinstance(request.queue, str) or isinstance(request.queue, int):
             self.access_queues[request.queue].popleft()
         else:
             self.local_pool[request.queue].remove(request)
-        del request.queue
+            index = self.indexes.get(request.queue)
+            if index is not None:
+                index.discard(request)
+        request.queue = None
+        return request
 
     def repush(self, request, equipment):
         self.push(self.pop(request), equipment)
 
-    def available_requests(self, equipment=None):
-        if equipment in self.local_pool:
-            yield from self.local_pool[equipment]
-        yield from self.free_pool
+    def access_heads(self):
         for queue in self.access_queues.values():
             if queue:
                 req = queue[0]
                 if req.predecessor is None or \
                         req.predecessor.state == req.STATE.FINISHED:
                     yield req
+
+    def unassigned_requests(self):
+        yield from list(self.free_ready)
+        yield from list(self.access_heads())
+
+    def available_requests(self, equipment=None):
+        if equipment in self.local_pool:
+            yield from self.local_pool[equipment]
+        yield from self.free_pool
+        yield from self.access_heads()
+
+    def best_request(self, equipment):
+        index = self.index(equipment)
+        entry = index.first()
+        if entry is None:
+            min_rank, chosen = None, None
+        else:
+            min_rank, chosen = entry[0], entry[-1]
+        for req in self.access_heads():
+            if req.is_ready():
+                rank = index.rank_func(req)
+                if chosen is None or rank < min_rank:
+                    min_rank, chosen = rank, req
+        if chosen is not None:
+            return min_rank, chosen
@@ -1,8 +1,16 @@
 from pesim import Process
 from ..event_reason import EventReason
+from ..probe import probe_id
+
+PROBE_SCHEDULER_SCHEDULED = probe_id("scheduler.scheduled")
 
 
 class JobScheduler(Process):
+    # Requests are ranked once when they become ready and kept in the dispatchers'
+    # rank indexes. Schedulers whose rank_task depends on anything but the request's
+    # own state should switch this off to fall back to choose_task over all requests.
+    indexed_ranking = True
+
     def __init__(self, equipment):
         self.equipment = equipment
         self.pending = False
@@ -33,6 +41,21 @@ class JobScheduler(Process):
             block.req_dispatcher.refresh_pool(time)
             yield from block.req_dispatcher.available_requests(self.equipment)
 
+    def next_request(self, time):
+        if not self.indexed_ranking:
+            return self.choose_task(time, self.available_requests(time))
+        min_rank = None
+        chosen = None
+        for dispatcher in self.parent_dispatchers:
+            dispatcher.refresh_pool(time)
+            found = dispatcher.best_request(self.equipment)
+            if found is not None:
+                rank, request = found
+                if min_rank is None or rank < min_rank:
+                    chosen = request
+                    min_rank = rank
+        return chosen
+
     def _process(self):
         self.on_schedule(self.time)
 
@@ -43,14 +66,13 @@ class JobScheduler(Process):
     def on_schedule(self, time):
         if self.pending:
             if self.equipment.ready_for_new_task():
-                avail_tasks = self.available_requests(time)
-                request = self.choose_task(time, avail_tasks)
+                request = self.next_request(time)
                 if request is not None:
                     request.equipment = self.equipment
                     request.block.req_dispatcher.pop_request(request)
                     setattr(request, "time", time)
                     self.equipment.submit_task(request)
-                    self.equipment.yard.fire_probe(self.time, 'scheduler.scheduled', request)
+                    self.equipment.yard.fire_probe(PROBE_SCHEDULER_SCHEDULED, request)
             self.pending = False
 
     def on_idle(self, time):
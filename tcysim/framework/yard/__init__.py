@@ -1 +1,2 @@
 from .yard import Yard
+from .fork import YardFork, YardForkError
@@ -0,0 +1,104 @@
+import os
+import pickle
+import signal
+import sys
+import traceback
+
+
+class YardForkError(Exception):
+    pass
+
+
+class YardFork:
+    """Handle on a what-if evaluation running in a forked copy of a yard.
+
+    The child is created with os.fork, so it starts from the exact live state
+    of the yard (blocks, boxes, movers, request pools, pending events and the
+    generators driving the processes) and only the pages it modifies get
+    copied. Whatever the evaluated function returns is pickled back to the
+    parent through a pipe. A fork whose result is not wanted any more should be
+    closed, or used as a context manager, so that the child is killed and
+    reaped instead of being left as a zombie.
+    """
+
+    def __init__(self, pid, fd):
+        self.pid = pid
+        self.fd = fd
+        self._result = None
+        self._error = None
+        self._done = False
+        self._owner = os.getpid()
+
+    @classmethod
+    def spawn(cls, yard, func, args, kwargs, probes=False):
+        if not hasattr(os, "fork"):
+            raise NotImplementedError("Yard.fork requires os.fork")
+        sys.stdout.flush()
+        sys.stderr.flush()
+        r, w = os.pipe()
+        pid = os.fork()
+        if pid == 0:
+            os.close(r)
+            code = 0
+            try:
+                if not probes:
+                    yard.probe_mgr.clear()
+                yard.rebuild_indexes()
+                try:
+                    data = pickle.dumps((True, func(yard, *args, **kwargs)), pickle.HIGHEST_PROTOCOL)
+                except BaseException:
+                    data = pickle.dumps((False, traceback.format_exc()), pickle.HIGHEST_PROTOCOL)
+                    code = 1
+                with os.fdopen(w, "wb") as fp:
+                    fp.write(data)
+            except BaseException:
+                code = 2
+            finally:
+                sys.stdout.flush()
+                sys.stderr.flush()
+                os._exit(code)
+        os.close(w)
+        return cls(pid, r)
+
+    def result(self):
+        if not self._done:
+            with os.fdopen(self.fd, "rb") as fp:
+                data = fp.read()
+            _, status = os.waitpid(self.pid, 0)
+            self._done = True
+            if not data:
+                self._error = "forked yard exited with status {} and no result".format(status)
+            else:
+                succeed, value = pickle.loads(data)
+                if succeed:
+                    self._result = value
+                else:
+                    self._error = value
+        if self._error is not None:
+            raise YardForkError(self._error)
+        return self._result
+
+    def close(self):
+        # a copy of the handle inherited by another forked yard must not touch the child
+        if self._done or os.getpid() != self._owner:
+            return
+        self._done = True
+        self._error = "forked yard was closed before its result was read"
+        os.close(self.fd)
+        try:
+            os.kill(self.pid, signal.SIGKILL)
+        except ProcessLookupError:
+            pass
+        os.waitpid(self.pid, 0)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def __del__(self):
+        try:
+            self.close()
+        except Exception:
+            pass
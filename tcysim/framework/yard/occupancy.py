@@ -0,0 +1,38 @@
+import numpy as np
+
+from tcysim.libc.block import BlockStackTensor
+
+
+class YardOccupancy:
+    """Stack heights and bay states of all the blocks of a yard as NumPy arrays.
+
+    ``heights[b, i, j]`` is the number of boxes in the stack (i, j) of
+    ``blocks[b]`` and ``bay_states[b, i]`` the BlockColumnUsage of its bay i;
+    both are -1 outside of a block smaller than the largest one. ``refresh()``
+    rewrites only the blocks whose usage changed since the previous refresh,
+    so polling a yard that barely moved is cheap. The blocks are those of the
+    yard when the occupancy is created.
+    """
+
+    def __init__(self, yard, include_occupied=True):
+        self.yard = yard
+        self.blocks = list(yard.blocks.values())
+        self.tensor = BlockStackTensor(self.blocks, include_occupied)
+        num, bays, rows = self.tensor.shape
+        self.heights = np.empty((num, bays, rows), dtype=np.intc)
+        self.bay_states = np.empty((num, bays), dtype=np.intc)
+        self.refresh(full=True)
+
+    def refresh(self, full=False):
+        """Bring the arrays up to date and return the number of blocks rewritten."""
+        return self.tensor.fill(self.heights, self.bay_states, full)
+
+    def teu_per_block(self):
+        return np.where(self.heights > 0, self.heights, 0).sum(axis=(1, 2))
+
+    def free_stacks_per_bay(self):
+        return (self.heights == 0).sum(axis=2)
+
+    def bays_in_state(self, state):
+        """Number of bays of every block in the given BlockColumnUsage state."""
+        return (self.bay_states == state).sum(axis=1)
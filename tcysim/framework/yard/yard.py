@@ -1,10 +1,14 @@
 from pesim import Environment, TIME_PASSED
 from ..event_reason import EventReason
-from ..probe import ProbeManager
+from ..probe import ProbeManager, probe_id
 from ..request import Request
 from ..roles import Roles
 from ..callback import CallBackManager
 from ..allocator import SpaceAllocator
+from tcysim.libc import CBoxRegistry
+from .fork import YardFork
+
+PROBE_BOX_ALLOC = probe_id("box.alloc")
 
 
 class Yard:
@@ -15,6 +19,7 @@ class Yard:
         self.env = Environment()
         self.blocks = {}
         self.equipments = []
+        self.box_registry = CBoxRegistry()
 
         self.smgr = self.SpaceAllocator(self)
         self.cmgr = CallBackManager(self)
@@ -29,6 +34,7 @@ class Yard:
 
     def deploy(self, block, equipments):
         self.blocks[block.id] = block
+        self.box_registry.attach(block)
         block.deploy(equipments)
 
         for equipment in equipments:
@@ -46,8 +52,36 @@ class Yard:
     def run_until(self, time, after_reason=TIME_PASSED):
         return self.env.run_until(time, after_reason)
 
-    def fire_probe(self, probe_name, *args, **kwargs):
-        return self.probe_mgr.fire(self.env.time, probe_name, args, kwargs, EventReason.PROBE_ACTION)
+    def fork(self, func, *args, probes=False, **kwargs):
+        """Evaluate func(yard, *args, **kwargs) on a copy-on-write copy of the current yard.
+
+        This stands in for a snapshot()/restore() pair: most of the yard state
+        lives in pesim's event queue and in suspended process generators, which
+        cannot be copied and restored in place, so the copy is a forked child
+        process and the parent yard is never touched. Returns a YardFork
+        immediately, so several candidates can be evaluated in parallel;
+        YardFork.result() waits for the child and returns what func returned.
+
+        By default the probe actions registered on the yard, queued ones
+        included, are dropped in the child, so that the loggers they feed are
+        only written by the parent. Pass probes=True to keep them, e.g. for
+        probe processors that only count in memory.
+        """
+        return YardFork.spawn(self, func, args, kwargs, probes)
+
+    def rebuild_indexes(self):
+        """Recompute the derived indexes of the blocks, e.g. after a fork or after moving equipments directly."""
+        for block in self.blocks.values():
+            block.rebuild_indexes()
+
+    def occupancy(self, include_occupied=True):
+        """Vectorized view of the stacks of all the blocks, see YardOccupancy; requires numpy."""
+        from .occupancy import YardOccupancy
+        return YardOccupancy(self, include_occupied)
+
+    def fire_probe(self, probe, *args, **kwargs):
+        if self.probe_mgr.mask:
+            return self.probe_mgr.fire(self.env.time, probe, args, kwargs, EventReason.PROBE_ACTION)
 
     def submit_request(self, time, request, ready=True):
         request.submit(time, ready)
@@ -57,7 +91,7 @@ class Yard:
 
     def alloc(self, time, box, block, loc):
         box.alloc(time, block, loc)
-        self.fire_probe("box.alloc", box)
+        self.fire_probe(PROBE_BOX_ALLOC, box)
 
     def store(self, time, box, lane):
         request = self.new_request("STORE", time, box, lane=lane)
@@ -73,6 +107,12 @@ class Yard:
     def new_request(cls, type, *args, **kwargs):
         return cls.ReqCls(cls.ReqCls.TYPE[type], *args, **kwargs)
 
-    def boxes(self):
-        for block in self.blocks:
-            yield from block.iterboxes()
+    def box(self, box_id, default=None):
+        return self.box_registry.get(box_id, default)
+
+    def boxes(self, *states):
+        """Boxes of the yard in any of the given states, or all of them if none is given."""
+        return self.box_registry.boxes(*states)
+
+    def count_boxes(self, *states):
+        return self.box_registry.count(*states)
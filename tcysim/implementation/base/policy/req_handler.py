@@ -1,8 +1,12 @@
 from tcysim.framework.equipment import ReqHandler as ReqHandlerBase
 from tcysim.framework.event_reason import EventReason
 from tcysim.framework.exception.handling import *
+from tcysim.framework.probe import probe_id
 from tcysim.utils.dispatcher import Dispatcher
 
+PROBE_BOX_PICK_UP = probe_id("box.pick_up")
+PROBE_BOX_PUT_DOWN = probe_id("box.put_down")
+
 
 class ReqHandler(ReqHandlerBase):
     def on_conflict(self, time, op):
@@ -88,6 +92,7 @@ class ReqHandler(ReqHandlerBase):
     def on_store_off_agv(self, time, request):
         box = request.box
         box.equipment = request.equipment
+        self.yard.fire_probe(PROBE_BOX_PICK_UP, box, box.equipment)
         # box.start_store()
         request.sync(time)
 
@@ -96,6 +101,7 @@ class ReqHandler(ReqHandlerBase):
         box.store(time)
         box.block.release_stack(time, box.location)
         box.equipment = None
+        self.yard.fire_probe(PROBE_BOX_PUT_DOWN, box, request.equipment)
 
     def on_retrieve_start(self, time, request):
         pass
@@ -109,11 +115,13 @@ class ReqHandler(ReqHandlerBase):
         box.retrieve(time)
         box.equipment = request.equipment
         box.block.release_stack(time, box.location)
+        self.yard.fire_probe(PROBE_BOX_PICK_UP, box, box.equipment)
 
     def on_retrieve_on_agv(self, time, request):
         box = request.box
         box.finish_retrieve()
         box.equipment = None
+        self.yard.fire_probe(PROBE_BOX_PUT_DOWN, box, request.equipment)
         request.sync(time)
 
     def on_adjust_start(self, time, request):
@@ -134,8 +142,10 @@ class ReqHandler(ReqHandlerBase):
         box.equipment = self.equipment
         box.retrieve(time)
         box.block.release_stack(time, box.location)
+        self.yard.fire_probe(PROBE_BOX_PICK_UP, box, self.equipment)
 
     def on_relocate_putdown(self, time, box):
         box.store(time)
         box.equipment = None
         box.block.release_stack(time, box.location)
+        self.yard.fire_probe(PROBE_BOX_PUT_DOWN, box, self.equipment)
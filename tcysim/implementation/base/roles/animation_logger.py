@@ -1,6 +1,7 @@
 from pickle import dump
 
 from pesim import TIME_FOREVER
+from tcysim.framework.box import BoxState
 from tcysim.framework.roles import Observer
 
 
@@ -30,7 +31,9 @@ class AnimationLogger(Observer):
                 equ_coords[i] = coord.to_tuple()
 
         current_box_location = {}
-        for box in self.filter_boxes(self.yard._boxes):
+        STATE = BoxState
+        boxes = self.yard.boxes(STATE.STORING, STATE.STORED, STATE.RELOCATING, STATE.RETRIEVING)
+        for box in self.filter_boxes(boxes):
             # if box.state != box.STATE.STORED or box.id not in self.box_last_positions:
             coord = box.current_coord(transform_to="g")
             if coord:
@@ -0,0 +1,330 @@
+import mmap
+import os
+import struct
+from bisect import bisect_right
+
+import msgpack
+
+from tcysim.framework.box import BoxState
+from tcysim.framework.probe import ProbeProcessor, on_probe
+from tcysim.utils import V3
+
+MAGIC = b"TCYANI1\0"
+_LEN = struct.Struct("<I")
+# size of the chunk body, its time span and whether it starts with a keyframe
+_CHUNK = struct.Struct("<IddB")
+
+OP_START = 0
+OP_FINISH = 1
+BOX_PICK_UP = 2
+BOX_PUT_DOWN = 3
+
+
+class AnimationRecorder(ProbeProcessor):
+    """Record the moves of the equipments and boxes of a yard to a file as they happen.
+
+    Nothing is polled: an operation start records the equipment coordinate and
+    the motions planned for its components, an operation finish the coordinate
+    it actually stopped at, and the "box.pick_up"/"box.put_down" probes of the
+    request handler every box taken by or released from an equipment. Events
+    are written in chunks of ``chunk_size``, every ``keyframe_interval``-th
+    chunk starting with a full snapshot of the yard, so memory stays bounded
+    however long the run and AnimationReader can rebuild any frame from the
+    nearest keyframe. Equipment coordinates are local to the equipment, the
+    header holds the transformations to the global coordinates and the offset
+    of a held box from its equipment.
+
+    Boxes stored without going through a request handler after the recording
+    started are not seen.
+    """
+
+    def __init__(self, yard, fp, chunk_size=4096, keyframe_interval=8):
+        super(AnimationRecorder, self).__init__(yard)
+        self.fp = fp
+        self.chunk_size = chunk_size
+        self.keyframe_interval = keyframe_interval
+        self.packer = msgpack.Packer()
+        self.equipments = {}
+        self.equipment_states = None
+        self.box_states = None
+        self.events = []
+        self.chunk_start = 0
+        self.keyframe = None
+        self.num_chunks = 0
+        self.closed = False
+
+    def _open(self):
+        if isinstance(self.fp, str):
+            dir_path = os.path.split(os.path.abspath(self.fp))[0]
+            if not os.path.exists(dir_path):
+                os.makedirs(dir_path)
+            self.fp = open(self.fp, "wb")
+        header = {"equipments": [self._transformation(equipment) for equipment in self.yard.equipments]}
+        data = self.packer.pack(header)
+        self.fp.write(MAGIC)
+        self.fp.write(_LEN.pack(len(data)))
+        self.fp.write(data)
+
+    @staticmethod
+    def _transformation(equipment):
+        origin = equipment.transform_to(V3.zero(), "g")
+        axes = [(equipment.transform_to(V3(*unit), "g") - origin).to_tuple()
+                for unit in ((1, 0, 0), (0, 1, 0), (0, 0, 1))]
+        box_offset = equipment.attached_box_coord("g") - equipment.current_coord("g")
+        return origin.to_tuple(), axes, box_offset.to_tuple()
+
+    def _start(self):
+        self._open()
+        yard = self.yard
+        self.equipments = {equipment: i for i, equipment in enumerate(yard.equipments)}
+        self.equipment_states = [[equipment.current_coord().to_tuple(), None] for equipment in yard.equipments]
+        self.box_states = {}
+        for box in yard.boxes(BoxState.STORING, BoxState.STORED, BoxState.RELOCATING, BoxState.RETRIEVING):
+            self._update_box(box, box.equipment)
+        self.chunk_start = self.time
+        self.keyframe = self._snapshot()
+
+    def _snapshot(self):
+        return [[list(state) for state in self.equipment_states], dict(self.box_states)]
+
+    def _update_box(self, box, equipment):
+        if box.equipment is not None:
+            self.box_states[box.id] = (box.teu, self.equipments[equipment], None)
+        else:
+            coord = box.current_coord(transform_to="g")
+            if coord is None:
+                self.box_states.pop(box.id, None)
+            else:
+                self.box_states[box.id] = (box.teu, None, coord.to_tuple())
+
+    def _append(self, event):
+        self.events.append(event)
+        if len(self.events) >= self.chunk_size:
+            self.flush()
+
+    @on_probe("operation.start", sync=True)
+    def on_operation_start(self, op):
+        if self.box_states is None:
+            self._start()
+        i = self.equipments[op.equipment]
+        coord = op.equipment.current_coord().to_tuple()
+        trajectory = op.workflow.trajectory()
+        self.equipment_states[i] = [coord, trajectory]
+        self._append((self.time, OP_START, i, coord, trajectory))
+
+    @on_probe("operation.finish", sync=True)
+    def on_operation_finish(self, op):
+        if self.box_states is None:
+            self._start()
+        i = self.equipments[op.equipment]
+        coord = op.equipment.current_coord().to_tuple()
+        self.equipment_states[i] = [coord, None]
+        self._append((self.time, OP_FINISH, i, coord))
+
+    @on_probe("box.pick_up", sync=True)
+    def on_box_pick_up(self, box, equipment):
+        if self.box_states is None:
+            self._start()
+        self._update_box(box, equipment)
+        self._append((self.time, BOX_PICK_UP, box.id, box.teu, self.equipments[equipment]))
+
+    @on_probe("box.put_down", sync=True)
+    def on_box_put_down(self, box, equipment):
+        if self.box_states is None:
+            self._start()
+        self._update_box(box, equipment)
+        state = self.box_states.get(box.id)
+        self._append((self.time, BOX_PUT_DOWN, box.id, box.teu, state[2] if state else None))
+
+    def flush(self):
+        if self.box_states is None:
+            self._start()
+        if not self.events and self.keyframe is None:
+            return
+        end = self.events[-1][0] if self.events else self.chunk_start
+        data = self.packer.pack([self.keyframe, self.events])
+        self.fp.write(_CHUNK.pack(len(data), self.chunk_start, end, self.keyframe is not None))
+        self.fp.write(data)
+        self.num_chunks += 1
+        self.events = []
+        self.chunk_start = end
+        self.keyframe = self._snapshot() if self.num_chunks % self.keyframe_interval == 0 else None
+
+    def close(self):
+        if self.closed:
+            return
+        self.flush()
+        if hasattr(self.fp, "close"):
+            self.fp.close()
+        self.closed = True
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+
+class AnimationFrame:
+    """State of the yard at one time of a recording, in global coordinates.
+
+    ``equipments`` lists the coordinate of every equipment in yard order and
+    ``boxes`` maps each visible box id to its ``(teu, coord)``, a box held by an
+    equipment being at its ``attached_box_coord``.
+    """
+    __slots__ = ["time", "equipments", "boxes"]
+
+    def __init__(self, time, equipments, boxes):
+        self.time = time
+        self.equipments = equipments
+        self.boxes = boxes
+
+    def __repr__(self):
+        return "<AnimationFrame at {:.2f}: {} equipments, {} boxes>".format(
+            self.time, len(self.equipments), len(self.boxes))
+
+
+class _Playback:
+    def __init__(self, transformations, keyframe):
+        self.transformations = transformations
+        self.equipments = [[tuple(coord), trajectory] for coord, trajectory in keyframe[0]]
+        self.boxes = dict(keyframe[1])
+
+    def apply(self, event):
+        kind = event[1]
+        if kind == OP_START:
+            self.equipments[event[2]] = [tuple(event[3]), event[4]]
+        elif kind == OP_FINISH:
+            self.equipments[event[2]] = [tuple(event[3]), None]
+        elif kind == BOX_PICK_UP:
+            self.boxes[event[2]] = (event[3], event[4], None)
+        elif event[4] is None:
+            self.boxes.pop(event[2], None)
+        else:
+            self.boxes[event[2]] = (event[3], None, event[4])
+
+    @staticmethod
+    def _local_coord(coord, trajectory, time):
+        if not trajectory:
+            return coord
+        coord = list(coord)
+        for axis, start_time, src_loc, motions in trajectory:
+            if start_time > time:
+                break
+            loc = src_loc
+            for m_start, timespan, v, a in motions:
+                if m_start >= time:
+                    break
+                t = min(time - m_start, timespan)
+                loc += v * t + 0.5 * a * t * t
+            coord[axis] = loc
+        return coord
+
+    def frame(self, time):
+        equipments = []
+        for (coord, trajectory), (origin, axes, _) in zip(self.equipments, self.transformations):
+            x, y, z = self._local_coord(coord, trajectory, time)
+            equipments.append(tuple(o + x * ax + y * ay + z * az for o, ax, ay, az in zip(origin, *axes)))
+        boxes = {}
+        for box_id, (teu, i, coord) in self.boxes.items():
+            if coord is None:
+                coord = tuple(c + d for c, d in zip(equipments[i], self.transformations[i][2]))
+            boxes[box_id] = teu, tuple(coord)
+        return AnimationFrame(time, equipments, boxes)
+
+
+class AnimationReader:
+    """Rebuild frames of a recording written by AnimationRecorder.
+
+    The file is memory-mapped and only the chunk headers are read when
+    opening; ``frame(time)`` decodes the chunks from the last keyframe before
+    ``time`` and ``frames()`` plays the recording forward at a fixed rate,
+    decoding each chunk once, so only the chunks in use are paged in.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, "rb") as fp:
+            size = os.fstat(fp.fileno()).st_size
+            self.buffer = mmap.mmap(fp.fileno(), 0, access=mmap.ACCESS_READ) if size else b""
+        if self.buffer[:len(MAGIC)] != MAGIC:
+            raise ValueError("{} is not an animation recording".format(path))
+        offset = len(MAGIC)
+        size, = _LEN.unpack_from(self.buffer, offset)
+        offset += _LEN.size
+        header = msgpack.unpackb(self.buffer[offset:offset + size], strict_map_key=False)
+        offset += size
+        self.transformations = header["equipments"]
+        self.chunks = []
+        self.keyframes = []
+        while offset < len(self.buffer):
+            size, start, end, keyframe = _CHUNK.unpack_from(self.buffer, offset)
+            offset += _CHUNK.size
+            if keyframe:
+                self.keyframes.append(len(self.chunks))
+            self.chunks.append((start, end, offset, size))
+            offset += size
+        self._keyframe_times = [self.chunks[i][0] for i in self.keyframes]
+
+    def close(self):
+        if isinstance(self.buffer, mmap.mmap):
+            self.buffer.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    @property
+    def start_time(self):
+        return self.chunks[0][0] if self.chunks else 0
+
+    @property
+    def end_time(self):
+        return self.chunks[-1][1] if self.chunks else 0
+
+    def _chunk(self, i):
+        _, _, offset, size = self.chunks[i]
+        return msgpack.unpackb(self.buffer[offset:offset + size], strict_map_key=False)
+
+    def _playback(self, time):
+        """Playback at the keyframe covering time and the index of its chunk."""
+        k = max(bisect_right(self._keyframe_times, time) - 1, 0)
+        i = self.keyframes[k]
+        keyframe, _ = self._chunk(i)
+        return _Playback(self.transformations, keyframe), i
+
+    def frame(self, time):
+        if not self.chunks:
+            raise ValueError("{} holds no frame".format(self.path))
+        playback, i = self._playback(time)
+        for j in range(i, len(self.chunks)):
+            if self.chunks[j][0] > time:
+                break
+            for event in self._chunk(j)[1]:
+                if event[0] > time:
+                    break
+                playback.apply(event)
+        return playback.frame(time)
+
+    def frames(self, start=None, end=None, fps=60, speedup=1):
+        """Yield an AnimationFrame every speedup / fps seconds of simulation time from start to end."""
+        if not self.chunks:
+            return
+        start = self.start_time if start is None else start
+        end = self.end_time if end is None else end
+        interval = speedup / fps
+        playback, i = self._playback(start)
+        time = start
+        for j in range(i, len(self.chunks)):
+            for event in self._chunk(j)[1]:
+                while event[0] > time:
+                    yield playback.frame(time)
+                    time += interval
+                    if time > end:
+                        return
+                playback.apply(event)
+        while time <= end:
+            yield playback.frame(time)
+            time += interval
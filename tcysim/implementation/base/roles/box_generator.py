@@ -2,7 +2,9 @@ from enum import IntEnum, auto
 import random
 
 from tcysim.utils.dispatcher import Dispatcher
-from tcysim.framework.roles.generator import ChainedEventBomb, GeneratorEvent, EventHandler, EventGenerator
+from tcysim.framework.box import Box
+from tcysim.framework.roles.generator import ChainedEventBomb, GeneratorEvent, EventHandler, EventGenerator, \
+    StreamingEventGenerator
 
 
 class BoxEventType(IntEnum):
@@ -44,6 +46,98 @@ class BoxGenerator(EventGenerator):
     EventHandler = BoxEventHandler
 
 
+# fields of a BoxSchedule row, as a numpy dtype spec
+SCHEDULE_FIELDS = [("time", "f8"), ("type", "i1"), ("box", "i8"), ("size", "i1")]
+
+
+class BoxSchedule:
+    """Box events in time order, one row of SCHEDULE_FIELDS per event.
+
+    ``box`` numbers a box across its ALLOC, STORE and RETRIEVE events and
+    ``size`` is its size in feet, only read on ALLOC. The rows may be a memory
+    mapped ``.npy`` file, see load() and save(), and are read ``chunk_size``
+    at a time, so iterating a schedule does not load it. Building, loading
+    and saving a schedule require numpy.
+    """
+
+    def __init__(self, rows, chunk_size=4096):
+        self.rows = rows
+        self.chunk_size = chunk_size
+
+    @classmethod
+    def from_boxes(cls, alloc_times, store_times, retrieve_times, sizes=20, chunk_size=4096):
+        """Schedule of the boxes i allocated at alloc_times[i], stored at store_times[i] and retrieved at retrieve_times[i]."""
+        import numpy as np
+        num = len(alloc_times)
+        rows = np.empty(3 * num, dtype=SCHEDULE_FIELDS)
+        events = ((BoxEventType.ALLOC, alloc_times), (BoxEventType.STORE, store_times),
+                  (BoxEventType.RETRIEVE, retrieve_times))
+        for k, (ev_type, times) in enumerate(events):
+            part = rows[k * num:(k + 1) * num]
+            part["time"] = times
+            part["type"] = ev_type
+            part["box"] = np.arange(num)
+            part["size"] = sizes
+        return cls(rows[np.lexsort((rows["type"], rows["time"]))], chunk_size)
+
+    @classmethod
+    def load(cls, path, chunk_size=4096):
+        import numpy as np
+        return cls(np.load(path, mmap_mode="r"), chunk_size)
+
+    def save(self, path):
+        import numpy as np
+        np.save(path, self.rows)
+
+    def __len__(self):
+        return len(self.rows)
+
+    def __iter__(self):
+        for i in range(0, len(self.rows), self.chunk_size):
+            chunk = self.rows[i:i + self.chunk_size]
+            yield from zip(chunk["time"].tolist(), chunk["type"].tolist(), chunk["box"].tolist(),
+                           chunk["size"].tolist())
+
+
+class ScheduledBoxEventHandler(BoxEventHandler):
+    @Dispatcher.on(BoxEventType.ALLOC)
+    def on_alloc(self, yard, time, box):
+        block, loc = yard.choose_location(box)
+        if block is None:
+            return False
+        yard.alloc(time, box, block, loc)
+        return True
+
+
+class ScheduledBoxGenerator(StreamingEventGenerator):
+    """Box generator replaying a BoxSchedule through a lookahead window instead of BoxBomb chains.
+
+    A box is made by new_box() when its ALLOC event is pulled from the
+    schedule and dropped by the generator once its RETRIEVE event is, so only
+    the boxes in between are held, however long the schedule.
+    """
+    EventHandler = ScheduledBoxEventHandler
+
+    def __init__(self, yard, box_schedule, lookahead=3600):
+        super(ScheduledBoxGenerator, self).__init__(yard, lookahead)
+        self.box_schedule = box_schedule
+        self.boxes = {}
+
+    def new_box(self, i, size):
+        return Box(str(i).encode(), size=size)
+
+    def schedule(self):
+        for time, ev_type, i, size in self.box_schedule:
+            ev_type = BoxEventType(ev_type)
+            if ev_type == BoxEventType.ALLOC:
+                box = self.boxes[i] = self.new_box(i, size)
+            elif ev_type == BoxEventType.RETRIEVE:
+                box = self.boxes.pop(i)
+            else:
+                box = self.boxes[i]
+            yield GeneratorEvent(time, ev_type, box)
+
+
 class BoxBomb(ChainedEventBomb):
     def next_time(self, time):
         raise NotImplementedError
@@ -0,0 +1,200 @@
+import csv
+import os
+import random
+from itertools import islice
+
+from tcysim.framework.box import Box
+from tcysim.framework.roles.generator import EventHandler, GeneratorEvent, StreamingEventGenerator
+from tcysim.utils.dispatcher import Dispatcher
+from .box_generator import BoxEventType
+
+# columns of a trace record, only the first three are required
+FIELDS = ("time", "kind", "box", "size", "block", "lane")
+
+
+class TraceEventHandler(EventHandler):
+    """Map the events of a trace to Yard.alloc/store/retrieve calls.
+
+    A box is looked up in the yard by its id and only made when the yard does
+    not hold it yet, or holds it as retrieved; a STORE of a box never
+    allocated allocates it first. The block of a record restricts the space
+    allocation to that block, the stack being left to the space allocator
+    since the replayed yard rarely matches the historical one slot for slot.
+    Records that would not change the box, e.g. a RETRIEVE of a box which
+    never entered the yard, are counted in ``num_skipped``. A record that
+    cannot be applied yet is retried every ``retry_interval`` seconds and
+    dropped after ``max_retries`` attempts, counted in ``num_failed``; the
+    box of a dropped ALLOC or STORE stops being waited for, so its RETRIEVE
+    is then skipped.
+    """
+    retry_interval = 60
+    max_retries = 120
+
+    def __init__(self):
+        super(TraceEventHandler, self).__init__()
+        self.num_skipped = 0
+        self.num_failed = 0
+        self.waiting = set()
+
+    @staticmethod
+    def _live_box(yard, box_id):
+        box = yard.box(box_id)
+        if box is None or box.state == box.STATE.RETRIEVED:
+            return None
+        return box
+
+    @staticmethod
+    def _lane(box, lane_id):
+        lanes = box.block.lanes
+        if lane_id in lanes:
+            return lanes[lane_id]
+        return random.choice(list(lanes.values()))
+
+    def _alloc(self, yard, time, box_id, size, block_id):
+        box = Box(box_id, size=size)
+        block = yard.blocks.get(block_id) if block_id is not None else None
+        blocks = (block,) if block is not None else yard.smgr.available_blocks(box)
+        block, loc = yard.smgr.alloc_space(box, blocks)
+        if block is None:
+            self.waiting.add(box_id)
+            return None
+        yard.alloc(time, box, block, loc)
+        self.waiting.discard(box_id)
+        return box
+
+    @Dispatcher.on(BoxEventType.ALLOC)
+    def on_alloc(self, yard, time, box_id, size, block_id, lane_id):
+        if self._live_box(yard, box_id) is not None:
+            self.num_skipped += 1
+            return True
+        return self._alloc(yard, time, box_id, size, block_id) is not None
+
+    @Dispatcher.on(BoxEventType.STORE)
+    def on_store(self, yard, time, box_id, size, block_id, lane_id):
+        box = self._live_box(yard, box_id)
+        if box is None:
+            box = self._alloc(yard, time, box_id, size, block_id)
+            if box is None:
+                return False
+        elif box.state >= box.STATE.STORING:
+            self.num_skipped += 1
+            return True
+        yard.store(time, box, self._lane(box, lane_id))
+        return True
+
+    @Dispatcher.on(BoxEventType.RETRIEVE)
+    def on_retrieve(self, yard, time, box_id, size, block_id, lane_id):
+        box = self._live_box(yard, box_id)
+        if box is None:
+            if box_id in self.waiting:
+                return False
+            self.num_skipped += 1
+            return True
+        if box.state < box.STATE.STORING:
+            return False
+        if box.state >= box.STATE.RETRIEVING:
+            self.num_skipped += 1
+            return True
+        yard.retrieve(time, box, self._lane(box, lane_id))
+        return True
+
+    def on_fail(self, ev):
+        retries = getattr(ev, "retries", 0)
+        if retries >= self.max_retries:
+            self.num_failed += 1
+            if ev.type != BoxEventType.RETRIEVE:
+                self.waiting.discard(ev.args[0])
+            return None
+        ev.retries = retries + 1
+        ev.time += self.retry_interval
+        return ev
+
+
+def _key(value):
+    """Block or lane id of a record, as an int if it looks like one."""
+    if isinstance(value, str):
+        if value.lstrip("-").isdigit():
+            return int(value)
+        return value or None
+    return value
+
+
+class TraceReplayer(StreamingEventGenerator):
+    """Replay a historical move log, streamed from a CSV or msgpack file, against the yard.
+
+    Each record has the FIELDS: its time in seconds, shifted by
+    ``time_offset``, its kind, ALLOC, STORE or RETRIEVE, the box id and
+    optionally the box size in feet, 20 by default, and the ids of the block
+    and lane it used. A CSV trace starts with a header naming its columns; a
+    msgpack trace is a stream of arrays in FIELDS order or of maps keyed by
+    the field names. Records must be in time order and are read
+    ``chunk_size`` at a time, only as far as ``lookahead`` seconds ahead of
+    the simulation, so a trace of any length is replayed in bounded memory.
+    The format is guessed from the file extension unless given.
+    """
+    EventHandler = TraceEventHandler
+    FORMATS = {".csv": "csv", ".msgpack": "msgpack", ".mpk": "msgpack"}
+
+    def __init__(self, yard, path, format=None, time_offset=0, lookahead=3600, chunk_size=4096):
+        super(TraceReplayer, self).__init__(yard, lookahead)
+        if format is None:
+            format = self.FORMATS.get(os.path.splitext(path)[1].lower())
+            if format is None:
+                raise ValueError("cannot guess the format of the trace {}".format(path))
+        elif format not in ("csv", "msgpack"):
+            raise ValueError("unknown trace format {!r}".format(format))
+        self.path = path
+        self.format = format
+        self.time_offset = time_offset
+        self.chunk_size = chunk_size
+        self.num_records = 0
+
+    def _csv_records(self, fp):
+        reader = csv.reader(fp)
+        header = next(reader, None)
+        if header is None:
+            return
+        header = [name.strip() for name in header]
+        for name in FIELDS[:3]:
+            if name not in header:
+                raise ValueError("trace {} has no column {!r}".format(self.path, name))
+        columns = [header.index(name) if name in header else None for name in FIELDS]
+        while True:
+            rows = list(islice(reader, self.chunk_size))
+            if not rows:
+                return
+            for row in rows:
+                yield [row[c] if c is not None and c < len(row) and row[c] != "" else None for c in columns]
+
+    def _msgpack_records(self, fp):
+        import msgpack
+        unpacker = msgpack.Unpacker(fp, raw=False, read_size=self.chunk_size * 64)
+        for item in unpacker:
+            if isinstance(item, dict):
+                yield [item.get(name) for name in FIELDS]
+            else:
+                yield list(item) + [None] * (len(FIELDS) - len(item))
+
+    def records(self):
+        if self.format == "csv":
+            with open(self.path, newline="") as fp:
+                yield from self._csv_records(fp)
+        else:
+            with open(self.path, "rb") as fp:
+                yield from self._msgpack_records(fp)
+
+    def schedule(self):
+        last_time = None
+        for time, kind, box_id, size, block_id, lane_id in self.records():
+            time = float(time) - self.time_offset
+            if last_time is not None and time < last_time:
+                raise ValueError("trace {} is not in time order at record {}".format(self.path, self.num_records))
+            last_time = time
+            if isinstance(kind, str):
+                kind = BoxEventType[kind.strip().upper()]
+            else:
+                kind = BoxEventType(kind)
+            if not isinstance(box_id, bytes):
+                box_id = str(box_id).encode()
+            self.num_records += 1
+            yield GeneratorEvent(time, kind, box_id, int(size or 20), _key(block_id), _key(lane_id))
@@ -9,21 +9,15 @@ class RandomSpaceAllocator(SpaceAllocator):
         blocks = list(blocks)
         random.shuffle(blocks)
         for block in blocks:
-            locs = list(block.available_cells(box))
-            if locs:
-                return block, random.choice(locs)
+            loc = block.random_available_cell(box)
+            if loc is not None:
+                return block, loc
         return None, None
 
+    # weights of the bay distance, the tier and a locked stack when ranking relocation slots
+    RELOCATION_WEIGHTS = (0, 0, 0)
+
     def slot_for_relocation(self, box, request, start_bay=None, finish_bay=None):
-        i, j, _ = box.location
-        block = box.block
-        start_bay = i if start_bay is None else start_bay
-        finish_bay = i + 1 if finish_bay is None else finish_bay
-        step = 1 if start_bay < finish_bay else -1
-        for i1 in range(start_bay, finish_bay, step):
-            if i1 == i or block.bay_is_valid(box, i1):
-                for j1 in range(0, block.rows):
-                    if (i1, j1) != (i, j):
-                        loc = V3(i1, j1, block.count(i1, j1))
-                        if box.position_is_valid(block, loc):
-                            return loc
+        cells = box.block.relocation_cells(box, 1, start_bay, finish_bay, weights=self.RELOCATION_WEIGHTS)
+        if cells:
+            return V3(*cells[0])
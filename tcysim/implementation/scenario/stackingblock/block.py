@@ -1,9 +1,10 @@
+import random
 from copy import copy
-from itertools import product
 
 from tcysim.utils import V3, TEU
 from tcysim.framework import Block
 from tcysim.utils.vector import V3i
+from .envelope import GantryEnvelopeIndex
 
 
 class StackingBlock(Block):
@@ -14,6 +15,7 @@ class StackingBlock(Block):
         size = TEU(*shape) if stacking_area_size is None else stacking_area_size
         self.stacking_interval = (size - shape * self.unit_base_size) / (shape - 1)
         self.unit_bound_size = self.unit_base_size + self.stacking_interval
+        self.gantry_envelopes = GantryEnvelopeIndex(self)
 
         for i in range(self.shape[0]):
             for j in range(self.shape[1]):
@@ -21,6 +23,10 @@ class StackingBlock(Block):
                     idx = V3i(i, j, k)
                     self.make_cell(idx, self.unit_bound_size * idx)
 
+    def rebuild_indexes(self):
+        super(StackingBlock, self).rebuild_indexes()
+        self.gantry_envelopes.rebuild()
+
     @property
     def bays(self):
         return self.shape[0]
@@ -62,10 +68,7 @@ class StackingBlock(Block):
         idx_0[1] -= 1
         idx_1[1] += 1
 
-        rs = [range(max(idx_0[i], 0), min(idx_1[i] + 1, self.shape[i])) for i in range(3)]
-        rs[self.stacking_axis] = (-1,)
-
-        h_max = max((self.count(*idx, include_occupied=False) for idx in product(*rs)), default=0)
+        h_max = self.max_stack_height(idx_0, [i + 1 for i in idx_1])
         return self.stack_height(h_max)
 
     def bay_state(self, i):
@@ -78,29 +81,53 @@ class StackingBlock(Block):
         else:
             return False
 
+    def available_cell_array(self, box, start=-1, finish=-1, allow_new_bay=True, for_relocation=False):
+        own_bay = box.location[0] if for_relocation else -1
+        max_num = self.rows * self.tiers - self.tiers
+        return self.available_cells_for_size(0, box.teu, start, finish, allow_new_bay, own_bay, max_num)
+
     def available_cells(self, box, start=-1, finish=-1, allow_new_bay=True, for_relocation=False):
-        start = 0 if start < 0 else start
-        finish = self.bays if finish < 0 else finish
+        cells = self.available_cell_array(box, start, finish, allow_new_bay, for_relocation)
+        for p in range(0, len(cells), 3):
+            yield V3i(cells[p], cells[p + 1], cells[p + 2])
+
+    def relocation_cells(self, box, k=1, start=None, finish=None, excluded=(), weights=(0, 0, 0)):
+        """The k best cells to relocate box to, from bay start towards bay finish (excluded).
+
+        The window defaults to the bay of the box, whose stack and the stacks
+        of the positions in excluded are never candidates. A cell scores
+        ``weights[0]`` per bay away from the box, ``weights[1]`` per tier and
+        ``weights[2]`` if its stack is locked; the lowest scores come first and
+        equal scores keep the scan order, bays first, then rows.
+        """
+        i, j, _ = box.location
+        start = i if start is None else start
+        finish = i + 1 if finish is None else finish
+        stacks = [self.stack_hash(box.location)]
+        stacks.extend(self.stack_hash(pos) for pos in excluded)
         max_num = self.rows * self.tiers - self.tiers
-        for i in range(start, finish):
-            if for_relocation and box.location[0] == i:
-                bay_avail = True
-            else:
-                if not allow_new_bay and self.bay_state(i) == self.COLUMN_USAGE.FREE:
-                    bay_avail = False
-                elif self.position_is_valid_for_size(i, 0, 0, box.teu):
-                    bay_avail = self.count(i, -1, -1) < max_num
-                else:
-                    bay_avail = False
-            if bay_avail:
-                for j in range(self.rows):
-                    k = self.count(i, j)
-                    if self.position_is_valid_for_size(i, j, k, box.teu):
-                        yield V3i(i, j, k)
+        cells, _ = self.ranked_cells(0, box.teu, i, start, finish, max_num, stacks, weights, k)
+        return [V3i(cells[p], cells[p + 1], cells[p + 2]) for p in range(0, len(cells), 3)]
+
+    def random_available_cell(self, box, max_trials=8):
+        num = self.free_stack_num(box.teu)
+        if num == 0:
+            return None
+        for _ in range(max_trials):
+            cell = self.free_stack(box.teu, random.randrange(num))
+            if self.bay_is_valid(box, cell.x):
+                return cell
+        cells = self.available_cell_array(box)
+        if cells:
+            p = random.randrange(len(cells) // 3) * 3
+            return V3i(cells[p], cells[p + 1], cells[p + 2])
 
     def all_stack_usages(self, include_occupied=True, avail=None, res=None):
         return self.all_column_usage(-1, include_occupied, avail, res)
 
+    def stack_usages_view(self, include_occupied=True):
+        return self.column_usage_view(-1, include_occupied)
+
     def all_bay_usages(self, include_occupied=True, avail=None, res=None):
         return self.all_slot_usage(0, include_occupied, avail, res)
 
@@ -29,11 +29,38 @@ class CraneForStackingBlock(Equipment):
     def prepare_coord_for_op_coord(self, local_coord, transform_to=None):
         return self.transform_to(local_coord.add1("z", self.clearance_above_box), transform_to)
 
+    def assign_block(self, block):
+        super(CraneForStackingBlock, self).assign_block(block)
+        block.gantry_envelopes.register(self)
+
+    def set_coord(self, v, glob=True):
+        super(CraneForStackingBlock, self).set_coord(v, glob)
+        for block in self.blocks:
+            block.gantry_envelopes.refresh(self)
+
+    def nearby_equipments(self, low=None, high=None, margin=0):
+        if low is None:
+            yield from super(CraneForStackingBlock, self).nearby_equipments()
+        else:
+            for block in self.blocks:
+                yield from block.gantry_envelopes.query(self, low, high, margin)
+
+    def perform_op(self, time, op):
+        path = op.paths.get(self.gantry, None)
+        for block in self.blocks:
+            block.gantry_envelopes.update_path(self, path)
+        yield from super(CraneForStackingBlock, self).perform_op(time, op)
+        if not self.gantry.pending_motions:
+            for block in self.blocks:
+                block.gantry_envelopes.update_position(self)
+
     def check_interference(self, op):
         axis = self.gantry.axis
         p0 = op.paths[self.gantry]
-        self_loc = self.current_coord()
-        for other in self.nearby_equipments():
+        self_loc = None
+        for other in self.nearby_equipments(p0.min, p0.max, self.clearance_between + self._btw_clr_error):
+            if self_loc is None:
+                self_loc = self.current_coord()
             other_loc = other.current_coord(transform_to=self)
             # print("check", self, other, self_loc, other_loc)
             if abs(self_loc.x - other_loc.x) < self.clearance_between:
@@ -41,8 +68,7 @@ class CraneForStackingBlock(Equipment):
                 print(self.idx, other.idx, self.state, other.state, op, other.current_op)
                 print(self, other)
                 raise Exception("cranes crash!")
-            new_loc = other_loc
-            other_loc = copy(new_loc)
+            new_loc = copy(other_loc)
             if other_loc[axis] > self_loc[axis]:
                 dis = other_loc[axis] - p0.max
                 new_loc[axis] = p0.max + self.clearance_between + self._btw_clr_error + 1
@@ -0,0 +1,76 @@
+from tcysim.utils import V3
+from tcysim.utils.math import EPSILON
+
+
+class GantryEnvelopeIndex:
+    """Gantry ranges of the cranes deployed on a block, kept in block coordinates.
+
+    A crane's envelope is its gantry position while idle, or the min/max of the
+    gantry path of the operation it is performing. Queries return the cranes in
+    deployment order whose envelope comes within a margin of a given range.
+    The cranes refresh their envelope as they work or are moved with set_coord;
+    rebuild() recomputes them all, e.g. in a forked yard.
+    """
+
+    def __init__(self, block):
+        self.block = block
+        self.cranes = []
+        self.shifts = []
+        self.lows = []
+        self.highs = []
+        self.slots = {}
+
+    def register(self, crane):
+        if crane in self.slots:
+            return
+        self.slots[crane] = len(self.cranes)
+        self.cranes.append(crane)
+        self.shifts.append(crane.transform_to(V3.zero(), self.block)[crane.gantry.axis])
+        self.lows.append(float("-inf"))
+        self.highs.append(float("inf"))
+        self.update_position(crane)
+
+    def update(self, crane, low, high):
+        i = self.slots[crane]
+        self.lows[i] = low + self.shifts[i]
+        self.highs[i] = high + self.shifts[i]
+
+    def update_position(self, crane):
+        loc = crane.gantry.loc
+        self.update(crane, loc, loc)
+
+    def update_path(self, crane, path):
+        if path is None:
+            self.update(crane, float("-inf"), float("inf"))
+        else:
+            loc = crane.gantry.loc
+            self.update(crane, min(path.min, loc), max(path.max, loc))
+
+    def refresh(self, crane):
+        """Recompute the envelope of crane from its live state.
+
+        A crane without a current operation but with motions still pending
+        gets the whole block, as the range of those motions is not known.
+        """
+        if crane.current_op is not None:
+            self.update_path(crane, crane.current_op.paths.get(crane.gantry, None))
+        elif crane.gantry.pending_motions:
+            self.update_path(crane, None)
+        else:
+            self.update_position(crane)
+
+    def rebuild(self):
+        for crane in self.cranes:
+            self.refresh(crane)
+
+    def envelope(self, crane):
+        i = self.slots[crane]
+        return self.lows[i], self.highs[i]
+
+    def query(self, crane, low, high, margin):
+        shift = self.shifts[self.slots[crane]]
+        low = low + shift - margin - EPSILON
+        high = high + shift + margin + EPSILON
+        for i, other in enumerate(self.cranes):
+            if other is not crane and self.lows[i] <= high and self.highs[i] >= low:
+                yield other
@@ -1,2 +1,2 @@
-from .box import CBox, CBoxState
+from .box import CBox, CBoxState, CBoxRegistry
 from .block import CBlock
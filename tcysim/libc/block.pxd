@@ -1,16 +1,30 @@
 from .define cimport *
-from ..utils.vector cimport V3
+from ..utils.vector cimport V3, V3i
 from cpython cimport array
 import array
 
+cdef BoxArena_TCY *box_arena()
+cdef object box_object(Box_TCY *box)
+cdef int pin_box(BoxHandle_TCY handle, object box) except -1
+cdef int unpin_box(BoxHandle_TCY handle) except -1
+
 cdef class CBlock:
     cdef Block_TCY c
+    cdef dict _lock_tokens
+    cdef list _lock_acquirers
+    cdef list _free_lock_tokens
     cpdef int count(self, int x= *, int y= *, int z= *, bint include_occupied= *)
     cpdef bint position_is_valid_for_size(self, int x, int y, int z, int teu)
     cpdef SlotUsage_TCY column_state(self, int x, int y, int z, int axis)
     cpdef object top_box(self, V3 loc, int along)
+    cdef int32_t _lock_token(self, acquirer)
+    cdef void _recycle_lock_token(self, int32_t token)
 
     cpdef array.array all_column_usage(self, int axis=?, bint include_occupied=?, array.array avail=?, array.array res=?)
     cpdef array.array all_slot_usage(self, int norm_axis, bint include_occupied=?, array.array avail=?, array.array res=?)
     cpdef array.array all_slot_states(self, int norm_axis, array.array res=?)
     cpdef array.array validate_all_slots(self, int norm_axis, int teu, array.array res=?)
+    cpdef array.array available_cells_for_size(self, int norm_axis, int teu, int start=?, int finish=?,
+                                               bint allow_new_slot=?, int own_slot=?, int max_slot_usage=?)
+    cpdef int free_stack_num(self, int teu)
+    cpdef V3i free_stack(self, int teu, int k)
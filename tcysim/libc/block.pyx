@@ -1,23 +1,137 @@
 from cpython cimport PyObject
+from cpython.buffer cimport PyBUF_FORMAT, PyBUF_WRITABLE
+from libc.stdint cimport UINT64_MAX
+from libc.stdlib cimport malloc, free
 
 from tcysim.utils.vector cimport V3i
 
+# state of the empty cells in CBlock.cell_state_view()
+EMPTY_CELL_STATE = CELL_STATE_EMPTY
+
+# Every Box_TCY lives in this arena and the cells of the blocks hold their
+# handles. A box only has a Python object while Python code refers to it;
+# box_object() creates one through the factory registered by the box module
+# for the boxes that are in a block without any.
+cdef BoxArena_TCY _arena
+box_arena_init(&_arena)
+cdef object _box_factory = None
+
+cdef BoxArena_TCY *box_arena():
+    return &_arena
+
+cdef object box_object(Box_TCY *box):
+    if box == NULL:
+        return None
+    if box.state == BOX_STATE_PLACEHOLDER and box._holder_or_origin != NULL:
+        box = box._holder_or_origin
+    if box._self != NULL:
+        return <object> box._self
+    return _box_factory(box.handle)
+
+def set_box_factory(factory):
+    global _box_factory
+    _box_factory = factory
+
+# Objects of the box classes with Python-level state, by handle, kept alive
+# while their boxes are in a block since the factory could not rebuild them.
+cdef dict _pinned_boxes = {}
+
+cdef int pin_box(BoxHandle_TCY handle, object box) except -1:
+    _pinned_boxes[handle] = box
+    return 0
+
+cdef int unpin_box(BoxHandle_TCY handle) except -1:
+    _pinned_boxes.pop(handle, None)
+    return 0
+
+def box_arena_usage():
+    """Number of box records alive and allocated in the box arena."""
+    return _arena.num_live, box_arena_capacity(&_arena)
+
 cdef class BlockColumnUsage:
     FREE = SLOT_USAGE_FREE
     TWENTY_ONLY = SLOT_USAGE_TWENTY_ONLY
     FORTY_ONLY = SLOT_USAGE_FORTY_ONLY
     FORTY_ONLY_END = SLOT_USAGE_FORTY_ONLY_END
 
+cdef class BlockArrayView:
+    """Read-only buffer over an internal array of a CBlock, without copying.
+
+    The view follows the live state of the block and keeps the block alive
+    while it or any buffer exported from it exists, e.g. ``np.asarray(view)``.
+    """
+    cdef readonly CBlock block
+    cdef void *data
+    cdef bytes format
+    cdef Py_ssize_t itemsize
+    cdef int ndim
+    cdef Py_ssize_t _shape[3]
+    cdef Py_ssize_t _strides[3]
+
+    @staticmethod
+    cdef BlockArrayView create(CBlock block, void *data, bytes format, Py_ssize_t itemsize, int skip_axis):
+        cdef BlockArrayView view = BlockArrayView.__new__(BlockArrayView)
+        cdef int i, n = 0
+        view.block = block
+        view.data = data
+        view.format = format
+        view.itemsize = itemsize
+        for i in range(3):
+            if i != skip_axis:
+                view._shape[n] = block.c.spec[i]
+                n += 1
+        view.ndim = n
+        view._strides[n - 1] = itemsize
+        for i in range(n - 2, -1, -1):
+            view._strides[i] = view._strides[i + 1] * view._shape[i + 1]
+        return view
+
+    @property
+    def shape(self):
+        return tuple(self._shape[i] for i in range(self.ndim))
+
+    def __len__(self):
+        return self._shape[0]
+
+    def __getbuffer__(self, Py_buffer *buffer, int flags):
+        if flags & PyBUF_WRITABLE:
+            raise BufferError("block arrays are read-only")
+        buffer.buf = self.data
+        buffer.obj = self
+        buffer.len = self._strides[0] * self._shape[0]
+        buffer.readonly = 1
+        buffer.itemsize = self.itemsize
+        if flags & PyBUF_FORMAT:
+            buffer.format = self.format
+        else:
+            buffer.format = NULL
+        buffer.ndim = self.ndim
+        buffer.shape = self._shape
+        buffer.strides = self._strides
+        buffer.suboffsets = NULL
+        buffer.internal = NULL
+
+    def __releasebuffer__(self, Py_buffer *buffer):
+        pass
+
 cdef class CBlock:
     def __init__(self, V3 spec, int stacking_axis=2, tuple sync_axes=(0, 2)):
         cdef CellIdx_TCY c_spec[3];
         cdef bool c_sync[3];
         spec.cpy2mem_i(c_spec)
         c_sync[:] = [1 if i in sync_axes else 0 for i in range(3)]
-        block_init(&self.c, c_spec, 0, stacking_axis, c_sync)
+        block_init(&self.c, c_spec, 0, stacking_axis, c_sync, &_arena)
         self.c._self = <PyObject*> self
+        self._lock_tokens = {}
+        self._lock_acquirers = []
+        self._free_lock_tokens = []
 
     def __dealloc__(self):
+        cdef Box_TCY *box
+        for handle in list(_pinned_boxes):
+            box = box_arena_get(&_arena, handle)
+            if box != NULL and box.block == &self.c:
+                del _pinned_boxes[handle]
         block_destroy(&self.c)
 
     @property
@@ -28,6 +142,33 @@ cdef class CBlock:
     def stacking_axis(self):
         return self.c.stacking_axis
 
+    @property
+    def version(self):
+        """Counter bumped on every change of the box usage of the block."""
+        return self.c.version
+
+    def column_usage_view(self, int axis=-1, bint include_occupied=True):
+        """Live (x, y, z)-without-axis array of the number of boxes in every column along axis."""
+        if axis < 0:
+            axis = self.stacking_axis
+        if include_occupied:
+            return BlockArrayView.create(self, self.c.column_usage_occupied[axis], b"i", sizeof(CellIdx_TCY), axis)
+        return BlockArrayView.create(self, self.c.column_usage[axis], b"i", sizeof(CellIdx_TCY), axis)
+
+    def column_use_type_view(self, int axis):
+        """Live array of the BlockColumnUsage of every column along axis, which must be a synced axis."""
+        if self.c.column_use_type[axis] == NULL:
+            raise ValueError("columns along axis {} are not synced".format(axis))
+        return BlockArrayView.create(self, self.c.column_use_type[axis], b"i", sizeof(SlotUsage_TCY), axis)
+
+    def lock_map_view(self):
+        """Live array of the lock flag of every stack."""
+        return BlockArrayView.create(self, self.c.lock_map, b"i", sizeof(bool), self.c.stacking_axis)
+
+    def cell_state_view(self):
+        """Live (x, y, z) array of the state of the box in every cell, EMPTY_CELL_STATE for empty cells."""
+        return BlockArrayView.create(self, self.c.cell_states, b"b", sizeof(int8_t), -1)
+
     cpdef int count(self, int x=-1, int y=-1, int z=-1, bint include_occupied=True):
         cdef CellIdx_TCY loc[3]
         loc[0] = x
@@ -36,6 +177,23 @@ cdef class CBlock:
         res = block_usage(&self.c, loc, include_occupied)
         return res
 
+    def max_stack_height(self, start, finish):
+        """Number of boxes, not counting the occupied slots, in the highest stack within [start, finish).
+
+        The stacking axis of start and finish is ignored and the range is
+        clipped to the block.
+        """
+        cdef CellIdx_TCY c_start[3]
+        cdef CellIdx_TCY c_finish[3]
+        cdef int res
+        for i in range(3):
+            c_start[i] = start[i]
+            c_finish[i] = finish[i]
+        res = block_max_stack_height(&self.c, c_start, c_finish)
+        if res < 0:
+            raise ValueError("{} has no stacking axis".format(self))
+        return res
+
     def iterboxes(self):
         cdef CellIdx_TCY pos[3], i, j, k
         cdef Box_TCY*box, *tmp
@@ -53,19 +211,19 @@ cdef class CBlock:
                             tmp = block_box_at(&self.c, pos)
                             if tmp and tmp == box:
                                 continue
-                        yield V3i(i, j, k), box.state, <object> box._self
+                        yield V3i(i, j, k), box.state, box_object(box)
 
     def box_at(self, V3 loc):
         cdef CellIdx_TCY pos[3]
         loc.cpy2mem_i(pos)
         cdef Box_TCY*box = block_box_at(&self.c, pos)
-        return <object> box._self
+        return box_object(box)
 
     cpdef object top_box(self, V3 loc, int along):
         cdef CellIdx_TCY pos[3]
         loc.cpy2mem_i(pos)
         cdef Box_TCY*box = block_top_box(&self.c, pos, along)
-        return <object> box._self
+        return box_object(box)
 
     def stack_hash(self, V3 loc):
         cdef CellIdx_TCY pos[3]
@@ -160,6 +318,83 @@ cdef class CBlock:
             block_validate_all_slots_for_size(&self.c, norm_axis, BOX_SIZE_FORTY, results.data.as_ints)
         return results
 
+    cpdef array.array available_cells_for_size(self, int norm_axis, int teu, int start=-1, int finish=-1,
+                                               bint allow_new_slot=True, int own_slot=-1, int max_slot_usage=-1):
+        cdef array.array results = array.array("i")
+        cdef int num
+        array.resize(results, self.c.cell_num * 3)
+
+        if teu == 1:
+            num = block_available_cells(&self.c, norm_axis, BOX_SIZE_TWENTY, start, finish, allow_new_slot, own_slot,
+                                        max_slot_usage, results.data.as_ints)
+        else:
+            num = block_available_cells(&self.c, norm_axis, BOX_SIZE_FORTY, start, finish, allow_new_slot, own_slot,
+                                        max_slot_usage, results.data.as_ints)
+        if num < 0:
+            raise ValueError("cannot list the cells of {} along axis {}: it stacks along axis {}".format(
+                self, norm_axis, self.c.stacking_axis))
+        array.resize(results, num * 3)
+        return results
+
+    def ranked_cells(self, int norm_axis, int teu, int own_slot, int start, int finish, int max_slot_usage=-1,
+                     excluded=(), weights=(0, 0, 0), int k=1):
+        """Best k cells for a box of teu on top of a stack, see block_ranked_cells.
+
+        ``excluded`` are stack hashes and ``weights`` the weights of the slot
+        distance to own_slot, the tier and a locked stack in the score, the
+        lowest score first. Return the cells as a flat array of positions and
+        their scores.
+        """
+        cdef array.array results = array.array("i")
+        cdef array.array scores = array.array("d")
+        cdef array.array c_excluded = array.array("i", excluded)
+        cdef double c_weights[3]
+        cdef BoxSize_TCY size = BOX_SIZE_TWENTY if teu == 1 else BOX_SIZE_FORTY
+        cdef int num
+        if k <= 0:
+            return results, scores
+        c_weights[0], c_weights[1], c_weights[2] = weights
+        array.resize(results, k * 3)
+        array.resize(scores, k)
+        num = block_ranked_cells(&self.c, norm_axis, size, own_slot,
+                                 start, finish, max_slot_usage, <CellIdx_TCY *> c_excluded.data.as_ints, len(c_excluded), c_weights,
+                                 k, results.data.as_ints, scores.data.as_doubles)
+        if num < 0:
+            raise ValueError("cannot rank the cells of {} along axis {}: it stacks along axis {}".format(
+                self, norm_axis, self.c.stacking_axis))
+        array.resize(results, num * 3)
+        array.resize(scores, num)
+        return results, scores
+
+    cpdef int free_stack_num(self, int teu):
+        if teu == 1:
+            return block_free_stack_num(&self.c, BOX_SIZE_TWENTY)
+        else:
+            return block_free_stack_num(&self.c, BOX_SIZE_FORTY)
+
+    cpdef V3i free_stack(self, int teu, int k):
+        cdef CellIdx_TCY pos[3]
+        cdef int res
+        if teu == 1:
+            res = block_free_stack(&self.c, BOX_SIZE_TWENTY, k, pos)
+        else:
+            res = block_free_stack(&self.c, BOX_SIZE_FORTY, k, pos)
+        if res < 0:
+            raise IndexError(k)
+        return V3i(pos[0], pos[1], pos[2])
+
+    def all_free_stacks(self, int teu):
+        cdef array.array results = array.array("i")
+        cdef int num
+        array.resize(results, self.free_stack_num(teu) * 3)
+        if teu == 1:
+            num = block_all_free_stacks(&self.c, BOX_SIZE_TWENTY, results.data.as_ints)
+        else:
+            num = block_all_free_stacks(&self.c, BOX_SIZE_FORTY, results.data.as_ints)
+        if num < 0:
+            raise ValueError("{} has no stacking axis".format(self))
+        return results
+
     def lock(self, V3 loc):
         cdef CellIdx_TCY pos[3]
         loc.cpy2mem_i(pos)
@@ -174,3 +409,212 @@ cdef class CBlock:
         cdef CellIdx_TCY pos[3]
         loc.cpy2mem_i(pos)
         return block_is_locked(&self.c, pos)
+
+    # The lock table of the C block identifies holders and waiters by tokens;
+    # an acquirer keeps its token while it holds or waits on any stack.
+    cdef int32_t _lock_token(self, acquirer):
+        token = self._lock_tokens.get(id(acquirer))
+        if token is None:
+            if self._free_lock_tokens:
+                token = self._free_lock_tokens.pop()
+                self._lock_acquirers[token] = acquirer
+            else:
+                token = len(self._lock_acquirers)
+                self._lock_acquirers.append(acquirer)
+            self._lock_tokens[id(acquirer)] = token
+        return token
+
+    cdef void _recycle_lock_token(self, int32_t token):
+        acquirer = self._lock_acquirers[token]
+        if acquirer is not None and self.c.locks.refs[token] == 0:
+            del self._lock_tokens[id(acquirer)]
+            self._lock_acquirers[token] = None
+            self._free_lock_tokens.append(token)
+
+    def try_lock_stacks(self, acquirer, positions):
+        """Lock the stacks of all the positions for acquirer, or none of them.
+
+        Return the hashes of the stacks found locked, in whose FIFO wait queues
+        acquirer now is, or an empty list once all the stacks are locked. Locks
+        are not reentrant: a stack held by acquirer itself counts as locked.
+        """
+        cdef CellIdx_TCY pos[3]
+        cdef CellIdx_TCY buf[16]
+        cdef CellIdx_TCY *stacks = buf
+        cdef CellIdx_TCY *failed
+        cdef int i, res, num = len(positions)
+        cdef V3 loc
+        cdef int32_t token = self._lock_token(acquirer)
+        cdef list result = []
+        if num > 8:
+            stacks = <CellIdx_TCY *> malloc(sizeof(CellIdx_TCY) * 2 * num)
+            if stacks == NULL:
+                raise MemoryError()
+        failed = stacks + num
+        try:
+            for i in range(num):
+                loc = positions[i]
+                loc.cpy2mem_i(pos)
+                stacks[i] = blk_stack_hash(&self.c, pos)
+            res = stack_locks_acquire(&self.c.locks, token, stacks, num, failed)
+            if res < 0:
+                raise MemoryError()
+            for i in range(res):
+                result.append(failed[i])
+        finally:
+            if stacks != buf:
+                free(stacks)
+            self._recycle_lock_token(token)
+        return result
+
+    def unlock_stack(self, V3 loc):
+        """Unlock the stack of loc and empty its wait queue.
+
+        Return the waiters for which it was the last stack to wait on, in
+        their order of arrival; the others keep waiting on their other stacks.
+        """
+        cdef CellIdx_TCY pos[3]
+        cdef int32_t buf[16]
+        cdef int32_t *woken = buf
+        cdef int32_t owner
+        cdef int i, num
+        cdef CellIdx_TCY stack
+        cdef list result = []
+        loc.cpy2mem_i(pos)
+        stack = blk_stack_hash(&self.c, pos)
+        owner = self.c.locks.owners[stack]
+        num = self.c.locks.queue_lens[stack]
+        if num > 16:
+            woken = <int32_t *> malloc(sizeof(int32_t) * num)
+            if woken == NULL:
+                raise MemoryError()
+        try:
+            num = stack_locks_release(&self.c.locks, stack, woken)
+            for i in range(num):
+                result.append(self._lock_acquirers[woken[i]])
+            if owner != LOCK_OWNER_NONE:
+                self._recycle_lock_token(owner)
+            for i in range(num):
+                self._recycle_lock_token(woken[i])
+        finally:
+            if woken != buf:
+                free(woken)
+        return result
+
+    def lock_owner(self, V3 loc):
+        """Acquirer holding the stack of loc, None if it is free or was locked by lock()."""
+        cdef CellIdx_TCY pos[3]
+        loc.cpy2mem_i(pos)
+        owner = self.c.locks.owners[blk_stack_hash(&self.c, pos)]
+        return None if owner == LOCK_OWNER_NONE else self._lock_acquirers[owner]
+
+    def lock_waiters(self, V3 loc):
+        """Acquirers waiting for the stack of loc, first come first."""
+        cdef CellIdx_TCY pos[3]
+        cdef CellIdx_TCY stack
+        cdef int32_t *tokens
+        cdef int i, num
+        cdef list result = []
+        loc.cpy2mem_i(pos)
+        stack = blk_stack_hash(&self.c, pos)
+        num = self.c.locks.queue_lens[stack]
+        if not num:
+            return result
+        tokens = <int32_t *> malloc(sizeof(int32_t) * num)
+        if tokens == NULL:
+            raise MemoryError()
+        num = stack_locks_waiters(&self.c.locks, stack, tokens)
+        for i in range(num):
+            result.append(self._lock_acquirers[tokens[i]])
+        free(tokens)
+        return result
+
+    def lock_acquisitions_view(self):
+        """Live array of the number of times every stack was locked through try_lock_stacks()."""
+        return BlockArrayView.create(self, self.c.locks.acquisitions, b"Q", sizeof(uint64_t), self.c.stacking_axis)
+
+    def lock_contentions_view(self):
+        """Live array of the number of attempts to lock every stack that found it locked."""
+        return BlockArrayView.create(self, self.c.locks.contentions, b"Q", sizeof(uint64_t), self.c.stacking_axis)
+
+    def lock_max_waiters_view(self):
+        """Live array of the longest wait queue seen on every stack."""
+        return BlockArrayView.create(self, self.c.locks.max_queue_lens, b"i", sizeof(int32_t), self.c.stacking_axis)
+
+    def reset_lock_stats(self):
+        stack_locks_reset_stats(&self.c.locks)
+
+
+cdef class BlockStackTensor:
+    """Stack heights and slot states of several blocks, written in one pass over their C structures.
+
+    ``fill(heights, slot_states)`` writes into a (blocks, size0, size1) and a
+    (blocks, size0) int32 C-contiguous buffer, where size0 and size1 are the
+    largest sizes of the blocks along their two non-stacking axes; the slot
+    states are those of the slots normal to the first of them. Cells outside a
+    smaller block are set to -1. Unless ``full`` is set, only the blocks whose
+    usage changed since the previous call are rewritten, so the same buffers
+    should be passed every time.
+    """
+    cdef Block_TCY **blks
+    cdef uint64_t *versions
+    cdef readonly tuple blocks
+    cdef readonly int size0, size1
+    cdef readonly bint include_occupied
+
+    def __cinit__(self, blocks, bint include_occupied=True):
+        cdef CBlock block
+        cdef int i, a, n
+        cdef CellIdx_TCY sizes[2]
+
+        self.blocks = tuple(blocks)
+        self.include_occupied = include_occupied
+        self.blks = <Block_TCY **> malloc(sizeof(Block_TCY *) * max(len(self.blocks), 1))
+        self.versions = <uint64_t *> malloc(sizeof(uint64_t) * max(len(self.blocks), 1))
+        if self.blks == NULL or self.versions == NULL:
+            raise MemoryError()
+
+        self.size0 = self.size1 = 0
+        for i, block in enumerate(self.blocks):
+            if block.c.stacking_axis < 0:
+                raise ValueError("{} has no stacking axis".format(block))
+            self.blks[i] = &block.c
+            n = 0
+            for a in range(3):
+                if a != block.c.stacking_axis:
+                    sizes[n] = block.c.spec[a]
+                    n += 1
+            self.size0 = max(self.size0, sizes[0])
+            self.size1 = max(self.size1, sizes[1])
+        self.invalidate()
+
+    def __dealloc__(self):
+        free(self.blks)
+        free(self.versions)
+
+    @property
+    def shape(self):
+        return len(self.blocks), self.size0, self.size1
+
+    def invalidate(self):
+        cdef int i
+        for i in range(len(self.blocks)):
+            self.versions[i] = UINT64_MAX
+
+    def fill(self, int[:, :, ::1] heights, int[:, ::1] slot_states, bint full=False):
+        """Fill the buffers and return the number of blocks rewritten."""
+        cdef int num = len(self.blocks)
+        cdef int res
+        if heights.shape[0] != num or heights.shape[1] != self.size0 or heights.shape[2] != self.size1 or \
+                slot_states.shape[0] != num or slot_states.shape[1] != self.size0:
+            raise ValueError("buffers of shape {} and {} expected".format(self.shape, (num, self.size0)))
+        if num == 0:
+            return 0
+        if full:
+            self.invalidate()
+        res = blocks_fill_stack_tensor(self.blks, num, self.size0, self.size1, self.include_occupied,
+                                       self.versions, &heights[0, 0, 0], &slot_states[0, 0])
+        if res < 0:
+            self.invalidate()
+            raise ValueError("cannot fill the stack tensor ({})".format(res))
+        return res
@@ -1,5 +1,5 @@
 from .define cimport *
-from .block cimport CBlock
+from .block cimport CBlock, box_arena, box_object
 from tcysim.utils.vector cimport V3, V3i
 from cpython cimport PyObject
 
@@ -7,8 +7,10 @@ cdef class CBoxState:
     pass
 
 cdef class CBox:
-    cdef Box_TCY c
+    cdef Box_TCY *c
     cdef public object equipment
 
     cpdef V3i store_position(self, V3 new_loc=?)
     cpdef CBox top_box_above(self)
+    cdef _pin(self)
+    cdef _check_id(self, CBlock block)
@@ -1,5 +1,6 @@
 from .define cimport *
-from .block cimport CBlock
+from .block cimport CBlock, box_arena, box_object, pin_box, unpin_box
+from .block import set_box_factory
 from tcysim.utils.vector cimport V3, V3i
 from cpython cimport PyObject
 
@@ -13,7 +14,51 @@ cdef class CBoxState:
     RETRIEVED = BOX_STATE_RETRIEVED
     PLACEHOLDER = BOX_STATE_PLACEHOLDER
 
+# Python classes of the boxes, indexed by Box_TCY.kind, so that a box dropped
+# by Python while in a block comes back as an object of its own class, and
+# whether their objects have Python-level state, i.e. a __dict__ or slots.
+cdef list _box_classes = []
+cdef list _box_stateful = []
+cdef dict _box_kinds = {}
+
+cdef uint16_t _box_kind(cls):
+    kind = _box_kinds.get(cls)
+    if kind is None:
+        kind = _box_kinds[cls] = len(_box_classes)
+        _box_classes.append(cls)
+        _box_stateful.append(cls.__dictoffset__ != 0 or cls.__basicsize__ != CBox.__basicsize__)
+    return kind
+
+cdef int _check(int res) except -1:
+    if res == ERROR_OUT_OF_MEMORY:
+        raise MemoryError()
+    elif res == ERROR_DUPLICATE_BOX_ID:
+        raise ValueError("box id already in use")
+    elif res != SUCCEED:
+        raise RuntimeError("libtcy error {}".format(res))
+    return 0
+
+def _box_from_handle(BoxHandle_TCY handle):
+    cdef Box_TCY *c = box_arena_get(box_arena(), handle)
+    cls = _box_classes[c.kind]
+    cdef CBox box = cls.__new__(cls)
+    box.c = c
+    c._self = <PyObject*> box
+    box.equipment = None
+    return box
+
+set_box_factory(_box_from_handle)
+
 cdef class CBox:
+    """A box, i.e. a Box_TCY record in the box arena.
+
+    The record outlives the object while the box is in a block: the object can
+    be dropped and a new one of the same class is created whenever the box is
+    looked up again, e.g. by CBlock.box_at(). Only objects without state of
+    their own can be rebuilt that way, so the objects of subclasses with a
+    __dict__ or slots are instead kept alive from allocation to retrieval;
+    declare ``__slots__ = ()`` in a subclass to keep it lazy.
+    """
     def __init__(self, bytes box_id, int size=20, *args, **kwargs):
         cdef BoxSize_TCY c_size
         if size == 20:
@@ -22,63 +67,92 @@ cdef class CBox:
             c_size = BOX_SIZE_FORTY
         else:
             raise NotImplementedError
-        box_init(&self.c, box_id, c_size)
+        if self.c != NULL:
+            raise RuntimeError("box already initialised")
+        self.c = box_arena_new(box_arena())
+        if self.c == NULL:
+            raise MemoryError()
+        box_init(self.c, box_id, c_size)
+        self.c.kind = _box_kind(type(self))
         self.c._self = <PyObject*> self
         self.equipment = None
 
     def __dealloc__(self):
-        box_destroy(&self.c)
+        if self.c == NULL or self.c._self != <PyObject*> self:
+            return
+        if box_in_block(self.c):
+            self.c._self = NULL
+        else:
+            box_destroy(self.c)
+            box_arena_free(box_arena(), self.c)
+        self.c = NULL
+
+    cdef _check_id(self, CBlock block):
+        cdef Box_TCY *other
+        if block.c.registry != NULL:
+            other = box_registry_find(block.c.registry, self.c.id)
+            if other != NULL and other != self.c:
+                raise ValueError("a box with id {!r} is already in the yard".format(self.c.id))
 
     def alloc(self, Time_TCY time, block, V3 loc):
         cdef CellIdx_TCY new_loc[3];
         if self.c.state == BOX_STATE_INITIAL:
+            self._check_id(block)
             self.set_location(block, loc.x, loc.y, loc.z)
-            box_alloc(&self.c, time)
+            box_alloc(self.c, time)
+            self._pin()
         elif self.c.state == BOX_STATE_ALLOCATED:
             if not self.c._holder_or_origin:
                 loc.cpy2mem_i(new_loc)
-                box_realloc(&self.c, time, new_loc)
+                _check(box_realloc(self.c, time, new_loc))
             else:
                 raise Exception("triple alloc")
         elif self.c.state == BOX_STATE_STORED:
             if not self.c._holder_or_origin:
                 loc.cpy2mem_i(new_loc)
-                box_relocate_alloc(&self.c, time, new_loc)
+                _check(box_relocate_alloc(self.c, time, new_loc))
         else:
             raise NotImplementedError
 
     def store(self, Time_TCY time):
         if self.c.state == BOX_STATE_STORING:
-            box_store(&self.c, time)
+            box_store(self.c, time)
         elif self.c.state == BOX_STATE_RELOCATING:
-            box_relocate_store(&self.c, time)
+            box_relocate_store(self.c, time)
 
     def restore(self, Time_TCY time, block,
                 CellIdx_TCY x, CellIdx_TCY y, CellIdx_TCY z,
                 *args, BoxState_TCY level=BOX_STATE_STORED):
         if level == BOX_STATE_INITIAL:
             return
+        self._check_id(block)
         self.set_location(block, x, y, z)
-        box_alloc(&self.c, time)
+        box_alloc(self.c, time)
+        self._pin()
         if level >= BOX_STATE_STORED:
-            box_store(&self.c, time)
+            box_store(self.c, time)
 
     def has_undone_relocation(self):
         return self.c._holder_or_origin is not NULL
 
     def retrieve(self, Time_TCY time):
         if self.c._holder_or_origin:
-            box_relocate_retrieve(&self.c, time)
+            box_relocate_retrieve(self.c, time)
             assert self.c.state == BOX_STATE_RELOCATING
         else:
-            box_retrieve(&self.c, time)
+            box_retrieve(self.c, time)
             assert self.c.state == BOX_STATE_RETRIEVING
+            unpin_box(self.c.handle)
+
+    cdef _pin(self):
+        if _box_stateful[self.c.kind]:
+            pin_box(self.c.handle, self)
 
     def start_store(self):
-        self.c.state = BOX_STATE_STORING
+        box_set_state(self.c, BOX_STATE_STORING)
 
     def finish_retrieve(self):
-        self.c.state = BOX_STATE_RETRIEVED
+        box_set_state(self.c, BOX_STATE_RETRIEVED)
 
     @property
     def id(self):
@@ -98,7 +172,7 @@ cdef class CBox:
 
     @state.setter
     def state(self, state):
-        self.c.state = state
+        box_set_state(self.c, state)
 
     @property
     def size(self):
@@ -120,6 +194,8 @@ cdef class CBox:
 
     @property
     def block(self):
+        if self.c.block == NULL:
+            return None
         return <object> self.c.block._self
 
     @block.setter
@@ -136,17 +212,17 @@ cdef class CBox:
         cdef CellIdx_TCY loc[3]
         if new_loc:
             new_loc.cpy2mem_i(loc)
-            box_store_position(&self.c, loc, True)
+            box_store_position(self.c, loc, True)
         elif self.c.state == BOX_STATE_STORED:
             return self.location
         else:
-            box_store_position(&self.c, loc, False)
+            box_store_position(self.c, loc, False)
         return V3i(loc[0], loc[1], loc[2])
 
     def relocate_position(self, V3 new_loc):
         cdef CellIdx_TCY loc[3]
         new_loc.cpy2mem_i(loc)
-        box_relocate_position(&self.c, loc)
+        box_relocate_position(self.c, loc)
         return V3(loc[0], loc[1], loc[2])
 
     def box_above(self):
@@ -192,3 +268,86 @@ cdef class CBox:
 
     def __repr__(self):
         return "Box[{}'|{}|{}]".format(self.size, self.c.id.decode("utf-8"), self.state)
+
+
+cdef class CBoxRegistry:
+    """Boxes of the attached blocks, by id and by state.
+
+    A box joins the registry when it is allocated in an attached block and
+    leaves it once retrieved, so the counts follow the box states only and
+    an id can be used again by a later box; allocating a box whose id is
+    taken by another box of the registry raises a ValueError. Lookups and
+    counts are O(1) and listing the boxes in some states is O(result).
+    """
+    cdef BoxRegistry_TCY c
+    cdef list blocks
+
+    def __cinit__(self):
+        if box_registry_init(&self.c, box_arena()) < 0:
+            raise MemoryError()
+        self.blocks = []
+
+    def __dealloc__(self):
+        cdef CBlock block
+        for block in self.blocks:
+            if block.c.registry == &self.c:
+                block.c.registry = NULL
+        box_registry_destroy(&self.c)
+
+    def attach(self, CBlock block):
+        cdef CBox box
+        cdef list boxes = [box for _, _, box in block.iterboxes() if box.c.state != BOX_STATE_PLACEHOLDER]
+        for box in boxes:
+            if box_registry_find(&self.c, box.c.id) != NULL:
+                raise ValueError("a box with id {!r} is already in the yard".format(box.c.id))
+        block.c.registry = &self.c
+        self.blocks.append(block)
+        for box in boxes:
+            _check(box_registry_add(&self.c, box.c))
+
+    cdef Box_TCY *find(self, box_id):
+        if isinstance(box_id, str):
+            box_id = box_id.encode()
+        return box_registry_find(&self.c, <bytes> box_id)
+
+    def get(self, box_id, default=None):
+        cdef Box_TCY *box = self.find(box_id)
+        if box == NULL:
+            return default
+        return box_object(box)
+
+    def __getitem__(self, box_id):
+        cdef Box_TCY *box = self.find(box_id)
+        if box == NULL:
+            raise KeyError(box_id)
+        return box_object(box)
+
+    def __contains__(self, box_id):
+        return self.find(box_id) != NULL
+
+    def __len__(self):
+        return self.count()
+
+    def count(self, *states):
+        """Number of boxes in any of the given states, or in the registry if none is given."""
+        cdef int s
+        cdef long num = 0
+        if not states:
+            states = range(BOX_STATE_NUM)
+        for s in states:
+            num += self.c.counts[s]
+        return num
+
+    def boxes(self, *states):
+        """Boxes in any of the given states, or all of them if none is given."""
+        cdef int s
+        cdef Box_TCY *box
+        cdef list res = []
+        if not states:
+            states = range(BOX_STATE_NUM)
+        for s in states:
+            box = box_arena_get(box_arena(), self.c.heads[s])
+            while box != NULL:
+                res.append(box_object(box))
+                box = box_arena_get(box_arena(), box._state_next)
+        return res
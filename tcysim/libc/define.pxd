@@ -1,4 +1,4 @@
-from libc.stdint cimport int64_t, int32_t
+from libc.stdint cimport int8_t, uint16_t, int64_t, int32_t, uint32_t, uint64_t
 
 DEF _BOX_ID_LEN_LIMIT=32
 DEF _TIME_INF=31536000
@@ -8,6 +8,7 @@ TIME_INF = _TIME_INF
 
 cdef extern from "define.h":
     ctypedef int bool
+    int CELL_STATE_EMPTY
 
     ctypedef enum BoxSize_TCY:
         BOX_SIZE_TWENTY = 0
@@ -23,6 +24,8 @@ cdef extern from "define.h":
         BOX_STATE_RETRIEVED = 6
         BOX_STATE_PLACEHOLDER = 7
 
+    int BOX_STATE_NUM
+
     ctypedef enum SlotUsage_TCY:
         SLOT_USAGE_FREE = 0
         SLOT_USAGE_TWENTY_ONLY = 1
@@ -31,7 +34,11 @@ cdef extern from "define.h":
 
     ctypedef double Time_TCY
     ctypedef int32_t CellIdx_TCY
+    ctypedef uint32_t BoxHandle_TCY
     ctypedef struct Block_TCY
+    ctypedef struct BoxRegistry_TCY
+
+    BoxHandle_TCY BOX_HANDLE_NONE
 
     ctypedef struct Box_TCY:
         char id[_BOX_ID_LEN_LIMIT]
@@ -39,11 +46,39 @@ cdef extern from "define.h":
         BoxState_TCY state
         Time_TCY alloc_time, store_time, retrieval_time
         CellIdx_TCY loc[3]
+        BoxHandle_TCY handle
+        uint16_t kind
+        BoxHandle_TCY _state_prev, _state_next
+        BoxRegistry_TCY *registry
         Block_TCY *block
         void*_self
         Box_TCY*_holder_or_origin
 
-    ctypedef Box_TCY *Cell_TCY
+    ctypedef BoxHandle_TCY Cell_TCY
+
+    ctypedef struct BoxArena_TCY:
+        uint32_t num_live
+
+    ctypedef struct BoxRegistry_TCY:
+        BoxArena_TCY *arena
+        uint32_t num
+        BoxHandle_TCY heads[8]
+        uint32_t counts[8]
+
+    int LOCK_OWNER_NONE
+
+    ctypedef struct StackLockTable_TCY:
+        CellIdx_TCY num_stacks
+        int32_t *owners
+        int32_t *queue_lens
+        int32_t *max_queue_lens
+        uint64_t *acquisitions
+        uint64_t *contentions
+        int32_t *refs
+
+    ctypedef struct HeightIndex_TCY:
+        CellIdx_TCY size0
+        CellIdx_TCY size1
 
     ctypedef struct Block_TCY:
         CellIdx_TCY spec[3]
@@ -53,14 +88,52 @@ cdef extern from "define.h":
         CellIdx_TCY *column_usage_occupied[3]
         CellIdx_TCY cell_num
         Cell_TCY *cells
+        int8_t *cell_states
         int stacking_axis
         int box_orientation
         bool *lock_map
+        StackLockTable_TCY locks
+        HeightIndex_TCY heights
+        CellIdx_TCY *free_stacks[2]
+        CellIdx_TCY *free_stack_pos[2]
+        CellIdx_TCY free_stack_num[2]
+        uint64_t version
+        BoxArena_TCY *arena
+        BoxRegistry_TCY *registry
         void*_self
 
+cdef extern from "error.h":
+    int SUCCEED
+    int ERROR_OUT_OF_MEMORY
+    int ERROR_DUPLICATE_BOX_ID
+
+cdef extern from "arena.h":
+    Box_TCY *box_arena_get(const BoxArena_TCY *arena, BoxHandle_TCY handle)
+    void box_arena_init(BoxArena_TCY *arena)
+    void box_arena_destroy(BoxArena_TCY *arena)
+    Box_TCY *box_arena_new(BoxArena_TCY *arena)
+    void box_arena_free(BoxArena_TCY *arena, Box_TCY *box)
+    size_t box_arena_capacity(const BoxArena_TCY *arena)
+
+cdef extern from "registry.h":
+    int box_registry_init(BoxRegistry_TCY *reg, BoxArena_TCY *arena)
+    void box_registry_destroy(BoxRegistry_TCY *reg)
+    int box_registry_add(BoxRegistry_TCY *reg, Box_TCY *box)
+    void box_registry_remove(BoxRegistry_TCY *reg, Box_TCY *box)
+    Box_TCY *box_registry_find(BoxRegistry_TCY *reg, const char *box_id)
+
+cdef extern from "lock.h":
+    int stack_locks_acquire(StackLockTable_TCY *locks, int32_t token, const CellIdx_TCY *stacks, int num,
+                            CellIdx_TCY *failed)
+    int stack_locks_release(StackLockTable_TCY *locks, CellIdx_TCY stack, int32_t *woken)
+    int stack_locks_waiters(const StackLockTable_TCY *locks, CellIdx_TCY stack, int32_t *tokens)
+    void stack_locks_reset_stats(StackLockTable_TCY *locks)
+
 cdef extern from "box.h":
     void box_init(Box_TCY *box, char *box_id, BoxSize_TCY size)
     void box_destroy(Box_TCY *box)
+    bool box_in_block(Box_TCY *box)
+    void box_set_state(Box_TCY *box, BoxState_TCY state)
     int box_alloc(Box_TCY *box, Time_TCY time)
     int box_store(Box_TCY *box, Time_TCY time)
     int box_retrieve(Box_TCY *box, Time_TCY time)
@@ -76,12 +149,13 @@ cdef extern from "box.h":
 
 cdef extern from "block.h":
     void block_init(Block_TCY *blk, const CellIdx_TCY *shape, int box_orientation, int stacking_axis,
-                    const int *axis_need_sync)
+                    const int *axis_need_sync, BoxArena_TCY *arena)
     void block_destroy(Block_TCY *blk)
     int block_usage(Block_TCY *blk, const CellIdx_TCY *loc, bool include_occupied)
     Box_TCY*block_box_at(Block_TCY*blk, const CellIdx_TCY*idx)
     Box_TCY*block_top_box(Block_TCY*blk, const CellIdx_TCY*idx, int along)
 
+    int block_max_stack_height(Block_TCY *blk, const CellIdx_TCY *start, const CellIdx_TCY *finish)
     CellIdx_TCY blk_stack_hash(Block_TCY *blk, const CellIdx_TCY *idx)
     void block_lock(Block_TCY *blk, const CellIdx_TCY*idx)
     void block_unlock(Block_TCY *blk, const CellIdx_TCY*idx)
@@ -91,18 +165,35 @@ cdef extern from "block.h":
     int block_all_column_usages(Block_TCY *blk, int axis, bool include_occupied, const int *avail, int *results)
     int block_all_slot_usages(Block_TCY *blk, int norm_axis, bool include_occupied, const int *avail, int *results)
     int block_all_slot_states(Block_TCY *blk, int norm_axis, int*results)
+    int blocks_fill_stack_tensor(Block_TCY **blks, int num, CellIdx_TCY size0, CellIdx_TCY size1,
+                                 bool include_occupied, uint64_t *versions, int *heights, int *slot_states)
     int block_validate_all_slots_for_size(Block_TCY *blk, int norm_axis, BoxSize_TCY box_size, bool *results)
+    int block_available_cells(Block_TCY *blk, int norm_axis, BoxSize_TCY box_size, CellIdx_TCY start,
+                              CellIdx_TCY finish, bool allow_new_slot, CellIdx_TCY own_slot,
+                              int max_slot_usage, int *results)
+    int block_ranked_cells(Block_TCY *blk, int norm_axis, BoxSize_TCY box_size, CellIdx_TCY own_slot,
+                           CellIdx_TCY start, CellIdx_TCY finish, int max_slot_usage,
+                           const CellIdx_TCY *excluded, int num_excluded, const double *weights,
+                           int k, int *results, double *scores)
+    CellIdx_TCY block_free_stack_num(Block_TCY *blk, BoxSize_TCY box_size)
+    int block_free_stack(Block_TCY *blk, BoxSize_TCY box_size, CellIdx_TCY k, CellIdx_TCY *idx)
+    int block_all_free_stacks(Block_TCY *blk, BoxSize_TCY box_size, int *results)
 
 cdef extern from "path.h":
-    ctypedef struct PathFrameChunk
+    ctypedef struct PathKeyFrame:
+        Time_TCY time
+        double coord
+        void *other
+
     ctypedef struct PathTrace:
-        int chunk_size;
-        PathFrameChunk*chunks
-        PathFrameChunk*last_chunk
-        double max, min;
+        int capacity
+        int num
+        PathKeyFrame *frames
+        double max, min
 
     void pathtrace_init(PathTrace *pt, int chunk_size)
     void pathtrace_destroy(PathTrace *pt)
     void pathtrace_append_frame(PathTrace *pt, Time_TCY time, double pos, void *other)
     bool pathtrace_intersect_test_with_clearance(PathTrace *pt0, PathTrace *pt1, double clearance, double shift)
-    double pathtrace_boundary(PathTrace*pt, double*pmax, double*pmin)
+    void pathtrace_boundary(PathTrace*pt, double*pmax, double*pmin)
+    void pathtrace_shift_time(PathTrace *pt, Time_TCY delta)
@@ -11,6 +11,9 @@ cdef class Paths:
     def append(self, Time_TCY time, double pos):
         pathtrace_append_frame(&self.c, time, pos, NULL)
 
+    def shift_time(self, Time_TCY delta):
+        pathtrace_shift_time(&self.c, delta)
+
     def intersect_test(self, Paths other, double clearance, double shift):
         return pathtrace_intersect_test_with_clearance(&self.c, &other.c, clearance, shift)
 
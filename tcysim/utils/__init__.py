@@ -1,3 +1,4 @@
-from .vector import V3, V3i, TEU, RotateOperator
+from .vector import V3, V3i, FrozenV3, TEU, RotateOperator
 from .path import Paths
-from .dispatcher import Dispatcher
\ No newline at end of file
+from .dispatcher import Dispatcher
+from .replication import ReplicationRunner, ReplicationResult
@@ -1,9 +1,9 @@
-from copy import copy
 from enum import Enum
+from types import MethodType
 
 
 class DispatchFunc:
-    __slots__ = ["func", "category", "method", "obj"]
+    __slots__ = ["func", "category", "method"]
     def __init__(self, func, category, method):
         self.func = func
         if isinstance(category, str):
@@ -11,37 +11,53 @@ class DispatchFunc:
         elif isinstance(category, Enum):
             self.category = category.name
         self.method = method
-        self.obj = None
 
-    def __call__(self, *args, **kwargs):
-        return self.func(self.obj, *args, **kwargs)
+    def __get__(self, obj, objtype=None):
+        if obj is None:
+            return self
+        return MethodType(self.func, obj)
 
     def call(self, obj, *args, **kwargs):
         return self.func(obj, *args, **kwargs)
 
 
 class Dispatcher:
-    def __init__(self):
-        self._methods = {}
-        for item_name in dir(self):
-            item = getattr(self, item_name)
+    """Base of the classes whose methods are picked by a category at runtime.
+
+    The dispatch tables, ``{method: {category: function}}``, are built once per
+    class when it is defined, so instances share them and ``dispatch`` is a
+    plain double lookup. ``Dispatcher.debug()`` switches every dispatcher to a
+    checked ``dispatch`` that reports unknown categories and methods.
+    """
+    _dispatch_tables = {}
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        tables = {}
+        for item_name in dir(cls):
+            item = getattr(cls, item_name)
             if isinstance(item, DispatchFunc):
-                if item.method not in self._methods:
-                    self._methods[item.method] = {}
-                item = copy(item)
-                item.obj = self
-                setattr(self, item_name, item)
-                self._methods[item.method][item.category] = item
+                if item.method not in tables:
+                    tables[item.method] = {}
+                tables[item.method][item.category] = item.func
+        cls._dispatch_tables = tables
 
     def dispatch(self, category, method="_", *args, **kwargs):
-        if self is not self._methods[method][category].obj:
-            print(self, self._methods[method][category].obj)
-            if hasattr(self, "equipment"):
-                print(self.equipment.blocks[0].id, self.equipment.idx)
-                obj = self._methods[method][category].obj
-                print(obj.equipment.blocks[0].id, obj.equipment.idx)
-        assert self is self._methods[method][category].obj
-        return self._methods[method][category](*args, **kwargs)
+        return self._dispatch_tables[method][category](self, *args, **kwargs)
+
+    def _checked_dispatch(self, category, method="_", *args, **kwargs):
+        table = self._dispatch_tables.get(method)
+        if table is None:
+            raise KeyError("{} has no dispatch method {!r}".format(self.__class__.__name__, method))
+        func = table.get(category)
+        if func is None:
+            raise KeyError("{} has no handler for {!r} in dispatch method {!r}, known: {}".format(
+                self.__class__.__name__, category, method, sorted(table)))
+        return func(self, *args, **kwargs)
+
+    @staticmethod
+    def debug(enabled=True):
+        Dispatcher.dispatch = Dispatcher._checked_dispatch if enabled else Dispatcher._fast_dispatch
 
     @staticmethod
     def on(category, method="_"):
@@ -49,3 +65,6 @@ class Dispatcher:
             return DispatchFunc(func, category, method)
 
         return wrapper
+
+
+Dispatcher._fast_dispatch = Dispatcher.dispatch
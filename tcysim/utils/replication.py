@@ -0,0 +1,191 @@
+import multiprocessing
+import os
+import queue
+import random
+import time as _time
+import traceback
+
+
+class Replication:
+    __slots__ = ["index", "seed", "params"]
+
+    def __init__(self, index, seed, params):
+        self.index = index
+        self.seed = seed
+        self.params = params
+
+    def __repr__(self):
+        return "<Replication#{} seed={} {}>".format(self.index, self.seed, self.params)
+
+
+class ReplicationResult:
+    __slots__ = ["replication", "metrics", "error", "elapsed"]
+
+    def __init__(self, replication, metrics=None, error=None, elapsed=0):
+        self.replication = replication
+        self.metrics = metrics
+        self.error = error
+        self.elapsed = elapsed
+
+    @property
+    def succeed(self):
+        return self.error is None
+
+    def __repr__(self):
+        state = "ok" if self.succeed else "failed"
+        return "<ReplicationResult#{} {} {:.2f}s>".format(self.replication.index, state, self.elapsed)
+
+
+# queue the pool workers report the replications they start on, with their pid
+_started = None
+
+
+def _init_worker(started):
+    global _started
+    _started = started
+
+
+def _run_replication(factory, horizon, replication):
+    start = _time.time()
+    if _started is not None:
+        _started.put((replication.index, os.getpid(), start))
+    random.seed(replication.seed)
+    try:
+        import numpy
+    except ImportError:
+        pass
+    else:
+        numpy.random.seed(replication.seed)
+    try:
+        yard, collect = factory(replication.seed, **replication.params)
+        yard.start()
+        yard.run_until(horizon)
+        metrics = collect()
+    except Exception:
+        return ReplicationResult(replication, error=traceback.format_exc(), elapsed=_time.time() - start)
+    return ReplicationResult(replication, metrics=metrics, elapsed=_time.time() - start)
+
+
+class ReplicationRunner:
+    """Run independent replications of a yard in a pool of worker processes.
+
+    ``factory(seed, **params)`` is called inside the worker and must build the
+    yard with its roles and box generators, returning ``(yard, collect)``; the
+    yard is then started and run until ``horizon`` and ``collect()`` gives the
+    aggregated metrics sent back to the parent. The factory, the parameters and
+    the metrics all have to be picklable, so the factory is usually a module
+    level function.
+
+    Each replication gets a seed derived from ``base_seed`` and its index only,
+    and the global ``random`` module, as well as ``numpy.random`` when numpy is
+    installed, is seeded with it before the factory runs, so a replication
+    reproduces regardless of the worker it lands on or of the number of workers.
+    Every worker process runs a single replication, so class level state such
+    as the request counters never leaks from one replication into the next.
+
+    A replication whose worker dies, or which runs for more than ``timeout``
+    seconds when given, is reported as a failed ReplicationResult instead of
+    blocking the runner; the overrunning worker is killed.
+    """
+    # seconds between two checks of the running replications
+    poll_interval = 1.0
+
+    def __init__(self, factory, horizon, workers=None, max_inflight=None, base_seed=0, mp_context=None,
+                 timeout=None):
+        self.factory = factory
+        self.horizon = horizon
+        self.workers = workers or os.cpu_count() or 1
+        self.max_inflight = max_inflight or 2 * self.workers
+        self.base_seed = base_seed
+        self.timeout = timeout
+        self.mp_context = mp_context
+
+    def seed_of(self, index):
+        return random.Random("{}/{}".format(self.base_seed, index)).getrandbits(32)
+
+    def replications(self, num=None, params=None):
+        if num is None and params is None:
+            raise ValueError("give the number of replications, their parameters or both")
+        if params is None:
+            params = [{}] * num
+        elif num is not None:
+            params = [p for p in params for _ in range(num)]
+        for i, p in enumerate(params):
+            yield Replication(i, self.seed_of(i), dict(p))
+
+    def imap(self, num=None, params=None):
+        """Yield a ReplicationResult as soon as each replication finishes.
+
+        Either ``num`` replications of the default parameters, or one per item in
+        ``params`` (``num`` of each when both are given). At most
+        ``max_inflight`` replications are submitted to the pool at once.
+        """
+        finished = queue.Queue()
+        context = self.mp_context or multiprocessing.get_context()
+        started = context.SimpleQueue()
+        pending = {}
+        running = {}
+        with context.Pool(self.workers, _init_worker, (started,), maxtasksperchild=1) as pool:
+            for replication in self.replications(num, params):
+                pool.apply_async(_run_replication, (self.factory, self.horizon, replication),
+                                 callback=finished.put,
+                                 error_callback=self._on_error(replication, finished.put))
+                pending[replication.index] = replication
+                if len(pending) >= self.max_inflight:
+                    yield self._next_result(finished, started, pending, running)
+            while pending:
+                yield self._next_result(finished, started, pending, running)
+
+    def _next_result(self, finished, started, pending, running):
+        while True:
+            try:
+                result = finished.get(timeout=self.poll_interval)
+            except queue.Empty:
+                result = self._lost_result(started, pending, running)
+                if result is None:
+                    continue
+            index = result.replication.index
+            # a late result of a replication already given up on
+            if index not in pending:
+                continue
+            del pending[index]
+            running.pop(index, None)
+            return result
+
+    def _lost_result(self, started, pending, running):
+        """Result of a replication whose worker died or which ran out of time, if any.
+
+        The pool never reports a task whose worker was killed, e.g. by the OOM
+        killer or a crash in the C extension, so the workers running a
+        replication are watched here. A worker is only declared dead when it
+        is still gone at the next poll, leaving time for the result it may
+        have sent before exiting to come through.
+        """
+        while not started.empty():
+            index, pid, start = started.get()
+            if index in pending:
+                running[index] = [pid, start, False]
+        workers = {process.pid: process for process in multiprocessing.active_children()}
+        now = _time.time()
+        for index, (pid, start, gone) in running.items():
+            if pid not in workers:
+                if not gone:
+                    running[index][2] = True
+                    continue
+                error = "the worker {} running the replication exited without a result".format(pid)
+            elif self.timeout is not None and now - start > self.timeout:
+                workers[pid].kill()
+                error = "the replication did not finish within {}s".format(self.timeout)
+            else:
+                continue
+            return ReplicationResult(pending[index], error=error, elapsed=now - start)
+
+    @staticmethod
+    def _on_error(replication, put):
+        def callback(exc):
+            error = "".join(traceback.format_exception(type(exc), exc, exc.__traceback__))
+            put(ReplicationResult(replication, error=error))
+        return callback
+
+    def run(self, num=None, params=None):
+        return sorted(self.imap(num, params), key=lambda result: result.replication.index)
@@ -23,6 +23,10 @@ cdef class V3:
 cdef class V3i(V3):
     pass
 
+
+cdef class FrozenV3(V3):
+    pass
+
 cdef double _TEU_LENGTH
 cdef double _TEU_WIDTH
 cdef double _TEU_HEIGHT
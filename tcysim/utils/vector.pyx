@@ -269,6 +269,36 @@ _TEU_LENGTH = 6.1
 _TEU_WIDTH = 2.44
 _TEU_HEIGHT = 2.59
 
+cdef class FrozenV3(V3):
+    """A V3 that may be shared between callers, e.g. a cached coordinate.
+
+    In-place updates raise; ``+=`` and friends rebind to a new V3 instead.
+    """
+    def __setattr__(self, name, value):
+        raise AttributeError("FrozenV3 is read-only")
+
+    def __setitem__(self, int key, double value):
+        raise TypeError("FrozenV3 is read-only")
+
+    def __iadd__(self, other):
+        return self + other
+
+    cpdef V3 iadd1(FrozenV3 self, axis, double value):
+        raise TypeError("FrozenV3 is read-only")
+
+    cpdef V3 isub1(FrozenV3 self, axis, double value):
+        raise TypeError("FrozenV3 is read-only")
+
+    cpdef V3 imul1(FrozenV3 self, axis, double value):
+        raise TypeError("FrozenV3 is read-only")
+
+    cpdef V3 iset1(FrozenV3 self, axis, double value):
+        raise TypeError("FrozenV3 is read-only")
+
+    def __copy__(self):
+        return V3(self.x, self.y, self.z)
+
+
 cdef class TEU(V3):
     LENGTH = _TEU_LENGTH
     WIDTH = _TEU_WIDTH
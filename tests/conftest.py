@@ -0,0 +1,36 @@
+import pytest
+
+from tcysim.framework import Yard, Component, Spec, Lane
+from tcysim.framework.scheduler import JobScheduler
+from tcysim.implementation.base.policy.op_builder import OpBuilder
+from tcysim.implementation.base.policy.req_handler import ReqHandler
+from tcysim.implementation.scenario.stackingblock.allocator import RandomSpaceAllocator
+from tcysim.implementation.scenario.stackingblock.block import StackingBlock
+from tcysim.implementation.scenario.stackingblock.crane import CraneForStackingBlock
+from tcysim.utils import V3, TEU
+
+
+class Crane(CraneForStackingBlock):
+    gantry = Component("x", Spec(2.17, 0.1), may_interfere=True)
+    trolley = Component("y", Spec(1.17, 0.4))
+    hoist = Component("z", specs={"no load": Spec(1.5, 0.4), "rated load": Spec(0.75, 0.4)}, max_height=18.1)
+    ReqHandler = ReqHandler
+    OpBuilder = OpBuilder
+    JobScheduler = JobScheduler
+
+
+class SmallYard(Yard):
+    """A single stacking block served by one crane, with two lanes along it."""
+    SpaceAllocator = RandomSpaceAllocator
+
+    def __init__(self, bays=20, rows=6, tiers=4):
+        super(SmallYard, self).__init__()
+        length = bays * TEU.LENGTH + 30
+        lanes = [Lane(i, V3(0, -5 - 4 * i, 0), length, 3.5) for i in range(2)]
+        block = StackingBlock(self, 0, V3(0, 0, 0), V3(bays, rows, tiers), lanes=lanes)
+        self.deploy(block, [Crane(self, block, 0)])
+
+
+@pytest.fixture
+def small_yard():
+    return SmallYard()
@@ -0,0 +1,51 @@
+import random
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from tcysim.framework.box import BoxState
+from tcysim.framework.probe import ProbeProcessor, on_probe
+from tcysim.implementation.base.roles.box_generator import BoxSchedule, ScheduledBoxGenerator
+
+
+def _schedule(num, seed=1):
+    rnd = np.random.default_rng(seed)
+    alloc = np.cumsum(rnd.exponential(600, num))
+    store = alloc + rnd.uniform(600, 1200, num)
+    retrieve = store + rnd.uniform(3600, 7200, num)
+    return BoxSchedule.from_boxes(alloc, store, retrieve, rnd.choice([20, 40], num)), retrieve.max()
+
+
+class RequestCounter(ProbeProcessor):
+    def __init__(self, yard):
+        super(RequestCounter, self).__init__(yard)
+        self.num = 0
+
+    @on_probe("request.succeed", sync=True)
+    def on_request_succeed(self, request):
+        self.num += 1
+
+
+def test_schedule_runs_through_yard(small_yard, tmp_path):
+    random.seed(1)
+    schedule, end = _schedule(40)
+    schedule.save(str(tmp_path / "schedule.npy"))
+    schedule = BoxSchedule.load(str(tmp_path / "schedule.npy"), chunk_size=16)
+    assert len(schedule) == 120
+
+    yard = small_yard
+    generator = ScheduledBoxGenerator(yard, schedule, lookahead=1800)
+    counter = RequestCounter(yard)
+    yard.start()
+    max_queued = 0
+    time = 0
+    while time < end + 86400:
+        time += 600
+        yard.run_until(time)
+        max_queued = max(max_queued, len(generator.queue))
+
+    assert counter.num == 80
+    assert not generator.queue and not generator.boxes
+    assert yard.count_boxes(BoxState.ALLOCATED, BoxState.STORING, BoxState.STORED) == 0
+    assert max_queued < len(schedule)
@@ -0,0 +1,69 @@
+import os
+import random
+
+import pytest
+
+from tcysim.framework import Box
+from tcysim.framework.box import BoxState
+from tcysim.framework.probe import ProbeProcessor, on_probe
+
+pytestmark = pytest.mark.skipif(not hasattr(os, "fork"), reason="Yard.fork requires os.fork")
+
+
+class AllocLogger(ProbeProcessor):
+    def __init__(self, yard, fp):
+        super(AllocLogger, self).__init__(yard)
+        self.fp = fp
+
+    @on_probe("box.alloc")
+    def on_box_alloc(self, box):
+        self.fp.write("{} {}\n".format(self.time, box.id.decode()))
+        self.fp.flush()
+
+
+def _store(yard, time, box_id):
+    box = Box(box_id, size=20)
+    block, loc = yard.choose_location(box)
+    yard.alloc(time, box, block, loc)
+    yard.store(time, box, block.lanes[0])
+    return box
+
+
+def _what_if(yard, num):
+    time = yard.time
+    for i in range(num):
+        _store(yard, time + i * 60, "child-{}".format(i).encode())
+    yard.run_until(time + 7200)
+    return yard.time, yard.count_boxes(BoxState.STORED)
+
+
+def test_fork_leaves_parent_untouched(small_yard, tmp_path):
+    random.seed(1)
+    yard = small_yard
+    log_path = tmp_path / "alloc.log"
+    with open(str(log_path), "w") as fp:
+        AllocLogger(yard, fp)
+        yard.start()
+        for i in range(3):
+            _store(yard, i * 60, "box-{}".format(i).encode())
+        yard.run_until(3600)
+        # queued on the logger but not run yet when the yard is forked
+        _store(yard, 3600, b"box-3")
+
+        log = log_path.read_text()
+        stored = yard.count_boxes(BoxState.STORED)
+        assert stored == 3 and len(log.splitlines()) == 3
+
+        with yard.fork(_what_if, 5) as fork:
+            time, child_stored = fork.result()
+        assert time == 3600 + 7200
+        assert child_stored == stored + 6
+
+        assert yard.time == 3600
+        assert yard.count_boxes(BoxState.STORED) == stored
+        assert yard.box(b"child-0") is None
+        assert log_path.read_text() == log
+
+        yard.run_until(7200)
+    assert log_path.read_text().splitlines()[3].endswith("box-3")
+    assert yard.count_boxes(BoxState.STORED) == stored + 1